@@ -48,8 +48,6 @@ mkdir -p "$BIN_PATH"
 cat tools/DyphalGenerator.py | sed -r \
         -e "s@(^__version__[ ]*=[ ]*).*\$@\1\"${version}\"@" \
         -e "s@(^__date__[ ]*=[ ]*).*\$@\1\"${date}\"@" \
-        -e "s@(^DATA_PATH[ ]*=[ ]*).*\$@\1\"${DATA_PATH}\"@" \
-        -e "s@(^CONFIG_PATH[ ]*=[ ]*).*\$@\1\"${CONFIG_PATH}\"@" \
     >"$BIN_PATH"/DyphalGenerator
 chmod +x "$BIN_PATH"/DyphalGenerator
 
@@ -64,7 +62,12 @@ cp tools/ui-header.py "$PKG_PATH"/"$PKG_NAME"/about.py
 pyuic5 tools/About.ui | sed -r \
         -e "s/%VERSION%/${version}/" \
     >>"$PKG_PATH"/"$PKG_NAME"/about.py
-cp tools/util.py tools/photo.py tools/album.py "$PKG_PATH"/"$PKG_NAME"/
+cp tools/util.py tools/photo.py tools/album.py tools/exiftool.py tools/cache.py tools/jpeg.py tools/metadata.py tools/imaging.py tools/manifest.py tools/engine.py \
+    "$PKG_PATH"/"$PKG_NAME"/
+cat tools/config.py | sed -r \
+        -e "s@(^DATA_PATH[ ]*=[ ]*).*\$@\1\"${DATA_PATH}\"@" \
+        -e "s@(^CONFIG_PATH[ ]*=[ ]*).*\$@\1\"${CONFIG_PATH}\"@" \
+    >"$PKG_PATH"/"$PKG_NAME"/config.py
 
 mkdir -p "$DATA_PATH"
 cp www/* "$DATA_PATH"/
@@ -83,6 +86,12 @@ cat tools/gthumb-comment-update.py | sed -r \
     >"$BIN_PATH"/gthumb-comment-update
 chmod +x "$BIN_PATH"/gthumb-comment-update
 
+cat tools/dyphal-generate.py | sed -r \
+        -e "s@(^__version__[ ]*=[ ]*).*\$@\1\"${version}\"@" \
+        -e "s@(^__date__[ ]*=[ ]*).*\$@\1\"${date}\"@" \
+    >"$BIN_PATH"/dyphal-generate
+chmod +x "$BIN_PATH"/dyphal-generate
+
 cat tools/photorename.sh | sed -r \
         -e "s@(^# version:[ ]*).*\$@\1\"${version}\"@" \
         -e "s@(^# date:[ ]*).*\$@\1\"${date}\"@" \
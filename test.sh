@@ -20,3 +20,58 @@ if ! python3 test-DyphalGenerator-LinuxSafeFile.py $1
 then
     exit
 fi
+
+if ! python3 test_DyphalGenerator_MetadataCache.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_JpegMetadata.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_ColumnStore.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_imaging.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_Manifest.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_Engine.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_MemoryGate.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_PriorityExecutor.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_ReorderBuffer.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_FieldIndex.py $1
+then
+    exit
+fi
+
+if ! python3 test_DyphalGenerator_probe.py $1
+then
+    exit
+fi
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""Measures the memory used to hold photo metadata in DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import json
+import threading
+import tracemalloc
+
+from util import Counter, RefCounted
+from metadata import ColumnStore, RecordView
+
+DEFAULT_PHOTOS = 20000
+
+class OldPhoto(object):
+    """Per-photo metadata as it used to be stored: two dicts and a
+    reference count with its own lock."""
+
+    def __init__(self, properties, captions):
+        self._refCount = Counter(0)
+        self.properties = properties
+        self.captions = captions
+
+class NewPhoto(RefCounted):
+    """Per-photo metadata as PhotoFile stores it now."""
+
+    propertyStore = ColumnStore()
+    captionStore = ColumnStore()
+
+    def __init__(self, properties, captions):
+        super().__init__()
+        self.properties = RecordView(self.propertyStore, self.propertyStore.add(properties))
+        self.captions = RecordView(self.captionStore, self.captionStore.add(captions))
+
+def make_metadata(i):
+    """Return JSON text for the properties and captions of a typical
+    photo.  Going through JSON gives each photo its own copies of all
+    strings, like parsing exiftool's output does."""
+    properties = {
+        "Aperture": "f/%.1f" % (2.8 + i % 4), "Digital zoom": "None", "Drive mode": "Normal",
+        "Flash type": "None", "Field of view": "65.5 degrees",
+        "Focal length": "6.0 mm (35 mm equivalent: 28.0 mm)", "Hyperfocal distance": "2.00 m",
+        "Image dimensions": "3648x2736 pixels", "Lens": "6.0 - 22.5 mm", "Light value": 6.9,
+        "Scale factor": 4.7, "Shooting mode": "Program AE", "Exposure": "1/60 sec.",
+        "Creation time": "2012-07-14 15:%02d:%02dZ" % (i // 60 % 60, i % 60),
+        "Exposure compensation": 0, "Exposure mode": "Auto", "Flash": "Off, Did not fire",
+        "ISO": 80 * (1 + i % 4), "Camera make": "Canon", "Camera model": "Canon PowerShot S95",
+        "Orientation": "Horizontal (normal)", "File size": "%d kB" % (2000 + i % 1000),
+        "File type": "JPEG", "Macro mode": "Normal", "Rotation": "0 degrees",
+        "File name": "img_%04d.jpg" % (i), "Time zone": "UTC-06:00"}
+    captions = {"Date": "14 July 2012, 15:45", "Location": "Calgary",
+                "Description": "Photo number %d" % (i)}
+    return json.dumps([properties, captions])
+
+def measure(photo_class, texts):
+    """Return the number of bytes allocated to hold metadata for a list
+    of photos."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    photos = [photo_class(*json.loads(text)) for text in texts]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del photos
+    return after - before
+
+def main():
+    count = int(sys.argv[1]) if 2 <= len(sys.argv) else DEFAULT_PHOTOS
+    texts = [make_metadata(i) for i in range(count)]
+    old = measure(OldPhoto, texts)
+    new = measure(NewPhoto, texts)
+    print("Metadata for %d photos:" % (count))
+    print("  dicts per photo:   %8d bytes total, %5d bytes per photo" % (old, old // count))
+    print("  shared columns:    %8d bytes total, %5d bytes per photo" % (new, new // count))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""Measures how long DyphalGenerator takes to start up.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import subprocess
+import statistics
+import time
+
+DEFAULT_RUNS = 5
+DEFAULT_SCRIPT = "~/bin/DyphalGenerator"
+
+# Run in a child process so that every run starts with nothing imported.  The child reports 
+# the time after importing DyphalGenerator and after its window is first shown, both measured 
+# from when the parent started it.
+CHILD = """
+import sys
+import time
+import runpy
+start = float(sys.argv[1])
+try:
+    module = runpy.run_path(sys.argv[2], run_name="dyphal_startup")
+except ImportError as exc:
+    print("unavailable", exc)
+    sys.exit(0)
+imported = time.monotonic()
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+show = module["DyphalUI"].show
+def shown(self):
+    show(self)
+    def report():
+        print(imported - start, time.monotonic() - start)
+        QApplication.quit()
+    QTimer.singleShot(0, report)
+module["DyphalUI"].show = shown
+sys.argv = sys.argv[2:]
+try:
+    module["main"]()
+except SystemExit:
+    pass
+"""
+
+def run(script):
+    """Start DyphalGenerator once and return the times taken to import 
+    it and to show its window, in seconds."""
+    env = dict(os.environ)
+    if "DISPLAY" not in env and "WAYLAND_DISPLAY" not in env:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.monotonic()
+    output = subprocess.check_output([sys.executable, "-c", CHILD, str(start), script], 
+                                     env=env, stdin=subprocess.DEVNULL, universal_newlines=True)
+    fields = output.split()
+    if 0 == len(fields) or "unavailable" == fields[0]:
+        print("Unable to start DyphalGenerator: %s" % (" ".join(fields[1:])))
+        sys.exit(1)
+    return (float(fields[-2]), float(fields[-1]))
+
+def main():
+    runs = int(sys.argv[1]) if 2 <= len(sys.argv) else DEFAULT_RUNS
+    script = os.path.expanduser(sys.argv[2] if 3 <= len(sys.argv) else DEFAULT_SCRIPT)
+    times = [run(script) for _ in range(runs)]
+    print("Start-up time over %d runs:" % (runs))
+    for (index, name) in [(0, "import"), (1, "window shown")]:
+        values = [t[index] for t in times]
+        print("  %-14s min %6.0f ms, median %6.0f ms" % 
+              (name + ":", min(values) * 1000, statistics.median(values) * 1000))
+
+if __name__ == '__main__':
+    main()
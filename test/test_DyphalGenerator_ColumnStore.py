@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's metadata column store.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+
+from metadata import ColumnStore, RecordView
+
+def test_records():
+    store = ColumnStore()
+    first = RecordView(store, store.add({"Camera make": "Canon", "ISO": 100}))
+    second = RecordView(store, store.add({"Camera make": "Nikon", "Flash": "Fired"}))
+    return {"Camera make": "Canon", "ISO": 100} == dict(first) \
+           and {"Camera make": "Nikon", "Flash": "Fired"} == dict(second) \
+           and "Flash" not in first and None is first.get("Flash")
+
+def test_interning():
+    store = ColumnStore()
+    # Build equal strings that aren't the same object.
+    first = RecordView(store, store.add({"Camera make": "".join(["Can", "on"])}))
+    second = RecordView(store, store.add({"Camera make": "".join(["Ca", "non"])}))
+    return first["Camera make"] is second["Camera make"]
+
+def test_reuse():
+    store = ColumnStore()
+    first = store.add({"Camera make": "Canon", "ISO": 100})
+    store.add({"Camera make": "Nikon"})
+    store.remove(first)
+    third = store.add({"Flash": "Fired"})
+    return first == third and {"Flash": "Fired"} == dict(RecordView(store, third))
+
+def test_empty():
+    store = ColumnStore()
+    rows = [store.add({"Camera make": "Canon"}) for i in range(3)]
+    for row in rows:
+        store.remove(row)
+    return 0 == store.add({"ISO": 100}) and ["ISO"] == store.fields(0)
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing metadata column store.")
+
+    def test_store(description, func):
+        """Runs a test function and reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes no arguments and returns True on 
+                  success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            if func():
+                print("passed.")
+            else:
+                print("FAILED!")
+                testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_store("records with different fields", test_records)
+    test_store("shared values", test_interning)
+    test_store("re-use of removed rows", test_reuse)
+    test_store("reset when all rows are removed", test_empty)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's album generation engine.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import json
+import tempfile
+import threading
+import types
+import urllib.parse
+
+import PIL.Image
+
+import util
+from util import MemoryGate, RefCounted
+
+def import_engine():
+    """Import Engine, which imports the other modules as parts of the 
+    dyphal package.  That package is only put together when 
+    DyphalGenerator is installed, so make one from the modules that are 
+    being tested."""
+    if "dyphal" not in sys.modules:
+        package = types.ModuleType("dyphal")
+        package.__path__ = [os.path.dirname(os.path.abspath(util.__file__))]
+        package.__version__ = "test"
+        sys.modules["dyphal"] = package
+    from dyphal.engine import Engine
+    from dyphal.config import Config
+    from dyphal.imaging import DerivativeJob
+    import dyphal.config
+    return (Engine, Config, DerivativeJob, dyphal.config)
+
+(Engine, Config, DerivativeJob, config_module) = import_engine()
+
+SETTINGS = {"title": "Test", "description": "", "footer": "", "photoResolution": (800, 600), 
+            "captionFields": [], "propertyFields": []}
+
+class FakeImaging(object):
+    NAME = "fake"
+    BYTES_PER_PIXEL = 8
+
+class FakeConfig(object):
+    """Just enough configuration for the engine.  Derivatives are 
+    written as empty files; the first job waits until it is told to 
+    continue.  The jobs are recorded in the order that they are run."""
+
+    def __init__(self):
+        self.maxWorkers = 1
+        self.spriteSize = 0
+        self.photoLadder = []
+        self.photoFormats = []
+        self.photoQuality = 75
+        self.photoQualityTarget = None
+        self.imaging = FakeImaging()
+        self.memoryGate = MemoryGate(1 << 30)
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.jobs = []
+
+    def generateDerivatives(self, job):
+        self.jobs.append(("photos" if 0 != len(job.photos) else "thumbnails", 
+                          os.path.basename(job.source)))
+        for (path, _, _) in job.photos + job.thumbnails:
+            open(path, "w").close()
+        if not self.started.is_set():
+            self.started.set()
+            self.proceed.wait(10)
+        if None is job.placeholderSize:
+            return {}
+        return {"placeholder": "placeholder:" + os.path.basename(job.source)}
+
+class FakePhoto(RefCounted):
+    """A photo that only has a name and a size."""
+
+    def __init__(self, name, pixels):
+        super().__init__()
+        self._name = name
+        self._pixels = pixels
+
+    def getPath(self):
+        return "/photos/" + self._name + ".jpg"
+
+    def getAlbumJSON(self):
+        return {"name": self._name + ".jpg", "thumbnail": self._name + ".thumbnail", 
+                "orientation": "horizontal", "path": self.getPath()}
+
+    def getJSONName(self):
+        return self._name + ".jpg.json"
+
+    def getSourceIdentity(self):
+        return [self._name]
+
+    def getImageIdentity(self):
+        return [self._name]
+
+    def getDecodedPixels(self, resolution):
+        return self._pixels
+
+    def generateJSON(self, out_dir_name, resolution, ladder, formats, captions, properties):
+        open(os.path.join(out_dir_name, self.getJSONName()), "w").close()
+
+    def photoJob(self, photo_dir_name, resolution, ladder, quality, formats, 
+                 quality_target=None):
+        return DerivativeJob(self.getPath(), 
+                             [(os.path.join(photo_dir_name, self._name + ".jpg"), 
+                               resolution[0], resolution[1])], 
+                             quality, [], None, formats, None, 5, quality_target, None, 
+                             self._pixels)
+
+    def thumbnailJob(self, thumb_dir_name, thumb_width_base, thumb_height_base, thumb_quality, 
+                     formats, placeholder_size=None):
+        return DerivativeJob(self.getPath(), [], None, 
+                             [(os.path.join(thumb_dir_name, self._name + ".thumbnail"), 
+                               thumb_width_base, thumb_height_base)], 
+                             thumb_quality, formats, None, 5, None, placeholder_size, 
+                             self._pixels)
+
+def make_photos(count):
+    """Make some photos, each larger than the one before."""
+    photos = [FakePhoto("photo%d" % (i), 1000 + i) for i in range(count)]
+    for photo in photos:
+        photo.addRef()
+    return photos
+
+def test_album_first(dir_name):
+    """Check that the album JSON is written before any photo's 
+    derivatives, and written again with the placeholders once the 
+    thumbnails are all done."""
+    config = FakeConfig()
+    engine = Engine(config)
+    try:
+        album_file_name = os.path.join(dir_name, "album.dyphal")
+        operation = engine.generateAlbum(album_file_name, SETTINGS, make_photos(3), 
+                                         lambda: None)
+        if not config.started.wait(10):
+            return False
+        with open(os.path.join(dir_name, "album.json")) as album_file:
+            early = json.load(album_file)
+        config.proceed.set()
+        errors = operation.done.result(10)
+    finally:
+        config.proceed.set()
+        engine.close()
+
+    with open(os.path.join(dir_name, "album.json")) as album_file:
+        final = json.load(album_file)
+    return 0 == len(errors) \
+           and all("placeholder" not in photo for photo in early["photos"]) \
+           and ["placeholder:photo%d.jpg" % (i) for i in range(3)] \
+               == [photo.get("placeholder") for photo in final["photos"]]
+
+def test_order(dir_name):
+    """Check that every photo's thumbnails are made before any of the 
+    scaled-down photos, which are made largest first."""
+    config = FakeConfig()
+    config.proceed.set()
+    engine = Engine(config)
+    try:
+        operation = engine.generateAlbum(os.path.join(dir_name, "album.dyphal"), SETTINGS, 
+                                         make_photos(3), lambda: None)
+        errors = operation.done.result(10)
+    finally:
+        engine.close()
+    return 0 == len(errors) \
+           and [("thumbnails", "photo0.jpg"), ("thumbnails", "photo1.jpg"), 
+                ("thumbnails", "photo2.jpg"), ("photos", "photo2.jpg"), 
+                ("photos", "photo1.jpg"), ("photos", "photo0.jpg")] == config.jobs
+
+def test_cancel(dir_name):
+    """Cancel a generation once the first photo's thumbnails are being 
+    made, the way the GUI does, and check that the manifest describes 
+    exactly the files that were finished."""
+    config = FakeConfig()
+    engine = Engine(config)
+    try:
+        album_file_name = os.path.join(dir_name, "album.dyphal")
+        operation = engine.generateAlbum(album_file_name, SETTINGS, make_photos(3), 
+                                         lambda: None)
+        if not config.started.wait(10):
+            return False
+        for task in reversed(operation.tasks + [operation.done]):
+            task.cancel()
+        config.proceed.set()
+    finally:
+        config.proceed.set()
+        engine.close()
+
+    with open(os.path.join(dir_name, "album.manifest")) as manifest_file:
+        files = json.load(manifest_file)["files"]
+    return os.path.join(Config.THUMBNAIL_DIR, "photo0.thumbnail") in files \
+           and os.path.join(Config.THUMBNAIL_DIR, "photo1.thumbnail") not in files \
+           and os.path.join(Config.THUMBNAIL_DIR, "photo2.thumbnail") not in files \
+           and os.path.join(Config.PHOTO_DIR, "photo0.jpg") not in files
+
+def use_config_dir(dir_name):
+    """Make Config read its files from a directory, and return the 
+    directory that it used before."""
+    previous = config_module.CONFIG_PATH
+    config_module.CONFIG_PATH = dir_name
+    return previous
+
+def test_read_only(dir_name):
+    """Check that a read-only configuration doesn't create anything."""
+    config_dir_name = os.path.join(dir_name, "config")
+    previous = use_config_dir(config_dir_name)
+    try:
+        with Config(1, read_only=True) as config:
+            config.save()
+    finally:
+        use_config_dir(previous)
+    return not os.path.exists(config_dir_name)
+
+def make_photo(path, width, height, orientation=1):
+    """Write a JPEG file with some detail in it, and an orientation."""
+    img = PIL.Image.radial_gradient("L").resize((width, height)).convert("RGB")
+    exif = img.getexif()
+    exif[0x0112] = orientation
+    img.save(path, quality=90, exif=exif)
+
+def test_generate(dir_name):
+    """Generate an album from real photos with the Pillow backend, the 
+    way that dyphal-generate does, and check the files that it writes."""
+    config_dir_name = os.path.join(dir_name, "config")
+    os.mkdir(config_dir_name)
+    with open(os.path.join(config_dir_name, config_module.CONFIG_NAME), "w") as config_file:
+        json.dump({"imagingBackend": "pillow"}, config_file)
+    os.mkdir(os.path.join(dir_name, "originals"))
+    # The last one is stored sideways and needs to be rotated.
+    originals = [("wide.jpg", 1600, 1200, 1), ("tall.jpg", 900, 1200, 1), 
+                 ("rotated.jpg", 1600, 1200, 6)]
+    filenames = []
+    for (name, width, height, orientation) in originals:
+        path = os.path.join(dir_name, "originals", name)
+        make_photo(path, width, height, orientation)
+        filenames.append((path, name))
+    album_file_name = os.path.join(dir_name, "album", "album.dyphal")
+    settings = {"title": "Test", "description": "", "footer": "", "photoResolution": [800, 600], 
+                "captionFields": [], "propertyFields": []}
+
+    previous = use_config_dir(config_dir_name)
+    try:
+        with Config(1, read_only=True) as config:
+            if "pillow" != config.imaging.NAME:
+                return False
+            engine = Engine(config)
+            photos = []
+            try:
+                tasks = engine.loadPhotos(filenames, photos.extend, lambda: None)
+                (errors, duplicates) = Engine.loadErrors(tasks)
+                if 0 != len(errors + duplicates):
+                    return False
+                errors = engine.generateAlbum(album_file_name, settings, photos, 
+                                              lambda: None).done.result(60)
+            finally:
+                for photo in photos:
+                    photo.release()
+                engine.close()
+    finally:
+        use_config_dir(previous)
+    if 0 != len(errors) or [config_module.CONFIG_NAME] != os.listdir(config_dir_name):
+        return False
+
+    album_dir_name = os.path.dirname(album_file_name)
+    def open_output(url):
+        return PIL.Image.open(os.path.join(album_dir_name, urllib.parse.unquote(url)))
+    with open(os.path.join(album_dir_name, "album.json")) as album_file:
+        album = json.load(album_file)
+    if [name for (name, _, _, _) in originals] != [photo["name"] for photo in album["photos"]]:
+        return False
+    for (photo, horizontal) in zip(album["photos"], [True, False, False]):
+        if not photo["placeholder"].startswith("data:image/png;base64,"):
+            return False
+        for thumbnail in photo["thumbnails"]:
+            with open_output(thumbnail["thumbnail"]) as thumb:
+                size = (160 * thumbnail["scale"], 120 * thumbnail["scale"])
+                if (size if horizontal else size[::-1]) != thumb.size:
+                    return False
+        with open(os.path.join(album_dir_name, config_module.Config.METADATA_DIR, 
+                               photo["name"] + ".json")) as photo_file:
+            data = json.load(photo_file)
+        with open_output(data["photo"]) as img:
+            if (int(data["width"]), int(data["height"])) != img.size \
+               or 800 * 600 < img.width * img.height or horizontal != (img.width > img.height):
+                return False
+    return os.path.isfile(os.path.join(album_dir_name, "album.manifest"))
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing the album generation engine.")
+
+    def test_engine(description, func):
+        """Runs a test function in a temporary directory and reports
+        success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory and
+                  returns True on success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(temp_dir):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_engine("album JSON written before the photos", test_album_first)
+    test_engine("thumbnails before photos, largest photos first", test_order)
+    test_engine("manifest saved after cancelling generation", test_cancel)
+    test_engine("read-only configuration", test_read_only)
+    test_engine("generating an album with Pillow", test_generate)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
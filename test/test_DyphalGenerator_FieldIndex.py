@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's photo field index.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+
+from metadata import ColumnStore, RecordView, FieldIndex
+
+def test_fields():
+    index = FieldIndex()
+    index.add({"ISO": 100, "Camera make": "Canon"})
+    index.add({"ISO": 200, "Flash": "Fired"})
+    return ["Camera make", "Flash", "ISO"] == index.fields(False) \
+           and ["ISO"] == index.fields(True)
+
+def test_remove():
+    index = FieldIndex()
+    index.add({"ISO": 100, "Camera make": "Canon"})
+    index.add({"ISO": 200, "Flash": "Fired"})
+    index.remove({"ISO": 200, "Flash": "Fired"})
+    common = index.fields(True)
+    index.remove({"ISO": 100, "Camera make": "Canon"})
+    return ["Camera make", "ISO"] == common and [] == index.fields(False) \
+           and [] == index.fields(True)
+
+def test_clear():
+    index = FieldIndex()
+    index.add({"ISO": 100})
+    index.clear()
+    index.add({"Flash": "Fired"})
+    return ["Flash"] == index.fields(True)
+
+def test_record_views():
+    store = ColumnStore()
+    index = FieldIndex()
+    first = RecordView(store, store.add({"Camera make": "Canon", "ISO": 100}))
+    second = RecordView(store, store.add({"Camera make": "Nikon"}))
+    index.add(first)
+    index.add(second)
+    return ["Camera make", "ISO"] == index.fields(False) \
+           and ["Camera make"] == index.fields(True)
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing photo field index.")
+
+    def test_index(description, func):
+        """Runs a test function and reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes no arguments and returns True on 
+                  success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            if func():
+                print("passed.")
+            else:
+                print("FAILED!")
+                testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_index("common and available fields", test_fields)
+    test_index("removal of records", test_remove)
+    test_index("removal of all records", test_clear)
+    test_index("records in a column store", test_record_views)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
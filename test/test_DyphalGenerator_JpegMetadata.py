@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's JPEG metadata reader and content hash.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import struct
+import shutil
+import tempfile
+import types
+
+import jpeg
+from jpeg import read_jpeg_metadata, jpeg_content_hash
+
+# Enough of a JPEG file to describe a 640x480 image.
+SOF = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, 480, 640, 1) + b"\x01\x11\x00"
+SOS = b"\xff\xda" + struct.pack(">HB", 8, 1) + b"\x01\x00\x00\x3f\x00"
+EOI = b"\xff\xd9"
+
+def segment(marker, payload):
+    return bytes([0xff, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+def ifd(entries, base, next_ifd=0):
+    """Build a little-endian IFD at offset base.  entries is a list of
+    (tag, type, count, value bytes)."""
+    data_offset = base + 2 + 12 * len(entries) + 4
+    head = struct.pack("<H", len(entries))
+    tail = b""
+    for (tag, field_type, count, value) in sorted(entries):
+        if len(value) <= 4:
+            head += struct.pack("<HHL", tag, field_type, count) + value.ljust(4, b"\0")
+        else:
+            head += struct.pack("<HHLL", tag, field_type, count, data_offset + len(tail))
+            tail += value + (b"\0" if len(value) % 2 else b"")
+    return head + struct.pack("<L", next_ifd) + tail
+
+def ascii_entry(tag, text):
+    value = text.encode("ascii") + b"\0"
+    return (tag, 2, len(value), value)
+
+def short_entry(tag, value):
+    return (tag, 3, 1, struct.pack("<H", value))
+
+def rational_entry(tag, numerator, denominator, signed=False):
+    return (tag, 10 if signed else 5, 1, struct.pack("<ll" if signed else "<LL",
+                                                     numerator, denominator))
+
+def exif_segment(ifd0_entries, exif_entries):
+    ifd0_size = len(ifd(ifd0_entries + [(0x8769, 4, 1, b"\0\0\0\0")], 8))
+    exif = ifd(exif_entries, 8 + ifd0_size)
+    ifd0 = ifd(ifd0_entries + [(0x8769, 4, 1, struct.pack("<L", 8 + ifd0_size))], 8)
+    return segment(0xe1, b"Exif\0\0" + b"II*\0" + struct.pack("<L", 8) + ifd0 + exif)
+
+def iptc_segment(datasets):
+    iptc = b"".join(b"\x1c" + struct.pack(">BBH", record, number, len(value)) + value
+                    for (record, number, value) in datasets)
+    resource = b"8BIM" + struct.pack(">HBB", 0x0404, 0, 0) + struct.pack(">L", len(iptc)) + iptc
+    return segment(0xed, b"Photoshop 3.0\0" + resource + (b"\0" if len(iptc) % 2 else b""))
+
+def xmp_segment(xmp):
+    return segment(0xe1, b"http://ns.adobe.com/xap/1.0/\0" + xmp.encode("utf-8"))
+
+def write_jpeg(dir_name, *segments):
+    path = os.path.join(dir_name, "photo.jpg")
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + b"".join(segments) + SOF + SOS + b"\x00" * 64 + EOI)
+    return path
+
+CAMERA_IFD0 = [ascii_entry(0x010f, "Canon"), ascii_entry(0x0110, "Canon PowerShot S95"),
+               short_entry(0x0112, 6)]
+CAMERA_EXIF = [rational_entry(0x829a, 1, 60), rational_entry(0x829d, 28, 10),
+               short_entry(0x8827, 400), ascii_entry(0x9003, "2012:07:14 15:45:04"),
+               rational_entry(0x9204, -2, 3, True), short_entry(0x9209, 0x10),
+               rational_entry(0x920a, 6000, 1000), short_entry(0xa402, 0),
+               short_entry(0xa405, 28)]
+
+def test_exif(dir_name):
+    tags = read_jpeg_metadata(write_jpeg(dir_name, exif_segment(CAMERA_IFD0, CAMERA_EXIF)))
+    expected = {"EXIF:Make": "Canon", "EXIF:Model": "Canon PowerShot S95",
+                "EXIF:Orientation": 6, "EXIF:ISO": 400,
+                "EXIF:DateTimeOriginal": "2012:07:14 15:45:04",
+                "EXIF:ExposureCompensation": "-2/3", "EXIF:Flash": "Off, Did not fire",
+                "EXIF:FocalLength": "6.0 mm", "EXIF:ExposureMode": "Auto",
+                "File:FileType": "JPEG", "File:ImageWidth": 640, "File:ImageHeight": 480,
+                "Composite:ImageSize": "640x480", "Composite:Aperture": 2.8,
+                "Composite:ShutterSpeed": "1/60", "Composite:ScaleFactor35efl": 4.7,
+                "Composite:FocalLength35efl": "6.0 mm (35 mm equivalent: 28.0 mm)",
+                "Composite:FOV": "65.5 deg", "Composite:LightValue": 6.9}
+    return None is not tags and all(key in tags and value == tags[key]
+                                    for (key, value) in expected.items())
+
+FAST_LENS_EXIF = [entry for entry in CAMERA_EXIF if 0x829d != entry[0]] \
+                 + [rational_entry(0x829d, 95, 100)]
+
+def test_fast_lens(dir_name):
+    tags = read_jpeg_metadata(write_jpeg(dir_name, exif_segment(CAMERA_IFD0, FAST_LENS_EXIF)))
+    return None is not tags and 0.95 == tags["Composite:Aperture"]
+
+def test_iptc(dir_name):
+    tags = read_jpeg_metadata(write_jpeg(dir_name, iptc_segment([
+        (1, 90, b"\x1b%G"), (2, 120, "Café on the corner".encode("utf-8")),
+        (2, 27, b"Calgary"), (2, 55, b"20120714"), (2, 60, b"154504-0600")])))
+    return None is not tags and "Café on the corner" == tags["IPTC:Caption-Abstract"] \
+           and "Calgary" == tags["IPTC:ContentLocationName"] \
+           and "2012:07:14 15:45:04-06:00" == tags["Composite:DateTimeCreated"]
+
+def test_xmp(dir_name):
+    xmp = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+<rdf:Description rdf:about="" xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:Iptc4xmpCore="http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/"
+    Iptc4xmpCore:Location="Banff">
+<dc:description><rdf:Alt>
+<rdf:li xml:lang="fr">Un lac</rdf:li>
+<rdf:li xml:lang="x-default">A lake</rdf:li>
+</rdf:Alt></dc:description>
+</rdf:Description>
+</rdf:RDF>
+</x:xmpmeta>"""
+    tags = read_jpeg_metadata(write_jpeg(dir_name, xmp_segment(xmp)))
+    return None is not tags and "A lake" == tags["XMP:Description"] \
+           and "Banff" == tags["XMP:Location"]
+
+def test_maker_notes(dir_name):
+    exif = CAMERA_EXIF + [(0x927c, 7, 8, b"\0" * 8)]
+    return None is read_jpeg_metadata(write_jpeg(dir_name, exif_segment(CAMERA_IFD0, exif)))
+
+def test_camera_xmp(dir_name):
+    xmp = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+<rdf:Description rdf:about="" xmlns:exif="http://ns.adobe.com/exif/1.0/"
+    exif:FNumber="28/10"/>
+</rdf:RDF>
+</x:xmpmeta>"""
+    return None is read_jpeg_metadata(write_jpeg(dir_name, xmp_segment(xmp)))
+
+def test_not_jpeg(dir_name):
+    path = os.path.join(dir_name, "photo.png")
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + b"\0" * 64)
+    return None is read_jpeg_metadata(path)
+
+def test_truncated(dir_name):
+    path = write_jpeg(dir_name, exif_segment(CAMERA_IFD0, CAMERA_EXIF))
+    with open(path, "r+b") as f:
+        f.truncate(60)
+    return None is read_jpeg_metadata(path)
+
+class ExiftoolConfig(object):
+    """Just enough of a Config for PhotoFile to run exiftool."""
+
+    BG_TIMEOUT = 5
+    debugMetadata = False
+
+    def __init__(self, exiftool):
+        self.exiftool = exiftool
+
+def import_photo():
+    """Import PhotoFile and ExifToolPool, which import the other modules 
+    as parts of the dyphal package.  That package is only put together 
+    when DyphalGenerator is installed, so make one from the modules 
+    that are being tested."""
+    if "dyphal" not in sys.modules:
+        package = types.ModuleType("dyphal")
+        package.__path__ = [os.path.dirname(os.path.abspath(jpeg.__file__))]
+        sys.modules["dyphal"] = package
+    from dyphal.photo import PhotoFile
+    from dyphal.exiftool import ExifToolPool
+    return (PhotoFile, ExifToolPool)
+
+LENS_EXIF = [entry for entry in CAMERA_EXIF if entry[0] not in [0x829a, 0x829d]] \
+            + [rational_entry(0x9201, 6, 1, True), rational_entry(0x9202, 30, 100), 
+               (0x9286, 7, 15, b"ASCII\0\0\0A lake\0")]
+CAPTION_IPTC = [(1, 90, b"\x1b%G"), (2, 120, "Café on the corner".encode("utf-8")), 
+                (2, 27, b"Calgary"), (2, 55, b"20120714"), (2, 60, b"154504-0600")]
+CAPTION_XMP = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+<rdf:Description rdf:about="" xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:exif="http://ns.adobe.com/exif/1.0/"
+    xmlns:Iptc4xmpCore="http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/"
+    Iptc4xmpCore:Location="Banff" exif:DateTimeOriginal="2012-07-14T15:45">
+<dc:description><rdf:Alt>
+<rdf:li xml:lang="x-default">A lake</rdf:li>
+</rdf:Alt></dc:description>
+</rdf:Description>
+</rdf:RDF>
+</x:xmpmeta>"""
+
+def equivalence_cases():
+    """Return a description and a list of segments for each synthetic 
+    photo to compare with exiftool."""
+    return [("EXIF", [exif_segment(CAMERA_IFD0, CAMERA_EXIF)]), 
+            ("EXIF for a fast lens", [exif_segment(CAMERA_IFD0, FAST_LENS_EXIF)]), 
+            ("EXIF APEX values and comments", [exif_segment(CAMERA_IFD0[:2], LENS_EXIF)]), 
+            ("IPTC", [iptc_segment(CAPTION_IPTC)]), 
+            ("XMP", [xmp_segment(CAPTION_XMP)]), 
+            ("EXIF, IPTC and XMP", [exif_segment(CAMERA_IFD0, CAMERA_EXIF), 
+                                    iptc_segment(CAPTION_IPTC), xmp_segment(CAPTION_XMP)]), 
+            ("no metadata", [])]
+
+def test_equivalence(dir_name, segments):
+    """Check that the fast path reads a photo the same way that 
+    exiftool does, for every tag that PhotoFile asks exiftool for."""
+    (PhotoFile, ExifToolPool) = import_photo()
+    path = write_jpeg(dir_name, *segments)
+    fast = read_jpeg_metadata(path)
+    if None is fast:
+        return False
+    pool = ExifToolPool(1, ExiftoolConfig.BG_TIMEOUT)
+    try:
+        config = ExiftoolConfig(pool)
+        slow = PhotoFile._runExiftool([path], config)[path]
+        tags = [arg[1:].rstrip("#") for arg in PhotoFile._exiftoolArgs(config) if ":" in arg]
+    finally:
+        pool.close()
+    if isinstance(slow, Exception):
+        raise slow
+    return all(fast.get(tag) == slow.get(tag) for tag in tags)
+
+def write_scan(dir_name, name, metadata, scan):
+    """Write a JPEG file with the given metadata segments and scan 
+    data."""
+    path = os.path.join(dir_name, name)
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + b"".join(metadata) + SOF + SOS + scan + EOI)
+    return path
+
+SCAN = b"\x12\xff\x00\x34\xff\xd0\x56" * 16
+
+def test_hash_metadata(dir_name):
+    plain = jpeg_content_hash(write_scan(dir_name, "a.jpg", [], SCAN))
+    tagged = jpeg_content_hash(write_scan(dir_name, "b.jpg", [
+        exif_segment(CAMERA_IFD0, CAMERA_EXIF), iptc_segment([(2, 120, b"A lake")]), 
+        segment(0xfe, b"A comment")], SCAN + EOI + b"trailer"))
+    return None is not plain and plain == tagged
+
+def test_hash_pixels(dir_name):
+    first = jpeg_content_hash(write_scan(dir_name, "a.jpg", [], SCAN))
+    second = jpeg_content_hash(write_scan(dir_name, "b.jpg", [], SCAN[:-1] + b"\x57"))
+    return None is not first and None is not second and first != second
+
+def test_hash_not_jpeg(dir_name):
+    path = os.path.join(dir_name, "photo.png")
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + b"\0" * 64)
+    truncated = os.path.join(dir_name, "truncated.jpg")
+    with open(truncated, "wb") as f:
+        f.write(b"\xff\xd8" + SOF + SOS + SCAN)
+    return None is jpeg_content_hash(path) and None is jpeg_content_hash(truncated)
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing JPEG metadata reading.")
+
+    def test_jpeg(description, func):
+        """Runs a test function in a temporary directory and reports
+        success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory and
+                  returns True on success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(temp_dir):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_jpeg("EXIF tags and composites", test_exif)
+    test_jpeg("aperture of a fast lens", test_fast_lens)
+    test_jpeg("IPTC captions", test_iptc)
+    test_jpeg("XMP captions", test_xmp)
+    test_jpeg("fallback for MakerNotes", test_maker_notes)
+    test_jpeg("fallback for XMP camera settings", test_camera_xmp)
+    test_jpeg("fallback for files that aren't JPEG", test_not_jpeg)
+    test_jpeg("fallback for truncated files", test_truncated)
+    if None is not shutil.which("exiftool"):
+        for (description, segments) in equivalence_cases():
+            test_jpeg("equivalence with exiftool for %s" % (description), 
+                      lambda dir_name, segments=segments: test_equivalence(dir_name, segments))
+    else:
+        print("  Skipping comparisons with exiftool: 'exiftool' is not available.")
+    test_jpeg("content hash ignores metadata", test_hash_metadata)
+    test_jpeg("content hash covers image data", test_hash_pixels)
+    test_jpeg("no content hash for non-JPEG files", test_hash_not_jpeg)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's generation manifests.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import tempfile
+
+from manifest import Manifest
+
+INPUTS = {"source": [1, 2, 3, 4], "resolution": (800, 600), "version": "1.0"}
+
+def create_file(dir_name, name):
+    path = os.path.join(dir_name, name)
+    with open(path, "w") as f:
+        f.write(name)
+    return path
+
+def save_and_load(dir_name, names):
+    """Record some files in a manifest, save it, and load it again."""
+    manifest = Manifest()
+    for name in names:
+        manifest.record(name, INPUTS)
+    manifest.save(os.path.join(dir_name, "album.manifest"))
+    return Manifest(os.path.join(dir_name, "album.manifest"))
+
+def test_current(dir_name):
+    path = create_file(dir_name, "a.jpg")
+    manifest = save_and_load(dir_name, ["a.jpg"])
+    return manifest.isCurrent("a.jpg", INPUTS, path)
+
+def test_changed(dir_name):
+    path = create_file(dir_name, "a.jpg")
+    manifest = save_and_load(dir_name, ["a.jpg"])
+    return not manifest.isCurrent("a.jpg", dict(INPUTS, resolution=(1024, 768)), path)
+
+def test_missing(dir_name):
+    manifest = save_and_load(dir_name, ["a.jpg"])
+    return not manifest.isCurrent("a.jpg", INPUTS, os.path.join(dir_name, "a.jpg"))
+
+def test_unrecorded(dir_name):
+    path = create_file(dir_name, "a.jpg")
+    manifest = save_and_load(dir_name, ["b.jpg"])
+    return not manifest.isCurrent("a.jpg", INPUTS, path)
+
+def test_dropped(dir_name):
+    path = create_file(dir_name, "a.jpg")
+    manifest = save_and_load(dir_name, ["a.jpg"])
+    # Generate again without a.jpg.
+    manifest.save(os.path.join(dir_name, "album.manifest"))
+    manifest = Manifest(os.path.join(dir_name, "album.manifest"))
+    return not manifest.isCurrent("a.jpg", INPUTS, path)
+
+def test_corrupt(dir_name):
+    path = create_file(dir_name, "a.jpg")
+    with open(os.path.join(dir_name, "album.manifest"), "w") as f:
+        f.write("{")
+    manifest = Manifest(os.path.join(dir_name, "album.manifest"))
+    return not manifest.isCurrent("a.jpg", INPUTS, path)
+
+def test_result(dir_name):
+    manifest = Manifest()
+    manifest.record("a.jpg", INPUTS, 42)
+    manifest.record("b.jpg", INPUTS)
+    manifest.save(os.path.join(dir_name, "album.manifest"))
+    manifest = Manifest(os.path.join(dir_name, "album.manifest"))
+    return 42 == manifest.result("a.jpg", INPUTS) \
+           and None is manifest.result("a.jpg", dict(INPUTS, resolution=(1024, 768))) \
+           and None is manifest.result("b.jpg", INPUTS)
+
+def test_file_name(dir_name):
+    return "/a/album.manifest" == Manifest.fileName("/a/album.dyphal") \
+           and "/a/album.json.manifest" == Manifest.fileName("/a/album.json")
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing generation manifests.")
+
+    def test_manifest(description, func):
+        """Runs a test function in a temporary directory and reports
+        success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory and
+                  returns True on success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(temp_dir):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_manifest("unchanged file", test_current)
+    test_manifest("changed inputs", test_changed)
+    test_manifest("missing output file", test_missing)
+    test_manifest("file not in the manifest", test_unrecorded)
+    test_manifest("file dropped from the album", test_dropped)
+    test_manifest("corrupt manifest", test_corrupt)
+    test_manifest("results kept with unchanged inputs", test_result)
+    test_manifest("manifest file names", test_file_name)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
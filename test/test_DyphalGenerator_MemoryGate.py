@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's memory admission control.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import threading
+
+from util import MemoryGate
+
+# How long to wait for something that shouldn't happen, in seconds.
+WAIT = 0.2
+
+def start(gate, amount, admitted):
+    """Acquire memory from a gate in a new thread and set an event once 
+    it has been admitted."""
+    def run():
+        gate.acquire(amount)
+        admitted.set()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_within_budget():
+    gate = MemoryGate(100)
+    gate.acquire(40)
+    gate.acquire(60)
+    used = gate.used()
+    gate.release(40)
+    gate.release(60)
+    return 100 == used and 0 == gate.used()
+
+def test_wait():
+    gate = MemoryGate(100)
+    gate.acquire(60)
+    admitted = threading.Event()
+    thread = start(gate, 60, admitted)
+    blocked = not admitted.wait(WAIT)
+    gate.release(60)
+    thread.join()
+    return blocked and admitted.is_set() and 60 == gate.used()
+
+def test_oversized():
+    gate = MemoryGate(100)
+    # Work larger than the budget is admitted when nothing else is running...
+    gate.acquire(150)
+    admitted = threading.Event()
+    thread = start(gate, 10, admitted)
+    # ...but nothing else is admitted alongside it.
+    blocked = not admitted.wait(WAIT)
+    gate.release(150)
+    thread.join()
+    return blocked and admitted.is_set() and 10 == gate.used()
+
+def test_try():
+    gate = MemoryGate(100)
+    first = gate.tryAcquire(150)
+    second = gate.tryAcquire(10)
+    gate.release(150)
+    third = gate.tryAcquire(60)
+    fourth = gate.tryAcquire(40)
+    return first and not second and third and fourth and 100 == gate.used()
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing the memory gate.")
+
+    def test_gate(description, func):
+        """Runs a test function and reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes no arguments and returns True on 
+                  success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            if func():
+                print("passed.")
+            else:
+                print("FAILED!")
+                testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_gate("admission within the budget", test_within_budget)
+    test_gate("waiting for memory to be released", test_wait)
+    test_gate("work larger than the budget", test_oversized)
+    test_gate("admission without waiting", test_try)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's metadata cache.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import tempfile
+
+from cache import MetadataCache
+
+METHOD = "-json -All"
+
+def create_file(dir_name, name, contents):
+    path = os.path.join(dir_name, name)
+    with open(path, "w") as f:
+        f.write(contents)
+    return path
+
+def test_hit(dir_name):
+    path = create_file(dir_name, "a.jpg", "a")
+    key = MetadataCache.fileKey(path)
+    cache = MetadataCache(os.path.join(dir_name, "cache"))
+    miss = cache.lookup([key], METHOD)
+    cache.store({key: {"EXIF:Make": "Canon"}}, METHOD)
+    hit = cache.lookup([key], METHOD)
+    cache.close()
+    return {} == miss and {key: {"EXIF:Make": "Canon"}} == hit
+
+def test_persistence(dir_name):
+    path = create_file(dir_name, "a.jpg", "a")
+    key = MetadataCache.fileKey(path)
+    cache = MetadataCache(os.path.join(dir_name, "cache"))
+    cache.store({key: {"EXIF:Make": "Canon"}}, METHOD)
+    cache.close()
+    cache = MetadataCache(os.path.join(dir_name, "cache"))
+    hit = cache.lookup([key], METHOD)
+    cache.close()
+    return {key: {"EXIF:Make": "Canon"}} == hit
+
+def test_method(dir_name):
+    path = create_file(dir_name, "a.jpg", "a")
+    key = MetadataCache.fileKey(path)
+    cache = MetadataCache(os.path.join(dir_name, "cache"))
+    cache.store({key: {"EXIF:Make": "Canon"}}, METHOD)
+    miss = cache.lookup([key], METHOD + " -fast")
+    cache.close()
+    return {} == miss
+
+def test_invalidation(dir_name):
+    path = create_file(dir_name, "a.jpg", "a")
+    old_key = MetadataCache.fileKey(path)
+    cache = MetadataCache(os.path.join(dir_name, "cache"))
+    cache.store({old_key: {"EXIF:Make": "Canon"}}, METHOD)
+    with open(path, "a") as f:
+        f.write("more")
+    new_key = MetadataCache.fileKey(path)
+    miss = cache.lookup([new_key], METHOD)
+    cache.store({new_key: {"EXIF:Make": "Nikon"}}, METHOD)
+    old = cache.lookup([old_key], METHOD)
+    new = cache.lookup([new_key], METHOD)
+    cache.close()
+    return old_key != new_key and {} == miss and {} == old \
+           and {new_key: {"EXIF:Make": "Nikon"}} == new
+
+def test_eviction(dir_name):
+    keys = [MetadataCache.fileKey(create_file(dir_name, "%d.jpg" % (i), str(i)))
+            for i in range(4)]
+    cache = MetadataCache(os.path.join(dir_name, "cache"), 3)
+    cache.store({keys[0]: 0}, METHOD)
+    cache.store({keys[1]: 1}, METHOD)
+    cache.store({keys[2]: 2}, METHOD)
+    # Touch the first entry so that the second is the least recently used.
+    cache.lookup([keys[0]], METHOD)
+    cache.store({keys[3]: 3}, METHOD)
+    found = cache.lookup(keys, METHOD)
+    cache.close()
+    return {keys[0]: 0, keys[2]: 2, keys[3]: 3} == found
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing metadata caching.")
+
+    def test_cache(description, func):
+        """Runs a test function in a temporary directory and reports
+        success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory and
+                  returns True on success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(temp_dir):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_cache("cache hit after store", test_hit)
+    test_cache("persistence across sessions", test_persistence)
+    test_cache("miss with a different extraction method", test_method)
+    test_cache("invalidation when a file changes", test_invalidation)
+    test_cache("least-recently-used eviction", test_eviction)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
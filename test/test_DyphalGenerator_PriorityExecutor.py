@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's task scheduler.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import threading
+import concurrent.futures
+
+from util import PriorityExecutor, MemoryGate
+
+def blocked_executor():
+    """Return a single-threaded executor and an event that must be set 
+    before it runs anything else, so that work can be queued up 
+    behind it."""
+    executor = PriorityExecutor(1)
+    release = threading.Event()
+    executor.submit(release.wait)
+    return (executor, release)
+
+def test_order():
+    (executor, release) = blocked_executor()
+    order = []
+    for priority in [(3,), (1, 5), (2,), (1, 2)]:
+        executor.submitWithPriority(priority, order.append, priority)
+    release.set()
+    executor.shutdown()
+    return [(1, 2), (1, 5), (2,), (3,)] == order
+
+def test_fifo():
+    (executor, release) = blocked_executor()
+    order = []
+    for i in range(5):
+        executor.submit(order.append, i)
+    release.set()
+    executor.shutdown()
+    return [0, 1, 2, 3, 4] == order
+
+def test_results():
+    executor = PriorityExecutor(4)
+    success = executor.submit(lambda x, y: x + y, 1, y=2)
+    failure = executor.submit(lambda: 1 / 0)
+    done = concurrent.futures.wait([success, failure], 5)
+    executor.shutdown()
+    return 2 == len(done.done) and 3 == success.result() \
+           and isinstance(failure.exception(), ZeroDivisionError)
+
+def test_cancel():
+    (executor, release) = blocked_executor()
+    order = []
+    future = executor.submit(order.append, 1)
+    executor.submit(order.append, 2)
+    cancelled = future.cancel()
+    release.set()
+    executor.shutdown()
+    return cancelled and [2] == order
+
+def test_shutdown():
+    (executor, release) = blocked_executor()
+    executor.shutdown(wait=False)
+    try:
+        executor.submit(print)
+        rejected = False
+    except RuntimeError:
+        rejected = True
+    release.set()
+    executor.shutdown()
+    return rejected
+
+def test_dependencies():
+    executor = PriorityExecutor(4)
+    order = []
+    first = executor.submit(order.append, 1)
+    failed = executor.submit(lambda: 1 / 0)
+    # Dependents run after their dependencies, even ones that failed, ahead of more important work.
+    second = executor.submitAfter([first, failed], (1,), order.append, 2)
+    third = executor.submitAfter([second], (-1,), order.append, 3)
+    concurrent.futures.wait([third], 5)
+    executor.shutdown()
+    return [1, 2, 3] == order
+
+def test_no_waiting():
+    # A single thread isn't tied up by work whose dependency isn't done.
+    executor = PriorityExecutor(1)
+    external = concurrent.futures.Future()
+    dependent = executor.submitAfter([external], PriorityExecutor.DEFAULT_PRIORITY, lambda: 1)
+    independent = executor.submit(lambda: 2)
+    ran = 2 == independent.result(5) and not dependent.done()
+    external.set_result(None)
+    result = dependent.result(5)
+    executor.shutdown()
+    return ran and 1 == result
+
+def test_shutdown_waiting():
+    executor = PriorityExecutor(2)
+    external = concurrent.futures.Future()
+    dependent = executor.submitAfter([external], PriorityExecutor.DEFAULT_PRIORITY, lambda: 1)
+    executor.shutdown(wait=False)
+    external.set_result(None)
+    executor.shutdown()
+    return dependent.done() and 1 == dependent.result()
+
+def hold_memory(executor, gate, memory):
+    """Start work that holds memory from a gate until an event is set, 
+    and wait for it to start.  Returns the event and the work's 
+    future."""
+    started = threading.Event()
+    release = threading.Event()
+    def hold():
+        started.set()
+        return release.wait()
+    future = executor.submitGated([], (0,), gate, memory, hold)
+    started.wait(5)
+    return (release, future)
+
+def test_gated_no_waiting():
+    # Threads aren't tied up by work that is waiting for memory; other work runs instead.
+    executor = PriorityExecutor(2)
+    gate = MemoryGate(100)
+    (release, holder) = hold_memory(executor, gate, 100)
+    waiting = executor.submitGated([], (-1,), gate, 50, lambda: gate.used())
+    other = executor.submitWithPriority((1,), lambda: 2)
+    ran = 2 == other.result(5) and not waiting.done()
+    release.set()
+    used = waiting.result(5)
+    executor.shutdown()
+    return ran and holder.result() and 50 == used and 0 == gate.used()
+
+def test_gated_order():
+    # Less important work doesn't start ahead of work for the same gate that doesn't fit yet.
+    executor = PriorityExecutor(2)
+    gate = MemoryGate(100)
+    (release, _) = hold_memory(executor, gate, 60)
+    order = []
+    large = executor.submitGated([], (1,), gate, 80, order.append, "large")
+    small = executor.submitGated([], (2,), gate, 10, order.append, "small")
+    concurrent.futures.wait([large, small], 0.2)
+    blocked = 0 == len(order)
+    release.set()
+    concurrent.futures.wait([large, small], 5)
+    executor.shutdown()
+    return blocked and ["large", "small"] == order
+
+def test_gated_release():
+    # Memory is released by work that fails or is cancelled.
+    (executor, release) = blocked_executor()
+    gate = MemoryGate(100)
+    failed = executor.submitGated([], (0,), gate, 40, lambda: 1 / 0)
+    cancelled = executor.submitGated([], (0,), gate, 40, print)
+    cancelled.cancel()
+    release.set()
+    executor.shutdown()
+    return isinstance(failed.exception(), ZeroDivisionError) and 0 == gate.used()
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing the task scheduler.")
+
+    def test_executor(description, func):
+        """Runs a test function and reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes no arguments and returns True on 
+                  success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            if func():
+                print("passed.")
+            else:
+                print("FAILED!")
+                testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_executor("ordering by priority", test_order)
+    test_executor("submission order for equal priorities", test_fifo)
+    test_executor("results and exceptions", test_results)
+    test_executor("cancellation of queued work", test_cancel)
+    test_executor("rejection of work after shutdown", test_shutdown)
+    test_executor("work with dependencies", test_dependencies)
+    test_executor("dependencies without holding threads", test_no_waiting)
+    test_executor("waiting work completing after shutdown", test_shutdown_waiting)
+    test_executor("work waiting for memory without holding threads", test_gated_no_waiting)
+    test_executor("order of work waiting for memory", test_gated_order)
+    test_executor("release of memory by failed work", test_gated_release)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's reorder buffer.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import random
+import threading
+
+from util import ReorderBuffer
+
+def test_in_order():
+    deliveries = []
+    buf = ReorderBuffer(deliveries.append)
+    buf.put(0, [1, 2])
+    buf.put(1, [3])
+    return [[1, 2], [3]] == deliveries
+
+def test_out_of_order():
+    deliveries = []
+    buf = ReorderBuffer(deliveries.append)
+    buf.put(2, [5])
+    buf.put(1, [3, 4])
+    held = 0 == len(deliveries)
+    # Everything that was waiting is delivered in one call.
+    buf.put(0, [1, 2])
+    return held and [[1, 2, 3, 4, 5]] == deliveries
+
+def test_empty():
+    deliveries = []
+    buf = ReorderBuffer(deliveries.append)
+    buf.put(1, [2])
+    buf.put(0, [])
+    buf.put(2, [])
+    return [[2]] == deliveries
+
+def test_threads():
+    results = []
+    buf = ReorderBuffer(results.extend)
+    order = list(range(200))
+    random.shuffle(order)
+    threads = [threading.Thread(target=buf.put, args=(i, [i])) for i in order]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return list(range(200)) == results
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing the reorder buffer.")
+
+    def test_buffer(description, func):
+        """Runs a test function and reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes no arguments and returns True on 
+                  success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            if func():
+                print("passed.")
+            else:
+                print("FAILED!")
+                testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_buffer("batches that arrive in order", test_in_order)
+    test_buffer("batches that arrive out of order", test_out_of_order)
+    test_buffer("empty batches", test_empty)
+    test_buffer("batches from many threads", test_threads)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
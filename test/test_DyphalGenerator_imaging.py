@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's imaging backends.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import io
+import math
+import base64
+import os
+import os.path
+import glob
+import shutil
+import tempfile
+import multiprocessing
+import concurrent.futures
+
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageFilter
+import PIL.ImageOps
+import PIL.ImageStat
+import PIL.features
+
+from imaging import DerivativeJob, ImageMagickBackend, PillowBackend, ImagingError, \
+                    generate_derivatives, alternate_path, structural_similarity, SpriteJob, \
+                    sprite_layout
+
+PHOTO_BOXES = [(640, 640), (320, 320)]
+THUMB_SIZE = (160, 120)
+THUMB_SCALES = [1, 2]
+FORMATS = ["webp"] + (["avif"] if PIL.features.check("avif") else [])
+QUALITY = 75
+# The backends use different resampling filters and JPEG encoders, so their output isn't 
+# identical.  The mean difference per channel must be less than this, out of 255.
+MAX_MEAN_DIFFERENCE = 3.0
+# Copies in other formats are compared to the JPEG, which has its own losses.
+MAX_FORMAT_DIFFERENCE = 8.0
+
+def make_job(source, out_dir_name, decode):
+    """Build a job for a photo the same way that PhotoFile does."""
+    with PIL.Image.open(source) as img:
+        (width, height) = img.size
+        transposed = img.getexif().get(0x0112, 1) in [5, 6, 7, 8]
+    if transposed:
+        width, height = (height, width)
+    thumb_size = THUMB_SIZE if width >= height else (THUMB_SIZE[1], THUMB_SIZE[0])
+    decode_size = None
+    if decode and (PHOTO_BOXES[0][0] < width or PHOTO_BOXES[0][1] < height):
+        decode_size = PHOTO_BOXES[0][::-1] if transposed else PHOTO_BOXES[0]
+    name = os.path.basename(source)
+    photos = [(os.path.join(out_dir_name, "%dx%d_%s" % (box[0], box[1], name)), box[0], box[1]) 
+              for box in PHOTO_BOXES]
+    thumbnails = [(os.path.join(out_dir_name, "thumb%dx_%s" % (scale, name)), 
+                   thumb_size[0] * scale, thumb_size[1] * scale) for scale in THUMB_SCALES]
+    return DerivativeJob(source, photos, QUALITY, thumbnails, QUALITY, FORMATS, decode_size, 30)
+
+def make_thumbnail_job(source, out_dir_name, decode):
+    """Build a job for just the thumbnails of a photo the same way that 
+    PhotoFile does."""
+    job = make_job(source, out_dir_name, decode)
+    with PIL.Image.open(source) as img:
+        transposed = img.getexif().get(0x0112, 1) in [5, 6, 7, 8]
+        (width, height) = img.size[::-1] if transposed else img.size
+    scale = max([max(thumb_width / width, thumb_height / height) 
+                 for (_, thumb_width, thumb_height) in job.thumbnails])
+    decode_size = None
+    if decode and 1 > scale:
+        decode_size = (int(math.ceil(scale * width)), int(math.ceil(scale * height)))
+        if transposed:
+            decode_size = decode_size[::-1]
+    return DerivativeJob(source, [], None, job.thumbnails, QUALITY, FORMATS, decode_size, 30)
+
+def output_paths(job):
+    """Return the paths of all of the files that a job generates."""
+    return [output for (path, _, _) in job.photos + job.thumbnails 
+            for output in [path] + [alternate_path(path, fmt) for fmt in job.formats]]
+
+def mean_difference(first, second):
+    """Return the mean absolute difference per channel between two 
+    images, or None if they are different sizes."""
+    with PIL.Image.open(first) as a, PIL.Image.open(second) as b:
+        if a.size != b.size:
+            return None
+        stat = PIL.ImageStat.Stat(PIL.ImageChops.difference(a.convert("RGB"), b.convert("RGB")))
+        return sum(stat.mean) / len(stat.mean)
+
+def test_geometry(dir_name, source, decode):
+    """Check that the Pillow backend produces oriented derivatives of 
+    the right sizes."""
+    job = make_job(source, dir_name, decode)
+    PillowBackend().generateDerivatives(job)
+    with PIL.Image.open(source) as img:
+        oriented = PIL.ImageOps.exif_transpose(img).size
+    for (path, width, height) in job.photos:
+        for output in [path] + [alternate_path(path, fmt) for fmt in job.formats]:
+            with PIL.Image.open(output) as photo:
+                scale = min(width / oriented[0], height / oriented[1], 1)
+                if 1 < abs(photo.width - oriented[0] * scale) \
+                   or 1 < abs(photo.height - oriented[1] * scale) or 0x0112 in photo.getexif():
+                    return False
+    for (path, width, height) in job.thumbnails:
+        for output in [path] + [alternate_path(path, fmt) for fmt in job.formats]:
+            with PIL.Image.open(output) as thumb:
+                if (width, height) != thumb.size:
+                    return False
+    return True
+
+def test_formats(dir_name, source, decode):
+    """Check that the copies in other formats really are in those 
+    formats and look like the originals."""
+    job = make_job(source, dir_name, decode)
+    PillowBackend().generateDerivatives(job)
+    for (path, _, _) in job.photos + job.thumbnails:
+        for fmt in job.formats:
+            with PIL.Image.open(alternate_path(path, fmt)) as img:
+                if fmt.upper() != img.format:
+                    return False
+            difference = mean_difference(path, alternate_path(path, fmt))
+            if None is difference or MAX_FORMAT_DIFFERENCE < difference:
+                return False
+    return True
+
+def test_rotated(dir_name, source, decode):
+    """Check the Pillow backend's output for a copy of a photo that 
+    needs to be rotated."""
+    rotated = os.path.join(dir_name, "rotated.jpg")
+    with PIL.Image.open(source) as img:
+        exif = img.getexif()
+        exif[0x0112] = 6
+        img.save(rotated, quality=90, exif=exif)
+    os.mkdir(os.path.join(dir_name, "out"))
+    return test_geometry(os.path.join(dir_name, "out"), rotated, decode)
+
+def test_quality_target(dir_name, source, decode):
+    """Check that the Pillow backend picks a lower quality that still 
+    meets a similarity target, and re-uses a previous result."""
+    job = make_job(source, dir_name, decode)
+    job.qualityTarget = 0.95
+    quality = PillowBackend().generateDerivatives(job)["quality"]
+    with PIL.Image.open(source) as img:
+        reference = PillowBackend._resize(PIL.ImageOps.exif_transpose(img), job.photos[0][1], 
+                                          job.photos[0][2])
+    with PIL.Image.open(job.photos[0][0]) as photo:
+        similarity = structural_similarity(reference, photo)
+    job.tunedQuality = QUALITY - 1
+    reused = PillowBackend().generateDerivatives(job)["quality"]
+    return PillowBackend.MIN_QUALITY <= quality < QUALITY and 0.95 <= similarity \
+           and QUALITY - 1 == reused
+
+def test_placeholder(dir_name, source, decode):
+    """Check that the Pillow backend makes a small placeholder with 
+    the photo's aspect ratio."""
+    job = make_job(source, dir_name, decode)
+    if None is not PillowBackend().generateDerivatives(job)["placeholder"]:
+        return False
+    job.placeholderSize = 8
+    placeholder = PillowBackend().generateDerivatives(job)["placeholder"]
+    prefix = "data:image/png;base64,"
+    if not placeholder.startswith(prefix) or 600 < len(placeholder):
+        return False
+    with PIL.Image.open(io.BytesIO(base64.b64decode(placeholder[len(prefix):]))) as img, \
+         PIL.Image.open(job.photos[0][0]) as photo:
+        # The placeholder is rounded to whole pixels.
+        return 8 == max(img.size) \
+               and 0.25 > abs(img.width / img.height - photo.width / photo.height)
+
+def test_thumbnail_job(dir_name, source, decode):
+    """Check that the Pillow backend makes the same thumbnails and a 
+    placeholder straight from the original when there are no 
+    scaled-down photos."""
+    os.mkdir(os.path.join(dir_name, "both"))
+    os.mkdir(os.path.join(dir_name, "thumbnails"))
+    job = make_job(source, os.path.join(dir_name, "both"), decode)
+    thumbnail_job = make_thumbnail_job(source, os.path.join(dir_name, "thumbnails"), decode)
+    thumbnail_job.placeholderSize = 8
+    PillowBackend().generateDerivatives(job)
+    result = PillowBackend().generateDerivatives(thumbnail_job)
+    if None is result["placeholder"] \
+       or sorted(os.listdir(os.path.join(dir_name, "thumbnails"))) \
+          != sorted([os.path.basename(path) for path in output_paths(thumbnail_job)]):
+        return False
+    for ((first, _, _), (second, width, height)) in zip(job.thumbnails, thumbnail_job.thumbnails):
+        with PIL.Image.open(second) as thumb:
+            if (width, height) != thumb.size:
+                return False
+        difference = mean_difference(first, second)
+        if None is difference or MAX_FORMAT_DIFFERENCE < difference:
+            return False
+    return True
+
+def test_similarity(dir_name, source, decode):
+    """Check that structural similarity is 1 for identical images and 
+    drops as an image is degraded."""
+    with PIL.Image.open(source) as img:
+        img = img.convert("RGB")
+        blurred = img.filter(PIL.ImageFilter.GaussianBlur(1))
+        very_blurred = img.filter(PIL.ImageFilter.GaussianBlur(4))
+        return 0.999 < structural_similarity(img, img) \
+               and structural_similarity(img, very_blurred) < structural_similarity(img, blurred) \
+               < 0.999
+
+def test_sprite_layout(dir_name, source, decode):
+    """Check that sprite sheet cells are laid out in a square-ish grid 
+    without overlapping."""
+    (width, height, positions) = sprite_layout(10, 160, 160)
+    return (640, 480) == (width, height) and 10 == len(set(positions)) \
+           and all(0 <= x <= width - 160 and 0 <= y <= height - 160 for (x, y) in positions) \
+           and (160, 160, [(0, 0)]) == sprite_layout(1, 160, 160)
+
+def test_sprite(dir_name, source, decode):
+    """Check that the Pillow backend puts each thumbnail in its place 
+    in a sprite sheet."""
+    sources = sorted(glob.glob(os.path.join("album", "*.jpg")))[:3]
+    jobs = [make_job(path, dir_name, decode) for path in sources]
+    for job in jobs:
+        PillowBackend().generateDerivatives(job)
+    cell = max(THUMB_SIZE)
+    (width, height, positions) = sprite_layout(len(jobs), cell, cell)
+    sprite = SpriteJob(os.path.join(dir_name, "sprite.jpg"), width, height, 
+                       [(job.thumbnails[0][0], x, y) for (job, (x, y)) in zip(jobs, positions)], 
+                       QUALITY, 30)
+    PillowBackend().generateSprite(sprite)
+    with PIL.Image.open(sprite.path) as sheet:
+        if (width, height) != sheet.size:
+            return False
+        for (job, (x, y)) in zip(jobs, positions):
+            (path, thumb_width, thumb_height) = job.thumbnails[0]
+            tile = os.path.join(dir_name, "tile.png")
+            sheet.crop((x, y, x + thumb_width, y + thumb_height)).save(tile)
+            difference = mean_difference(path, tile)
+            if None is difference or MAX_FORMAT_DIFFERENCE < difference:
+                return False
+    return True
+
+def test_time_limit(dir_name, source, decode):
+    """Check that a job's time limit grows with the number of images 
+    that it encodes."""
+    single = DerivativeJob(source, [(os.path.join(dir_name, "photo.jpg"), 640, 640)], QUALITY, 
+                           [(os.path.join(dir_name, "thumb.jpg"), 160, 120)], QUALITY, [], None, 
+                           5)
+    job = make_job(source, dir_name, decode)
+    outputs = len(job.photos + job.thumbnails) * (1 + len(job.formats))
+    if 10 != single.timeLimit() or 30 * outputs != job.timeLimit():
+        return False
+    job.qualityTarget = 0.95
+    job.placeholderSize = 8
+    return 30 * (outputs + PillowBackend.MAX_QUALITY_STEPS + 1) == job.timeLimit()
+
+def test_worker_process(dir_name, source, decode):
+    """Check that jobs and errors survive the trip to and from a worker
+    process."""
+    job = make_job(source, dir_name, decode)
+    bad_job = make_job(source, dir_name, decode)
+    bad_job.source = os.path.join(dir_name, "missing.jpg")
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")) as processes:
+        processes.submit(generate_derivatives, PillowBackend.NAME, job).result()
+        try:
+            processes.submit(generate_derivatives, PillowBackend.NAME, bad_job).result()
+            return False
+        except ImagingError as exc:
+            if bad_job.source != exc.path:
+                return False
+    return all(os.path.isfile(path) for path in output_paths(job))
+
+def test_equivalence(dir_name, source, decode):
+    """Check that the ImageMagick and Pillow backends produce 
+    equivalent output."""
+    os.mkdir(os.path.join(dir_name, "convert"))
+    os.mkdir(os.path.join(dir_name, "pillow"))
+    for make in [make_job, make_thumbnail_job]:
+        convert_job = make(source, os.path.join(dir_name, "convert"), decode)
+        pillow_job = make(source, os.path.join(dir_name, "pillow"), decode)
+        ImageMagickBackend().generateDerivatives(convert_job)
+        PillowBackend().generateDerivatives(pillow_job)
+        for (first, second) in zip(output_paths(convert_job), output_paths(pillow_job)):
+            difference = mean_difference(first, second)
+            if None is difference or MAX_MEAN_DIFFERENCE < difference:
+                return False
+    return True
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing imaging backends.")
+
+    def test_photo(description, func, source, decode):
+        """Runs a test function on a photo in a temporary directory and 
+        reports success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory, 
+                  the path to a photo and whether to use decoder scaling, 
+                  and returns True on success.
+          source: The path to a photo.
+          decode: True to let the decoder scale the photo down.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(temp_dir, source, decode):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    have_convert = None is not shutil.which("convert")
+    for source in sorted(glob.glob(os.path.join("album", "*.jpg"))):
+        name = os.path.basename(source)
+        test_photo("Pillow output for %s" % (name), test_geometry, source, False)
+        test_photo("Pillow output for %s, scaled decode" % (name), test_geometry, source, True)
+        test_photo("Pillow output for rotated %s" % (name), test_rotated, source, True)
+        if have_convert:
+            test_photo("equivalence for %s" % (name), test_equivalence, source, False)
+            test_photo("equivalence for %s, scaled decode" % (name), test_equivalence, source, 
+                       True)
+    test_photo("Pillow output in other formats", test_formats, 
+               os.path.join("album", "img_0357.jpg"), True)
+    test_photo("Pillow placeholder", test_placeholder, 
+               os.path.join("album", "img_2235.jpg"), True)
+    test_photo("Pillow thumbnails without scaled-down photos", test_thumbnail_job, 
+               os.path.join("album", "img_2235.jpg"), True)
+    test_photo("structural similarity", test_similarity, 
+               os.path.join("album", "img_0357.jpg"), False)
+    test_photo("Pillow quality search", test_quality_target, 
+               os.path.join("album", "img_0357.jpg"), False)
+    test_photo("sprite sheet layout", test_sprite_layout, None, False)
+    test_photo("Pillow sprite sheet", test_sprite, None, False)
+    test_photo("time limit for many outputs", test_time_limit, 
+               os.path.join("album", "img_0357.jpg"), True)
+    test_photo("Pillow backend in a worker process", test_worker_process, 
+               os.path.join("album", "img_0357.jpg"), True)
+    if not have_convert:
+        print("  Skipping comparisons with ImageMagick: 'convert' is not available.")
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""Test cases for DyphalGenerator's dependency probes. 
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import stat
+import subprocess
+import tempfile
+
+from util import probe_program
+
+TIMEOUT = 5
+
+def create_program(dir_name, name, status=0):
+    """Create a program that logs every time that it runs, and return 
+    its path and the path to its log."""
+    path = os.path.join(dir_name, name)
+    log = os.path.join(dir_name, name + ".log")
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\necho run >>'%s'\nexit %d\n" % (log, status))
+    os.chmod(path, stat.S_IRWXU)
+    return (path, log)
+
+def runs(log):
+    """Return the number of times that a program has run."""
+    try:
+        with open(log) as f:
+            return len(f.readlines())
+    except FileNotFoundError:
+        return 0
+
+def test_cached(dir_name):
+    (path, log) = create_program(dir_name, "prog")
+    probes = {}
+    probe_program([path, "--version"], probes, TIMEOUT)
+    probe_program([path, "--version"], probes, TIMEOUT)
+    return 1 == runs(log) and [path] == list(probes.keys())
+
+def test_changed(dir_name):
+    (path, log) = create_program(dir_name, "prog")
+    probes = {}
+    probe_program([path, "--version"], probes, TIMEOUT)
+    mtime = os.stat(path).st_mtime_ns + 1000000000
+    os.utime(path, ns=(mtime, mtime))
+    probe_program([path, "--version"], probes, TIMEOUT)
+    return 2 == runs(log) and {path: mtime} == probes
+
+def test_failure(dir_name):
+    (path, log) = create_program(dir_name, "prog", 1)
+    probes = {}
+    failures = 0
+    for _ in range(2):
+        try:
+            probe_program([path, "--version"], probes, TIMEOUT)
+        except subprocess.CalledProcessError:
+            failures += 1
+    return 2 == failures and 2 == runs(log) and {} == probes
+
+def test_missing(dir_name):
+    try:
+        probe_program([os.path.join(dir_name, "missing"), "--version"], {}, TIMEOUT)
+    except FileNotFoundError:
+        return True
+    return False
+
+def test_link(dir_name):
+    (path, log) = create_program(dir_name, "prog-1.0")
+    link = os.path.join(dir_name, "prog")
+    os.symlink(path, link)
+    probes = {}
+    probe_program([link, "--version"], probes, TIMEOUT)
+    probe_program([path, "--version"], probes, TIMEOUT)
+    return 1 == runs(log) and [path] == list(probes.keys())
+
+def main():
+    testsTotal = 0
+    testsFailed = 0
+    verbosity = 0
+
+    if 2 <= len(sys.argv):
+        if "-v" == sys.argv[1]:
+            verbosity = 1
+        elif "-vv" == sys.argv[1]:
+            verbosity = 2
+
+    print("Testing dependency probes.")
+
+    def test_probe(description, func):
+        """Runs a test function in a temporary directory and reports 
+        success or failure.
+
+        Arguments:
+          description: A description of the test case, at most 55 characters.
+          func: A function that takes the name of a temporary directory and 
+                  returns True on success.
+        """
+        print("  Testing %s... " % (description), end="")
+        nonlocal testsTotal, testsFailed
+        testsTotal += 1
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                if func(os.path.realpath(temp_dir)):
+                    print("passed.")
+                else:
+                    print("FAILED!")
+                    testsFailed += 1
+        except (Exception) as ex:
+            print("FAILED!")
+            testsFailed += 1
+            if 1 <= verbosity:
+                print(ex)
+
+    test_probe("a program that passed isn't run again", test_cached)
+    test_probe("a program that changed is run again", test_changed)
+    test_probe("a program that failed is run again", test_failure)
+    test_probe("a missing program", test_missing)
+    test_probe("links share their target's result", test_link)
+
+    if 0 != testsFailed:
+        print("ERROR: %d of %d tests failed!" % (testsFailed, testsTotal))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -36,14 +36,9 @@ __date__ = "DATE"
 import sys
 import os
 import os.path
-import xml.etree.ElementTree
 import concurrent.futures
 import subprocess
-import json
-import tempfile
-import traceback
 import functools
-import shutil
 import urllib.parse
 
 from PyQt5 import QtCore
@@ -52,145 +47,13 @@ from PyQt5 import QtWidgets
 
 from dyphal.ui import Ui_MainWindow
 from dyphal.about import Ui_AboutDialog
-from dyphal.util import DirectoryHandleList, handle_exceptions, ensure_directory
+from dyphal.util import PriorityExecutor, handle_exceptions, probe_program
+from dyphal.config import Config
+from dyphal.imaging import ImageMagickBackend
+from dyphal.metadata import FieldIndex
 from dyphal.photo import PhotoFile
-from dyphal.album import Album, ParseError, SaveError
-
-# These variables may be re-written by the installation script
-DATA_PATH = os.path.expanduser("~/.share/dyphal/")
-CONFIG_PATH = os.path.expanduser("~/.config/")
-CONFIG_NAME = "DyphalGenerator.conf"
-
-
-class Config(object):
-    """Run-time configuration.
-
-    Attributes:
-        photoDir (str): The name of the directory from which photos 
-                were last imported.
-        gthumb3Dir (str): The name of the directory from which a gThumb 
-                3 catalog was last imported.
-        outputDir (str): The name of the directory where an album was 
-                last created.
-        photoQuality (int): The quality percentage for resized photos.
-        maxWorkers (int): The maximum number of background threads to 
-                use.
-        dimensions ((int, int)): The current window dimensions.
-        uiData (dict): Contents of certain UI fields that were saved 
-                from the last session.
-        tempDir (tempfile.TemporaryDirectory): A secure temporary 
-                directory to hold links to photos and generated files.
-        _file (file): A handle to the configuration file.
-        _umask (int): Saved umask.
-    """
-
-    PROGRAM_NAME = "Dyphal Generator"
-    THUMB_WIDTH = 160
-    THUMB_HEIGHT = 120
-    THUMB_QUALITY = 50
-    BG_TIMEOUT = 5
-    TEMPLATE_FILE_NAMES = ["album.css", "back.png", "common.css", "debug.css", "dyphal.js", 
-                           "help.png", "index.html", "javascript.html", "next.png", 
-                           "photo.css", "placeholder.png", "prev.png", "README.html"]
-
-    DEFAULT_PHOTO_DIR = os.path.expanduser("~")
-    DEFAULT_GTHUMB3_DIR = os.path.expanduser("~/.local/share/gthumb/catalogs")
-    DEFAULT_GTHUMB2_DIR = os.path.expanduser("~/.gnome2/gthumb/collections")
-    DEFAULT_OUTPUT_DIR = os.path.expanduser("~")
-    DEFAULT_PHOTO_QUALITY = 75
-    DEFAULT_THREADS = 8
-
-    METADATA_DIR = "metadata"
-    PHOTO_DIR = "photos"
-    THUMBNAIL_DIR = "thumbnails"
-
-    def __init__(self):
-        """Set up run-time configuration.  Load the configuration file 
-        and set up shared resources.  Populate any run-time properties 
-        not found in the file with sane defaults."""
-        # Load the configuration file.  Keep the handle so that we can save to the same file.
-        self._file = None
-        data = {}
-        self._umask = os.umask(0o22)
-        try:
-            ensure_directory(CONFIG_PATH)
-            # Python's 'r+' mode doesn't create files if they don't already exist.
-            self._file = open(os.path.join(CONFIG_PATH, CONFIG_NAME), "r+", 
-                              opener=lambda path, flags: os.open(path, flags|os.O_CREAT, 0o666))
-            data = json.load(self._file)
-        except (FileNotFoundError, ValueError):
-            # open() can fail with FileNotFoundError if a directory in the path doesn't exist.
-            # json.load() can fail with ValueError if the file is empty or otherwise invalid.
-            pass
-        except Exception:
-            # We'll just ignore any other failures and continue without a configuration file.
-            (exc_type, exc_value, exc_traceback) = sys.exc_info()
-            traceback.print_exception(exc_type, exc_value, exc_traceback)
-
-        # Used during operation and stored in the configuration file
-        self.photoDir = data["photoDir"] if "photoDir" in data else self.DEFAULT_PHOTO_DIR
-        self.gthumb3Dir = data["gthumb3Dir"] if "gthumb3Dir" in data else self.DEFAULT_GTHUMB3_DIR
-        #self.gthumb2Dir = data["gthumb2Dir"] if "gthumb2Dir" in data else self.DEFAULT_GTHUMB2_DIR
-        self.outputDir = data["outputDir"] if "outputDir" in data else self.DEFAULT_OUTPUT_DIR
-        self.photoQuality = self.DEFAULT_PHOTO_QUALITY
-        if "photoQuality" in data and 0 < data["photoQuality"] and 100 >= data["photoQuality"]:
-            self.photoQuality = data["photoQuality"]
-
-        # Used only at startup and stored in the configuration file
-        ideal_thread_count = QtCore.QThread.idealThreadCount()
-        if 0 < ideal_thread_count:
-            # Some tasks are I/O-bound and some are CPU-bound, so let's go with
-            # twice the number of CPU cores.
-            self.maxWorkers = 2 * ideal_thread_count
-        else:
-            self.maxWorkers = self.DEFAULT_THREADS
-        if "threads" in data and 0 < data["threads"] and 50 >= data["threads"]:
-            self.maxWorkers = data["threads"]
-        self.dimensions = data["dimensions"] if "dimensions" in data else None
-        self.uiData = data["uiData"] if "uiData" in data else None
-
-        # Not stored in the configuration file
-        self.tempDir = tempfile.TemporaryDirectory()
-
-        # Do we have /prod/pid/fd?
-        try:
-            with open("/proc/%d/fd/0" % (os.getpid())) as fh:
-                self.haveProcPid = True
-        except (FileNotFoundException, os.error):
-            self.haveProcPid = False
-
-    def save(self):
-        """Save the current state to the configuration file."""
-        # If we couldn't open or create the config file, don't bother saving.
-        if None is not self._file:
-            data = {}
-            data["photoDir"] = self.photoDir
-            data["gthumb3Dir"] = self.gthumb3Dir
-            data["outputDir"] = self.outputDir
-            data["photoQuality"] = self.photoQuality
-            data["threads"] = self.maxWorkers
-            data["dimensions"] = self.dimensions
-            data["uiData"] = self.uiData
-
-            self._file.seek(0)
-            self._file.truncate(0)
-            json.dump(data, self._file, sort_keys=True)
-            self._file.flush()
-
-    def close(self):
-        """Close the configuration file and tear down shared resources."""
-        self.tempDir.cleanup()
-        self.tempDir = None
-        self._file.close()
-        self._file = None
-        os.umask(self._umask)
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.close()
-
+from dyphal.album import Album, ParseError
+from dyphal.engine import Engine
 
 class ListKeyFilter(QtCore.QObject):
     """QT filter to handle certain keypress events."""
@@ -210,18 +73,33 @@ class ListKeyFilter(QtCore.QObject):
         return False
 
 
+class PhotoListItem(PhotoFile, QtWidgets.QListWidgetItem):
+    """A photo in the album's photo list."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize a PhotoListItem."""
+        super().__init__(*args, **kwargs)
+        self.setText(self.getDescription())
+
+
 class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
     """The Dyphal Generator UI.
 
     Attributes (not including UI objects):
         _config (Config): The run-time configuration object.
-        _threads (concurrent.futures.Executor): The thread pool for 
-                background tasks.
+        _engine (Engine): Loads photos and generates albums in the 
+                background.
         _backgroundCount (int): The number of background activities 
                 (*not* tasks) that are pending.
         _backgroundTasks (list of concurrent.futures.Future): Pending 
                 background tasks.
         _currentAlbumFileName (str): The name of the current album file.
+        _propertyIndex (FieldIndex): The properties of the photos in 
+                the album.
+        _captionIndex (FieldIndex): The captions of the photos in the 
+                album.
+        _propertyMenuFields (list of str): The properties in the menu.
+        _captionMenuFields (list of str): The captions in the menu.
         _dirty (bool): True if the album data has changed since the 
                 last save; false otherwise.
     """
@@ -230,7 +108,7 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
     FILTER_GTHUMB3_CATALOGS = "gThumb catalogs (*.catalog)"
     FILTER_ALBUMS = "Albums (*.dyphal);;JSON Albums (*.json);;All (*.*)"
 
-    _addPhotoSignal = QtCore.pyqtSignal(PhotoFile, bool)  # A photo is ready to be added to the UI.
+    _addPhotosSignal = QtCore.pyqtSignal(list, bool)  # Photos are ready to be added to the UI.
     _showErrorSignal = QtCore.pyqtSignal(str)  # An error message needs to be displayed.
     _incProgressSignal = QtCore.pyqtSignal()  # A background processing step has completed.
     _backgroundCompleteSignal = QtCore.pyqtSignal(bool)  # Background processing has completed.
@@ -238,6 +116,7 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
     _setAlbumDataSignal = QtCore.pyqtSignal(str, dict)  # An album has been loaded.
     _closeSignal = QtCore.pyqtSignal() # Program exit was requested from a background thread.
     _dirtySignal = QtCore.pyqtSignal(bool) # A background thread dirtied or undirtied the album.
+    _missingProgramSignal = QtCore.pyqtSignal(str)  # A required program isn't available.
 
     def __init__(self, config):
         """Initialize a DyphalUI.  Hooks up event handlers and 
@@ -245,10 +124,14 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         Designer can't do."""
         super().__init__()
         self._config = config
-        self._threads = concurrent.futures.ThreadPoolExecutor(self._config.maxWorkers)
+        self._engine = Engine(self._config)
         self._backgroundCount = 0
         self._backgroundTasks = None
         self._currentAlbumFileName = None
+        self._propertyIndex = FieldIndex()
+        self._captionIndex = FieldIndex()
+        self._propertyMenuFields = None
+        self._captionMenuFields = None
 
         self.setupUi(self)
         if None is not self._config.dimensions:
@@ -296,7 +179,7 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.removePhotosButton.clicked.connect(self._removePhotosHandler)
         self.photosList.itemSelectionChanged.connect(self._showProperties)
         self.photosList.itemActivated.connect(self._showPhoto)
-        self._addPhotoSignal.connect(self._addPhoto)
+        self._addPhotosSignal.connect(self._addPhotos)
         self._showErrorSignal.connect(self._showError)
         self._incProgressSignal.connect(self._incProgress)
         self._backgroundCompleteSignal.connect(self._backgroundComplete)
@@ -324,15 +207,47 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.footerText.textChanged.connect(self._setDirty)
         self.descriptionText.textChanged.connect(self._setDirty)
         self._dirtySignal.connect(self._setDirty)
+        self._missingProgramSignal.connect(self._missingProgram)
+
+    def checkDependencies(self):
+        """Start background tasks to check that the programs that we 
+        need are available.  If any aren't, tell the user and exit."""
+        checks = [(["exiftool", "-ver"], 
+                   "This program requires that 'exiftool' be available in your PATH.")]
+        if ImageMagickBackend.NAME == self._config.imaging.NAME:
+            checks.append((["convert", "--version"], 
+                           "This program requires that 'convert' from the 'ImageMagick' package " \
+                           "be available in your PATH."))
+        tasks = [self._engine.threads.submit(probe_program, args, self._config.probes, 
+                                             Config.BG_TIMEOUT) for (args, _) in checks]
+        self._engine.threads.submitAfter(tasks, PriorityExecutor.DEFAULT_PRIORITY, 
+                                         functools.partial(handle_exceptions, 
+                                                           self._bgCheckDependenciesComplete), 
+                                         tasks, [message for (_, message) in checks])
+
+    def _bgCheckDependenciesComplete(self, tasks, messages):
+        """Background task to report the first program that isn't 
+        available, if any."""
+        for (task, message) in zip(tasks, messages):
+            try:
+                task.result()
+            except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+                self._missingProgramSignal.emit(message)
+                break
+
+    def _missingProgram(self, message):
+        """Tell the user that a required program isn't available, then 
+        exit."""
+        QtWidgets.QMessageBox.critical(self, Config.PROGRAM_NAME, message, 
+                                       QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
+        self.close()
 
     def _setDirty(self, dirty=True):
         """Marks the current album as having changed."""
         self._dirty = dirty
 
-    def _bgExit(self, pending_tasks):
+    def _bgExit(self):
         """Background task to trigger program exit."""
-        if None is not pending_tasks:
-            concurrent.futures.wait(pending_tasks)
         self._backgroundCompleteSignal.emit(True)
         # self.close() can't be called from a background thread.
         self._closeSignal.emit()
@@ -371,14 +286,15 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
                 # Post a background task to exit after everything else completes.
                 # Don't register the task so that it cannot be cancelled.
                 self._backgroundInit(0)
-                self._threads.submit(self._bgExit, self._backgroundTasks)
+                self._engine.threads.submitAfter(list(self._backgroundTasks), 
+                                                 PriorityExecutor.DEFAULT_PRIORITY, self._bgExit)
                 self._backgroundStart([])
                 event.ignore()
                 return
             else:
                 self._cancelBackgroundTasks()
 
-        self._threads.shutdown()
+        self._engine.close()
         self._config.dimensions = (self.size().width(), self.size().height())
         self._config.uiData = self._saveUIData()
         self._config.save()
@@ -444,6 +360,8 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
             # The QT documentation says that getOpenFileName returns a null string on cancel.  But 
             # it returns an empty string here.  Maybe that's a PyQt bug?
             if "" != catalog_file_name:
+                # Catalogs are rarely used, so the XML parser isn't loaded at start-up.
+                import xml.etree.ElementTree
                 tree = xml.etree.ElementTree.parse(catalog_file_name)
                 if "1.0" == tree.getroot().get("version"):
                     # Files appear in arbitrary order in older gThumb 3 catalog files?
@@ -463,45 +381,80 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         """Start background tasks to load a list of photos."""
         if 0 < len(filenames):
             self._backgroundInit(len(filenames))
-            tasks = []
-            task = None
-            for (path, name) in filenames:
-                task = self._threads.submit(self._bgAddPhoto, path, name, task, dirtying)
-                task.photoName = path
-                tasks.append(task)
-            task = self._threads.submit(functools.partial(handle_exceptions, 
-                                                          self._bgAddPhotoComplete), tasks)
+            tasks = self._engine.loadPhotos(filenames, 
+                                            lambda photos: self._addPhotosSignal.emit(photos, 
+                                                                                      dirtying), 
+                                            self._incProgressSignal.emit, PhotoListItem)
+            task = self._engine.threads.submitAfter(tasks, PriorityExecutor.DEFAULT_PRIORITY, 
+                                                    functools.partial(handle_exceptions, 
+                                                                      self._bgAddPhotoComplete), 
+                                                    tasks)
             self._backgroundStart(tasks+[task])
 
     def _removePhotosHandler(self):
         """Remove the currently selected photos from the album."""
-        items = self.photosList.selectedItems()
-        if 0 < len(items):
+        rows = sorted([index.row() for index in self.photosList.selectionModel().selectedRows()])
+        if 0 < len(rows):
             # Clear the selection so that I donn't need to update the selection and make callbacks 
             # with every deletion, which takes a while.
             self.photosList.clearSelection()
-
-            # I need to remove the photo from the list on foreground thread, because the list is 
-            # owned by the GUI.  I need to close the Photo object on a background thread, because 
-            # that's I/O.
-            self._backgroundInit(len(items))
-            tasks = []
-            task = None
-            for item in items:
-                photo = self.photosList.takeItem(self.photosList.indexFromItem(item).row())
-                task = self._threads.submit(self._bgRemovePhoto, photo)
-                tasks.append(task)
-            task = self._threads.submit(functools.partial(handle_exceptions, 
-                                                          self._bgRemovePhotosComplete), tasks)
-            self._backgroundStart(tasks+[task])
-            if 0 == self.photosList.count():
-                self.generateAlbumButton.setVisible(False)
-            self._dirty = True
-
-    def _addPhoto(self, photo, dirtying):
-        """Add a photo that has been loaded to the album."""
-        self.photosList.addItem(photo)
+            self._removePhotos(rows)
+
+    def _removePhotos(self, rows):
+        """Remove the photos in a sorted list of rows from the album."""
+        # I need to remove the photos from the list on foreground thread, because the list is 
+        # owned by the GUI.  I need to close the Photo objects on a background thread, because 
+        # that's I/O.
+        # Looking up an item's row is linear, as is taking an item from the middle of the list, so 
+        # work from row numbers.  Removing rows from the model deletes the list's side of the 
+        # items, but everything that the Photo objects need to be closed is on our side, and we 
+        # keep references to them.
+        self._backgroundInit(1)
+        photos = [self.photosList.item(row) for row in rows]
+        self.photosList.setUpdatesEnabled(False)
+        if len(rows) == self.photosList.count():
+            self.photosList.clear()
+        else:
+            # Remove each run of adjacent rows in one operation, last first so that the rows 
+            # before it don't move.
+            runs = []
+            for row in rows:
+                if 0 != len(runs) and runs[-1][1] + 1 == row:
+                    runs[-1][1] = row
+                else:
+                    runs.append([row, row])
+            model = self.photosList.model()
+            for (first, last) in reversed(runs):
+                if not model.removeRows(first, last - first + 1):
+                    # The model refused; take the items one at a time instead.
+                    for row in range(last, first - 1, -1):
+                        self.photosList.takeItem(row)
+        self.photosList.setUpdatesEnabled(True)
+        if 0 == self.photosList.count():
+            self._propertyIndex.clear()
+            self._captionIndex.clear()
+            self.generateAlbumButton.setVisible(False)
+        else:
+            for photo in photos:
+                self._propertyIndex.remove(photo.properties)
+                self._captionIndex.remove(photo.captions)
+        task = self._engine.threads.submit(functools.partial(handle_exceptions, 
+                                                             self._bgRemovePhotos), photos)
+        self._backgroundStart([task])
+        self._dirty = True
+
+    def _addPhotos(self, photos, dirtying):
+        """Add photos that have been loaded to the album."""
+        # QListWidget can't insert many items in one operation, but it can at least skip redrawing 
+        # after each one.
+        self.photosList.setUpdatesEnabled(False)
+        for photo in photos:
+            self.photosList.addItem(photo)
+            self._propertyIndex.add(photo.properties)
+            self._captionIndex.add(photo.captions)
+        self.photosList.setUpdatesEnabled(True)
         self.generateAlbumButton.setVisible(True)
+        self.progressBar.setValue(self.progressBar.value() + len(photos))
         if dirtying:
             self._dirty = True
 
@@ -535,7 +488,8 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
     def _backgroundInit(self, steps):
         """Initialize the progress bar for a background action.  This 
-        must occur before any background tasks can run."""
+        must occur before any progress from its background tasks is 
+        processed."""
         self._backgroundCount += 1
         if 1 == self._backgroundCount:
             self._backgroundTasks = []
@@ -568,52 +522,13 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
             if 0 < self.photosList.count():
                 self.generateAlbumButton.setVisible(True)
 
-    def _bgAddPhoto(self, path, name, prev_task, dirtying):
-        """Background task to load a photo and signal the UI to add it 
-        to the album when done."""
-        photo = PhotoFile(path, name, self._config)
-        photo.addRef()
-        # Wait for the previous photo to be loaded so that photos are added to the list in the 
-        # correct order.
-        if None is not prev_task:
-            concurrent.futures.wait([prev_task])
-        self._addPhotoSignal.emit(photo, dirtying)
-        self._incProgressSignal.emit()
-
     def _bgAddPhotoComplete(self, tasks):
         """Background task to display any errors encountered while 
         loading photos, prompt the user to rename any photos with non-
         unique names, and update the lists of available properties and 
         captions."""
-        # Wait for the addPhoto tasks to complete.
-        (done, not_done) = concurrent.futures.wait(tasks)
-        assert 0 == len(not_done)
-
         # Display any error messages and find any files that need to be renamed
-        errors = []
-        rename_photos = []
-        for task in done:
-            try:
-                task.result()
-            except FileNotFoundError as exc:
-                # Either exiftool or the photo was missing.
-                if "exiftool" == exc.filename:
-                    errors.append("Error executing 'exiftool'.  Is it installed?")
-                else:
-                    errors.append("Error opening photo " + exc.filename)
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                # Exiftool failed or timed out.
-                errors.append("Error reading metadata from photo " + task.photoName)
-            except FileExistsError:
-                # The symlink target already exists, implying a duplicate file name.
-                rename_photos.append(task.photoName)
-            except concurrent.futures.CancelledError:
-                # The task was cancelled.
-                pass
-            except:
-                (exc_type, exc_value, exc_traceback) = sys.exc_info()
-                traceback.print_exception(exc_type, exc_value, exc_traceback)
-                errors.append(str(exc_type) + ": " + str(exc_value))
+        (errors, rename_photos) = Engine.loadErrors(tasks)
         if 0 != len(errors):
             self._showErrorSignal.emit(str(len(errors)) +
                                        " errors were encountered loading files:\n" +
@@ -630,17 +545,12 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         # Re-enable any disabled buttons
         self._backgroundCompleteSignal.emit(False)
 
-    def _bgRemovePhoto(self, photo):
-        """Background task to clean up after removing a photo."""
-        photo.release()
+    def _bgRemovePhotos(self, photos):
+        """Background task to clean up after removing photos."""
+        for photo in photos:
+            photo.release()
         self._incProgressSignal.emit()
 
-    def _bgRemovePhotosComplete(self, tasks):
-        """Background task to perform clean-up after removing photos."""
-        # Wait for the removePhoto tasks to complete.
-        not_done = concurrent.futures.wait(tasks)[1]
-        assert 0 == len(not_done)
-
         # Update the available properties and captions
         self.showAllPropertiesFlag.stateChanged.emit(0)
         self.showAllCaptionsFlag.stateChanged.emit(0)
@@ -649,45 +559,26 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self._backgroundCompleteSignal.emit(False)
 
     def _updatePhotoProperties(self):
-        """Rebuild the list of properties available in the currently 
+        """Update the list of properties available in the currently 
         loaded photos."""
-        properties = {}
-        count = self.photosList.count()
-        for i in range(count):
-            photo = self.photosList.item(i)
-            for prop in photo.properties.keys():
-                if prop in properties:
-                    properties[prop] += 1
-                else:
-                    properties[prop] = 1
-
-        # Rebuild the list
-        self._addPropertyButtonMenu.clear()
-        show_all = self.showAllPropertiesFlag.isChecked()
-        for prop in sorted(properties.keys()):
-            if show_all or count == properties[prop]:
+        properties = self._propertyIndex.fields(not self.showAllPropertiesFlag.isChecked())
+        # Only rebuild the list if it changed.
+        if properties != self._propertyMenuFields:
+            self._addPropertyButtonMenu.clear()
+            for prop in properties:
                 self._addPropertyButtonMenu.addAction(prop, self._addPropertyHandler)
+            self._propertyMenuFields = properties
 
     def _updatePhotoCaptions(self):
-        """Rebuild the list of captions available in the currently 
+        """Update the list of captions available in the currently 
         loaded photos."""
-        # Figure out what caption fields we have.
-        captions = {}
-        count = self.photosList.count()
-        for i in range(count):
-            photo = self.photosList.item(i)
-            for prop in photo.captions.keys():
-                if prop in captions:
-                    captions[prop] += 1
-                else:
-                    captions[prop] = 1
-
-        # Rebuild the list
-        self._addCaptionButtonMenu.clear()
-        show_all = self.showAllCaptionsFlag.isChecked()
-        for prop in sorted(captions.keys()):
-            if show_all or count == captions[prop]:
+        captions = self._captionIndex.fields(not self.showAllCaptionsFlag.isChecked())
+        # Only rebuild the list if it changed.
+        if captions != self._captionMenuFields:
+            self._addCaptionButtonMenu.clear()
+            for prop in captions:
                 self._addCaptionButtonMenu.addAction(prop, self._addCaptionHandler)
+            self._captionMenuFields = captions
 
     def _addCaptionHandler(self):
         """Add the selected caption field to the album captions."""
@@ -746,149 +637,31 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
             selected = album_file_name
 
         if "" != album_file_name:
-            album_dir_name = os.path.dirname(album_file_name)
-
-            album = self._saveUIData()
-            album["metadataDir"] = urllib.parse.quote(Config.METADATA_DIR + "/")
-            album["title"] = self.titleText.toPlainText()
-            album["description"] = self.descriptionText.toPlainText()
-            album["photos"] = \
-                [self.photosList.item(i).getAlbumJSON() for i in range(0, self.photosList.count())]
-
-            # To prevent the output directory from being changed while generating files, we do the 
-            # following:
-            #  1. Create a secure temporary directory.
-            #  2. Open the output directory.  Get its file descriptor.
-            #  3. Construct the /proc/<pid>/fd/<fd> path to the directory using the file 
-            #     descriptor.
-            #  4. Create a symlink from the temporary directory to the /proc path.  The link's name 
-            #     is unique but predictable; that's ok because the directory is secure.
-            #  5. Use the symlink as the path when creating files.
-
-            self._backgroundInit(3 * self.photosList.count() + 5)
-            tasks = []
-            directories = DirectoryHandleList()
-
-            # Create the output directories.
-            # We read and write directories from different threads, but there's no race 
-            # because the read tasks are blocked until after the write task completes.
-            album_dir_task = self._threads.submit(self._bgCreateOutputDirectory, album_dir_name, 
-                                                  directories, "album")
-            tasks.append(album_dir_task)
-            metadata_dir_task = None
-            if 0 != len(Config.METADATA_DIR):
-                metadata_dir_task = self._threads.submit(self._bgCreateOutputDirectory, 
-                                                         os.path.join(album_dir_name, 
-                                                                      Config.METADATA_DIR), 
-                                                         directories, "metadata")
-                tasks.append(metadata_dir_task)
-            photo_dir_task = None
-            if 0 != len(Config.PHOTO_DIR):
-                photo_dir_task = self._threads.submit(self._bgCreateOutputDirectory, 
-                                                      os.path.join(album_dir_name, 
-                                                                   Config.PHOTO_DIR), 
-                                                      directories, "photos")
-                tasks.append(photo_dir_task)
-            thumbnail_dir_task = None
-            if 0 != len(Config.THUMBNAIL_DIR):
-                thumbnail_dir_task = self._threads.submit(self._bgCreateOutputDirectory, 
-                                                          os.path.join(album_dir_name, 
-                                                                       Config.THUMBNAIL_DIR), 
-                                                          directories, "thumbnails")
-                tasks.append(thumbnail_dir_task)
-
-            # Create the album JSON file
-            tasks.append(self._threads.submit(self._bgGenerateAlbum, album, 
-                                              lambda: os.path.join(
-                                                            directories.getPath("album"), 
-                                                            os.path.basename(album_file_name)), 
-                                              album_dir_task))
-
-            # Create the metadata, thumbnail, and image for each photo.
-            count = self.photosList.count()
-            if 0 < count:
-                captions = album["captionFields"]
-                properties = album["propertyFields"]
-                for i in range(0, count):
-                    photo = self.photosList.item(i)
-                    # In Python 3.4, I might be able to use functools.partialmethod to create a 
-                    # generic wrapper that calls self._incProgressSignal.emit() after an arbitrary 
-                    # method call, rather than needing to write wrappers for every method call.
-                    task = self._threads.submit(self._bgGeneratePhotoJSON, photo, 
-                                                lambda: directories.getPath("metadata"), 
-                                                album["photoResolution"][0], 
-                                                album["photoResolution"][1], captions, properties, 
-                                                metadata_dir_task)
-                    photo.addRef()
-                    task.photoName = photo.getPath()
-                    tasks.append(task)
-                    task = self._threads.submit(self._bgGeneratePhoto, photo, 
-                                                lambda: directories.getPath("photos"), 
-                                                album["photoResolution"][0], 
-                                                album["photoResolution"][1], 
-                                                self._config.photoQuality, photo_dir_task)
-                    photo.addRef()
-                    task.photoName = photo.getPath()
-                    tasks.append(task)
-                    task = self._threads.submit(self._bgGenerateThumbnail, photo, 
-                                                lambda: directories.getPath("thumbnails"), 
-                                                Config.THUMB_WIDTH, Config.THUMB_HEIGHT, 
-                                                Config.THUMB_QUALITY, thumbnail_dir_task)
-                    photo.addRef()
-                    task.photoName = photo.getPath()
-                    tasks.append(task)
-
-            task = self._threads.submit(functools.partial(handle_exceptions, 
-                                                          self._bgTasksComplete), 
-                                        tasks, directories, "generating the album", cleansing=True)
-            self._backgroundStart(tasks+[task])
-
-            self._config.outputDir = album_dir_name
+            settings = self._saveUIData()
+            settings["title"] = self.titleText.toPlainText()
+            settings["description"] = self.descriptionText.toPlainText()
+            photos = [self.photosList.item(i) for i in range(0, self.photosList.count())]
+            # Progress is reported through queued signals, so it isn't processed before the 
+            # progress bar is initialized.
+            operation = self._engine.generateAlbum(album_file_name, settings, photos, 
+                                                   self._incProgressSignal.emit)
+            self._backgroundInit(operation.steps)
+            task = self._engine.threads.submitAfter([operation.done], 
+                                                    PriorityExecutor.DEFAULT_PRIORITY, 
+                                                    functools.partial(handle_exceptions, 
+                                                                      self._bgTasksComplete), 
+                                                    operation, "generating the album", 
+                                                    cleansing=True)
+            self._backgroundStart(operation.tasks+[operation.done, task])
+
+            self._config.outputDir = os.path.dirname(album_file_name)
             self._currentAlbumFileName = album_file_name
             self.setWindowTitle(Config.PROGRAM_NAME + ": " + os.path.basename(album_file_name))
 
-    def _bgCreateOutputDirectory(self, dir_path, directories, name):
-        """Background task to create a directory and link to it from 
-        the temporary directory."""
-        ensure_directory(dir_path)
-        dir_fd = os.open(dir_path, os.O_RDONLY)
-        directories.add(name, dir_fd)
-        self._incProgressSignal.emit()
-
-    def _bgGenerateAlbum(self, album_data, get_album_file_name, dir_creation_task):
-        """Background task to generate an album JSON file."""
-        if None is not dir_creation_task:
-            concurrent.futures.wait([dir_creation_task])
-        Album.save(get_album_file_name(), album_data)
-        self._incProgressSignal.emit()
-
-    def _bgTasksComplete(self, tasks, directories, message, cleansing=False):
+    def _bgTasksComplete(self, operation, message, cleansing=False):
         """Background task to display any errors encountered while 
-        executing background tasks and clean up any file descriptors 
-        and links that were needed by the background tasks."""
-        # Wait for the tasks to complete.
-        (done, not_done) = concurrent.futures.wait(tasks)
-        assert 0 == len(not_done)
-
-        # Close any file descriptors.  Ignore errors.
-        directories.closeAll()
-
-        # Display any error messages
-        errors = []
-        for task in done:
-            try:
-                task.result()
-            except concurrent.futures.CancelledError:
-                pass
-            except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-                # convert failed or timed out.
-                errors.append("Error resizing " + task.photoName)
-            except (SaveError) as exc:
-                errors.append(str(exc))
-            except:
-                (exc_type, exc_value, exc_traceback) = sys.exc_info()
-                traceback.print_exception(exc_type, exc_value, exc_traceback)
-                errors.append(str(exc_type) + ": " + str(exc_value))
+        executing a background operation."""
+        errors = operation.done.result()
         if 0 != len(errors):
             self._showErrorSignal.emit("%d errors were encountered while %s:\n" % 
                                        (len(errors), message) + "\n".join(errors))
@@ -900,40 +673,13 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
         if cleansing:
             self._dirtySignal.emit(False)
 
-    def _bgGeneratePhotoJSON(self, photo, get_out_dir_name, width, height, captions, properties, 
-                             dir_creation_task):
-        """Background task to generate a photo JSON file."""
-        # Wait for the directory to be created, then generate the photo JSON
-        if None is not dir_creation_task:
-            concurrent.futures.wait([dir_creation_task])
-        photo.generateJSON(get_out_dir_name(), width, height, captions, properties)
-        photo.release()
-        self._incProgressSignal.emit()
-
-    def _bgGeneratePhoto(self, photo, get_out_dir_name, width, height, quality, dir_creation_task):
-        """Background task to generate a down-scaled photo."""
-        # Wait for the directory to be created, then generate the photo
-        if None is not dir_creation_task:
-            concurrent.futures.wait([dir_creation_task])
-        photo.generatePhoto(get_out_dir_name(), width, height, quality)
-        photo.release()
-        self._incProgressSignal.emit()
-
-    def _bgGenerateThumbnail(self, photo, get_out_dir_name, width, height, quality, 
-                             dir_creation_task):
-        """Background task to generate a photo thumbnail."""
-        # Wait for the directory to be created, then generate the thumbnail
-        if None is not dir_creation_task:
-            concurrent.futures.wait([dir_creation_task])
-        photo.generateThumbnail(get_out_dir_name(), width, height, quality)
-        photo.release()
-        self._incProgressSignal.emit()
-
     def _closeAlbum(self, use_defaults):
         """Clear the current album data."""
-        # Clear the selected photos.  I can't just call clear() because there's cleanup to do.
-        self.photosList.selectAll()
-        self._removePhotosHandler()
+        # Remove the photos.  I can't just call clear() because there's cleanup to do, but 
+        # _removePhotos() does once it has kept the photos.
+        self.photosList.clearSelection()
+        if 0 != self.photosList.count():
+            self._removePhotos(range(self.photosList.count()))
 
         # Clear selections and text fields.  Restore defaults if available.
         if use_defaults and None is not self._config.uiData:
@@ -980,8 +726,9 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
                 self._closeAlbum(use_defaults=False)
                 # Load the file in a background thread.
                 self._backgroundInit(1)
-                task = self._threads.submit(functools.partial(handle_exceptions, 
-                                                              self._bgLoadAlbum), album_file_name)
+                task = self._engine.threads.submit(functools.partial(handle_exceptions, 
+                                                                     self._bgLoadAlbum), 
+                                                   album_file_name)
                 self._backgroundStart([task])
 
     def _bgLoadAlbum(self, album_file_name):
@@ -1029,34 +776,14 @@ class DyphalUI(QtWidgets.QMainWindow, Ui_MainWindow):
                                                        | QtWidgets.QFileDialog.DontUseNativeDialog)
 
         if "" != out_dir:
-            self._backgroundInit(len(Config.TEMPLATE_FILE_NAMES) + 1)
-            tasks = []
-            directories = DirectoryHandleList()
-
-            # Create the directory.
-            album_dir_task = self._threads.submit(self._bgCreateOutputDirectory, out_dir, 
-                                                  directories, "album")
-            tasks.append(album_dir_task)
-
-            # Spawn background tasks to do the copying.
-            for name in Config.TEMPLATE_FILE_NAMES:
-                tasks.append(self._threads.submit(self._bgCopyFile, os.path.join(DATA_PATH, name), 
-                                                  lambda filename=name: os.path.join(
-                                                          directories.getPath("album"), filename), 
-                                                  album_dir_task))
-
-            task = self._threads.submit(functools.partial(handle_exceptions, 
-                                                          self._bgTasksComplete), 
-                                        tasks, directories, "installing the template")
-            self._backgroundStart(tasks+[task])
-
-    def _bgCopyFile(self, source, get_destination, dir_creation_task):
-        """Background task to copy a file."""
-        # Wait for the directory to be created, then copy the file
-        if None is not dir_creation_task:
-            concurrent.futures.wait([dir_creation_task])
-        shutil.copyfile(source, get_destination())
-        self._incProgressSignal.emit()
+            operation = self._engine.installTemplate(out_dir, self._incProgressSignal.emit)
+            self._backgroundInit(operation.steps)
+            task = self._engine.threads.submitAfter([operation.done], 
+                                                    PriorityExecutor.DEFAULT_PRIORITY, 
+                                                    functools.partial(handle_exceptions, 
+                                                                      self._bgTasksComplete), 
+                                                    operation, "installing the template")
+            self._backgroundStart(operation.tasks+[operation.done, task])
 
     def _cancelBackgroundTasks(self):
         """Attempt to cancel any pending background tasks."""
@@ -1116,8 +843,8 @@ def main():
     """Main."""
     app = QtWidgets.QApplication(sys.argv)
 
-    # Check that the Python version is at least 3.3, that we're on an OS with /proc/<pid>/fd/<fd>, 
-    # and that exiftool and convert are available.  Error out if not.
+    # Check that the Python version is at least 3.3 and that we're on an OS with 
+    # /proc/<pid>/fd/<fd>.  Error out if not.
     if sys.version_info.major < 3 or (sys.version_info.major == 3 and sys.version_info.minor < 3):
         QtWidgets.QMessageBox.critical(None, Config.PROGRAM_NAME, 
                                        "This program requires Python 3.3 or newer.", 
@@ -1131,24 +858,12 @@ def main():
                                        "This program currently only runs on Linux.", 
                                        QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
         sys.exit(1)
-    try:
-        subprocess.check_call(["exiftool", "-ver"], stdout=subprocess.DEVNULL, timeout=1)
-    except (IOError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
-        QtWidgets.QMessageBox.critical(None, Config.PROGRAM_NAME, 
-                                   "This program requires that 'exiftool' be available in your " \
-                                   "PATH.", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
-        sys.exit(1)
-    try:
-        subprocess.check_call(["convert", "--version"], stdout=subprocess.DEVNULL, timeout=1)
-    except (IOError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
-        QtWidgets.QMessageBox.critical(None, Config.PROGRAM_NAME, "This program requires that " \
-                                  "'convert' from the 'ImageMagick' package be available in " \
-                                  "your PATH.", QtWidgets.QMessageBox.Ok, QtWidgets.QMessageBox.Ok)
-        sys.exit(1)
 
     with Config() as config:
         wnd = DyphalUI(config)
         wnd.show()
+        # Running exiftool and convert takes a while, so check for them once the window is up.
+        wnd.checkDependencies()
         sys.exit(app.exec_())
 
 
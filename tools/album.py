@@ -165,9 +165,13 @@ class Album(object):
         # Strip out the data that we don't need to save.
         album_data = copy.deepcopy(data)
         del album_data["metadataDir"]
+        album_data.pop("sprites", None)
         for photo in album_data["photos"]:
             del photo["name"]
             del photo["thumbnail"]
+            photo.pop("thumbnails", None)
+            photo.pop("sprite", None)
+            photo.pop("placeholder", None)
             del photo["orientation"]
         web_data = copy.deepcopy(data)
         del web_data["captionFields"]
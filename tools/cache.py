@@ -0,0 +1,125 @@
+"""Persistent photo metadata cache for DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+import time
+import traceback
+
+
+class MetadataCache(object):
+    """A bounded, persistent cache of photo metadata.
+
+    Entries are keyed by the identity of a photo file (device, inode,
+    size and modification time) plus a string describing how the
+    metadata was extracted, so any change to a file or to the
+    extraction method results in a cache miss.  When the cache grows
+    beyond its maximum size, the least recently used entries are
+    evicted.
+
+    The cache is only an optimization.  Database errors are logged and
+    otherwise treated as cache misses.
+
+    Attributes:
+        _maxEntries (int): The maximum number of entries to keep.
+        _connection (sqlite3.Connection): The cache database.
+        _lock (threading.Lock): Serializes access to the database.
+    """
+
+    DEFAULT_MAX_ENTRIES = 20000
+
+    def __init__(self, file_name, max_entries=DEFAULT_MAX_ENTRIES):
+        """Open or create a cache database.  May throw sqlite3.Error if
+        the database cannot be opened."""
+        self._maxEntries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file_name, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS metadata (" \
+                                     "device INTEGER NOT NULL, inode INTEGER NOT NULL, " \
+                                     "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, " \
+                                     "method TEXT NOT NULL, data TEXT NOT NULL, " \
+                                     "last_used REAL NOT NULL, " \
+                                     "PRIMARY KEY (device, inode, size, mtime_ns, method))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS metadata_last_used " \
+                                     "ON metadata (last_used)")
+
+    @staticmethod
+    def fileKey(path):
+        """Return the identity of a file, for use as a cache key.  May
+        throw OSError if the file cannot be examined."""
+        stat = os.stat(path)
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def lookup(self, keys, method):
+        """Look up a list of file keys.  Returns a dict mapping the keys
+        that were found to their cached data."""
+        results = {}
+        if 0 == len(keys):
+            return results
+        with self._lock:
+            try:
+                for key in keys:
+                    row = self._connection.execute("SELECT data FROM metadata WHERE device=? " \
+                                                   "AND inode=? AND size=? AND mtime_ns=? " \
+                                                   "AND method=?", key + (method,)).fetchone()
+                    if None is not row:
+                        results[key] = json.loads(row[0])
+                if 0 != len(results):
+                    now = time.time()
+                    with self._connection:
+                        self._connection.executemany("UPDATE metadata SET last_used=? " \
+                                                     "WHERE device=? AND inode=? AND size=? " \
+                                                     "AND mtime_ns=? AND method=?",
+                                                     [(now,) + key + (method,) for key in results])
+            except (sqlite3.Error, ValueError):
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+        return results
+
+    def store(self, items, method):
+        """Add a dict mapping file keys to data to the cache.  Any
+        entries for older versions of the same files are discarded."""
+        if 0 == len(items):
+            return
+        with self._lock:
+            try:
+                now = time.time()
+                with self._connection:
+                    # A file that has changed has a new key; get rid of the old one.
+                    self._connection.executemany("DELETE FROM metadata WHERE device=? AND " \
+                                                 "inode=? AND (size!=? OR mtime_ns!=?)",
+                                                 list(items.keys()))
+                    self._connection.executemany("INSERT OR REPLACE INTO metadata VALUES " \
+                                                 "(?, ?, ?, ?, ?, ?, ?)",
+                                                 [key + (method, json.dumps(data), now)
+                                                  for (key, data) in items.items()])
+                    self._connection.execute("DELETE FROM metadata WHERE rowid IN (SELECT rowid " \
+                                             "FROM metadata ORDER BY last_used DESC LIMIT -1 " \
+                                             "OFFSET ?)", (self._maxEntries,))
+            except (sqlite3.Error, ValueError):
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+
+    def close(self):
+        """Close the cache database."""
+        with self._lock:
+            self._connection.close()
+            self._connection = None
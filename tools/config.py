@@ -0,0 +1,350 @@
+"""Run-time configuration for DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import json
+import tempfile
+import traceback
+import concurrent.futures
+
+from dyphal.util import MemoryGate, ensure_directory
+from dyphal.exiftool import ExifToolPool
+from dyphal.cache import MetadataCache
+from dyphal.imaging import ImageMagickBackend, get_backend, generate_derivatives, \
+                           generate_sprite, DEFAULT_BACKEND, FORMATS
+
+# These variables may be re-written by the installation script
+DATA_PATH = os.path.expanduser("~/.share/dyphal/")
+CONFIG_PATH = os.path.expanduser("~/.config/")
+CONFIG_NAME = "DyphalGenerator.conf"
+CACHE_NAME = "DyphalGenerator.cache"
+
+
+class Config(object):
+    """Run-time configuration.
+
+    Attributes:
+        photoDir (str): The name of the directory from which photos 
+                were last imported.
+        gthumb3Dir (str): The name of the directory from which a gThumb 
+                3 catalog was last imported.
+        outputDir (str): The name of the directory where an album was 
+                last created.
+        photoQuality (int): The quality percentage for resized photos.
+        photoQualityTarget (float): If not None, each resized photo uses 
+                the lowest quality, up to photoQuality, at which its 
+                structural similarity (SSIM) to the uncompressed photo 
+                is at least this.  Only supported by in-process imaging 
+                backends.
+        photoLadder (list of (int, int)): Smaller resolutions at which to 
+                generate extra copies of each photo, for viewers with 
+                small screens, such as [[640, 480], [1024, 768]].  
+                Resolutions that aren't smaller than the album's photo 
+                resolution are ignored.  Empty by default.
+        photoFormats (list of str): Formats in which to write extra 
+                copies of every scaled-down photo and thumbnail, for 
+                browsers that support them.  See imaging.FORMATS.
+        spriteSize (int): The maximum number of thumbnails to pack into 
+                each sprite sheet for the album page, or 0 to not 
+                generate sprite sheets.
+        maxWorkers (int): The maximum number of background threads to 
+                use.
+        maxProcesses (int): The maximum number of worker processes to 
+                use for CPU-bound work.
+        metadataCacheSize (int): The maximum number of photos to keep 
+                in the metadata cache.
+        memoryBudget (int): The memory that concurrent imaging work may 
+                use, in MiB.
+        debugMetadata (bool): If True, extract all metadata from photos 
+                and print it rather than only extracting what we need.
+        fastMetadata (bool): If True, read metadata from JPEG files 
+                directly where possible rather than using exiftool.
+        imagingBackend (str): The name of the imaging backend to use to 
+                generate scaled-down photos and thumbnails.
+        dimensions ((int, int)): The current window dimensions.
+        uiData (dict): Contents of certain UI fields that were saved 
+                from the last session.
+        probes (dict): The real paths of the required programs that 
+                have been found to work, mapped to their modification 
+                times then.  See util.probe_program().
+        tempDir (tempfile.TemporaryDirectory): A secure temporary 
+                directory to hold links to photos and generated files.
+        exiftool (ExifToolPool): Persistent exiftool processes shared 
+                by all photos.
+        metadataCache (MetadataCache): Metadata from previously-loaded 
+                photos, or None if the cache could not be opened, or in 
+                read-only mode, if it doesn't exist.
+        imaging (object): The imaging backend.
+        memoryGate (MemoryGate): Keeps concurrent imaging work within 
+                the memory budget.  Work is admitted when it is 
+                dispatched; see PriorityExecutor.submitGated().
+        processes (concurrent.futures.ProcessPoolExecutor): Worker 
+                processes for in-process imaging backends, or None if 
+                the imaging backend doesn't need them.
+        _file (file): A handle to the configuration file, or None in 
+                read-only mode.
+        _umask (int): Saved umask.
+    """
+
+    PROGRAM_NAME = "Dyphal Generator"
+    THUMB_WIDTH = 160
+    THUMB_HEIGHT = 120
+    THUMB_QUALITY = 50
+    # Thumbnails are generated at these multiples of their display size, for high-density displays.
+    THUMB_SCALES = [1, 2]
+    # Sprite sheets are encoded from thumbnails that have already lost some quality.
+    SPRITE_QUALITY = 75
+    # Placeholders are PNGs that fit in a square this size, which come to a few hundred bytes each 
+    # in the album JSON.
+    PLACEHOLDER_SIZE = 8
+    BG_TIMEOUT = 5
+    METADATA_BATCH_SIZE = 50
+    TEMPLATE_FILE_NAMES = ["album.css", "back.png", "common.css", "debug.css", "dyphal.js", 
+                           "help.png", "index.html", "javascript.html", "next.png", 
+                           "photo.css", "placeholder.png", "prev.png", "README.html"]
+
+    DEFAULT_PHOTO_DIR = os.path.expanduser("~")
+    DEFAULT_GTHUMB3_DIR = os.path.expanduser("~/.local/share/gthumb/catalogs")
+    DEFAULT_GTHUMB2_DIR = os.path.expanduser("~/.gnome2/gthumb/collections")
+    DEFAULT_OUTPUT_DIR = os.path.expanduser("~")
+    DEFAULT_PHOTO_QUALITY = 75
+    # Extra sizes of every photo take time and space, so none are generated unless asked for.
+    DEFAULT_PHOTO_LADDER = []
+    # Sprite sheets change how the album page loads thumbnails, so they are only generated if asked 
+    # for.
+    DEFAULT_SPRITE_SIZE = 0
+    DEFAULT_THREADS = 8
+    DEFAULT_MEMORY_BUDGET = 1024
+
+    METADATA_DIR = "metadata"
+    PHOTO_DIR = "photos"
+    THUMBNAIL_DIR = "thumbnails"
+
+    def __init__(self, jobs=None, read_only=False):
+        """Set up run-time configuration.  Load the configuration file 
+        and set up shared resources.  Populate any run-time properties 
+        not found in the file with sane defaults.  If jobs is not None, 
+        it overrides the configured numbers of threads and processes.  
+        If read_only is True, the configuration file and metadata cache 
+        are used if they exist, but nothing is created and save() does 
+        nothing."""
+        # Load the configuration file.  Keep the handle so that we can save to the same file.
+        self._file = None
+        data = {}
+        self._umask = os.umask(0o22)
+        try:
+            if read_only:
+                with open(os.path.join(CONFIG_PATH, CONFIG_NAME)) as config_file:
+                    data = json.load(config_file)
+            else:
+                ensure_directory(CONFIG_PATH)
+                # Python's 'r+' mode doesn't create files if they don't already exist.
+                self._file = open(os.path.join(CONFIG_PATH, CONFIG_NAME), "r+", 
+                                  opener=lambda path, flags: os.open(path, flags|os.O_CREAT, 
+                                                                     0o666))
+                data = json.load(self._file)
+        except (FileNotFoundError, ValueError):
+            # open() can fail with FileNotFoundError if a directory in the path doesn't exist.
+            # json.load() can fail with ValueError if the file is empty or otherwise invalid.
+            pass
+        except Exception:
+            # We'll just ignore any other failures and continue without a configuration file.
+            (exc_type, exc_value, exc_traceback) = sys.exc_info()
+            traceback.print_exception(exc_type, exc_value, exc_traceback)
+
+        # Used during operation and stored in the configuration file
+        self.photoDir = data["photoDir"] if "photoDir" in data else self.DEFAULT_PHOTO_DIR
+        self.gthumb3Dir = data["gthumb3Dir"] if "gthumb3Dir" in data else self.DEFAULT_GTHUMB3_DIR
+        #self.gthumb2Dir = data["gthumb2Dir"] if "gthumb2Dir" in data else self.DEFAULT_GTHUMB2_DIR
+        self.outputDir = data["outputDir"] if "outputDir" in data else self.DEFAULT_OUTPUT_DIR
+        self.photoQuality = self.DEFAULT_PHOTO_QUALITY
+        if "photoQuality" in data and 0 < data["photoQuality"] and 100 >= data["photoQuality"]:
+            self.photoQuality = data["photoQuality"]
+        self.photoQualityTarget = None
+        if "photoQualityTarget" in data and None is not data["photoQualityTarget"] \
+           and 0 < data["photoQualityTarget"] and 1 > data["photoQualityTarget"]:
+            self.photoQualityTarget = data["photoQualityTarget"]
+        self.photoLadder = data["photoLadder"] if "photoLadder" in data \
+                           else self.DEFAULT_PHOTO_LADDER
+        # Not every browser supports these formats, so they're only ever in addition to the format 
+        # of the original photo.
+        self.photoFormats = []
+        if "photoFormats" in data:
+            self.photoFormats = [image_format for image_format in data["photoFormats"] 
+                                 if image_format in FORMATS]
+        self.spriteSize = self.DEFAULT_SPRITE_SIZE
+        if "spriteSize" in data and 0 <= data["spriteSize"]:
+            self.spriteSize = data["spriteSize"]
+
+        # Used only at startup and stored in the configuration file
+        ideal_thread_count = os.cpu_count() or 0
+        if 0 < ideal_thread_count:
+            # Some tasks are I/O-bound and some are CPU-bound, so let's go with
+            # twice the number of CPU cores.
+            self.maxWorkers = 2 * ideal_thread_count
+        else:
+            self.maxWorkers = self.DEFAULT_THREADS
+        if "threads" in data and 0 < data["threads"] and 50 >= data["threads"]:
+            self.maxWorkers = data["threads"]
+        # CPU-bound work can't use more processes than there are CPU cores.
+        self.maxProcesses = ideal_thread_count if 0 < ideal_thread_count else self.DEFAULT_THREADS
+        if "processes" in data and 0 < data["processes"] and 50 >= data["processes"]:
+            self.maxProcesses = data["processes"]
+        if None is not jobs:
+            self.maxWorkers = jobs
+            self.maxProcesses = jobs
+        self.metadataCacheSize = MetadataCache.DEFAULT_MAX_ENTRIES
+        if "metadataCacheSize" in data and 0 < data["metadataCacheSize"]:
+            self.metadataCacheSize = data["metadataCacheSize"]
+        self.memoryBudget = self._defaultMemoryBudget()
+        if "memoryBudget" in data and 0 < data["memoryBudget"]:
+            self.memoryBudget = data["memoryBudget"]
+        self.debugMetadata = data["debugMetadata"] if "debugMetadata" in data else False
+        self.fastMetadata = data["fastMetadata"] if "fastMetadata" in data else True
+        self.imagingBackend = data["imagingBackend"] if "imagingBackend" in data \
+                              else DEFAULT_BACKEND
+        self.dimensions = data["dimensions"] if "dimensions" in data else None
+        self.uiData = data["uiData"] if "uiData" in data else None
+        self.probes = data["probes"] if "probes" in data and dict is type(data["probes"]) else {}
+
+        # Not stored in the configuration file
+        self.tempDir = tempfile.TemporaryDirectory()
+        # At most one exiftool command can be running per background thread.
+        self.exiftool = ExifToolPool(self.maxWorkers, self.BG_TIMEOUT)
+        # Re-reading the metadata for every photo each time that an album is opened is slow.  If 
+        # the cache can't be opened, we'll just have to do without it.
+        self.metadataCache = None
+        if not read_only or os.path.isfile(os.path.join(CONFIG_PATH, CACHE_NAME)):
+            try:
+                self.metadataCache = MetadataCache(os.path.join(CONFIG_PATH, CACHE_NAME), 
+                                                   self.metadataCacheSize)
+            except Exception:
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+
+        # If the configured imaging backend isn't available, fall back to ImageMagick.
+        try:
+            self.imaging = get_backend(self.imagingBackend)
+        except (ValueError, ImportError):
+            (exc_type, exc_value, exc_traceback) = sys.exc_info()
+            traceback.print_exception(exc_type, exc_value, exc_traceback)
+            self.imaging = ImageMagickBackend()
+        # Decoding a large photo takes hundreds of megabytes, so running one per worker can exhaust 
+        # memory on a machine with many cores.
+        self.memoryGate = MemoryGate(self.memoryBudget * 1024 * 1024)
+        # In-process backends hold the GIL, so they need processes rather than threads to use more 
+        # than one core.  Worker processes are started on demand.  Don't fork a process with Qt 
+        # and a bunch of threads in it.
+        self.processes = None
+        if self.imaging.IN_PROCESS:
+            # Only in-process backends need multiprocessing, which is slow to import.
+            import multiprocessing
+            self.processes = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.maxProcesses, mp_context=multiprocessing.get_context("spawn"))
+
+        # Do we have /prod/pid/fd?  Don't go by standard input, which may be closed or a socket 
+        # when run from a script.
+        self.haveProcPid = os.path.isdir("/proc/%d/fd" % (os.getpid()))
+
+    def save(self):
+        """Save the current state to the configuration file."""
+        # If we couldn't open or create the config file, don't bother saving.
+        if None is not self._file:
+            data = {}
+            data["photoDir"] = self.photoDir
+            data["gthumb3Dir"] = self.gthumb3Dir
+            data["outputDir"] = self.outputDir
+            data["photoQuality"] = self.photoQuality
+            data["photoQualityTarget"] = self.photoQualityTarget
+            data["photoLadder"] = self.photoLadder
+            data["photoFormats"] = self.photoFormats
+            data["spriteSize"] = self.spriteSize
+            data["threads"] = self.maxWorkers
+            data["processes"] = self.maxProcesses
+            data["metadataCacheSize"] = self.metadataCacheSize
+            data["memoryBudget"] = self.memoryBudget
+            data["debugMetadata"] = self.debugMetadata
+            data["fastMetadata"] = self.fastMetadata
+            data["imagingBackend"] = self.imagingBackend
+            data["dimensions"] = self.dimensions
+            data["uiData"] = self.uiData
+            data["probes"] = self.probes
+
+            self._file.seek(0)
+            self._file.truncate(0)
+            json.dump(data, self._file, sort_keys=True)
+            self._file.flush()
+
+    @classmethod
+    def _defaultMemoryBudget(cls):
+        """Return half of the physical memory in MiB, or a fixed 
+        default if it can't be determined."""
+        try:
+            memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+            if 0 < memory:
+                return memory // (2 * 1024 * 1024)
+        except (ValueError, OSError, AttributeError):
+            pass
+        return cls.DEFAULT_MEMORY_BUDGET
+
+    def generateDerivatives(self, job):
+        """Generate the files described by a DerivativeJob using the 
+        configured imaging backend, in a worker process if it needs 
+        one.  The caller must already have admitted 
+        job.memoryEstimate(imaging.BYTES_PER_PIXEL) bytes through 
+        memoryGate.  Blocks until the files have been written, and 
+        raises any exception that the backend raised.  Returns the 
+        quality of the scaled-down photos and the placeholder in a dict."""
+        if None is not self.processes:
+            return self.processes.submit(generate_derivatives, self.imaging.NAME, job).result()
+        return self.imaging.generateDerivatives(job)
+
+    def generateSprite(self, job):
+        """Generate the sprite sheet described by a SpriteJob using the 
+        configured imaging backend, in a worker process if it needs 
+        one.  The caller must already have admitted 
+        job.memoryEstimate(imaging.BYTES_PER_PIXEL) bytes through 
+        memoryGate.  Blocks until the file has been written, and raises 
+        any exception that the backend raised."""
+        if None is not self.processes:
+            self.processes.submit(generate_sprite, self.imaging.NAME, job).result()
+        else:
+            self.imaging.generateSprite(job)
+
+    def close(self):
+        """Close the configuration file and tear down shared resources."""
+        if None is not self.processes:
+            self.processes.shutdown()
+            self.processes = None
+        self.exiftool.close()
+        self.exiftool = None
+        if None is not self.metadataCache:
+            self.metadataCache.close()
+            self.metadataCache = None
+        self.tempDir.cleanup()
+        self.tempDir = None
+        if None is not self._file:
+            self._file.close()
+            self._file = None
+        os.umask(self._umask)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
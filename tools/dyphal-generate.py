@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+"""Command-line album generator for Dyphal, the Dynamic Photo Album.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+dyphal-generate re-generates a photo album from an album file created 
+by DyphalGenerator, without a graphical user interface.  It uses the 
+same configuration file and metadata cache as DyphalGenerator if they 
+exist, but never creates them or changes the configuration file.
+
+dyphal-generate requires Python 3.3 or later, only runs on Linux, and 
+requires that the commands 'convert' from the ImageMagick package and 
+'exiftool' are available in the current path.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+__author__ = "Rennie deGraaf <rennie.degraaf@gmail.com>"
+__version__ = "VERSION"
+__date__ = "DATE"
+
+import argparse
+import sys
+import os
+import os.path
+import concurrent.futures
+import urllib.parse
+
+from dyphal.config import Config
+from dyphal.album import Album, ParseError
+from dyphal.engine import Engine
+
+
+def generate(engine, album_file_name, settings, filenames, install_template):
+    """Load a list of (path, name) photos and generate an album from 
+    them.  Returns a list of error messages."""
+    # Load the photos, in album order.
+    photos = []
+    tasks = engine.loadPhotos(filenames, photos.extend, lambda: None)
+    try:
+        (errors, duplicates) = Engine.loadErrors(tasks)
+        # There's no way to rename photos here.
+        errors.extend("There is already a photo with the name %s in the album" % 
+                      (os.path.basename(photo_name)) for photo_name in duplicates)
+        if 0 != len(errors):
+            return errors
+
+        operations = []
+        if install_template:
+            operations.append(engine.installTemplate(os.path.dirname(album_file_name), 
+                                                     lambda: None))
+        operations.append(engine.generateAlbum(album_file_name, settings, photos, 
+                                               lambda: None))
+        for operation in operations:
+            errors.extend(operation.done.result())
+        return errors
+    finally:
+        # Photos from batches that loaded after an error still hold references.
+        concurrent.futures.wait(tasks)
+        for photo in photos:
+            photo.release()
+
+
+def main():
+    """Main."""
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Generate a Dyphal photo album from an album " + 
+                                                 "file.")
+    parser.add_argument("-t", "--install-template", required=False, action="store_true", 
+                        help="Also install the album template in the album's directory.")
+    parser.add_argument("-j", "--jobs", metavar="<count>", type=int, required=False, 
+                        help="Number of background threads and worker processes to use.")
+    parser.add_argument("album_file_name", metavar="album", type=str, 
+                        help="Album file to generate.")
+    args = parser.parse_args()
+    if None is not args.jobs and 1 > args.jobs:
+        parser.error("--jobs must be at least 1")
+
+    try:
+        data = Album.load(args.album_file_name)
+    except (OSError) as exc:
+        print("Error reading '%s': %s." % (args.album_file_name, str(exc)), file=sys.stderr)
+        sys.exit(1)
+    except (ParseError) as exc:
+        print("Error loading an album from '%s': %s" % (args.album_file_name, str(exc)), 
+              file=sys.stderr)
+        sys.exit(1)
+    try:
+        settings = Engine.albumSettings(data)
+        filenames = []
+        for photo in data["photos"]:
+            path = urllib.parse.unquote(photo["path"])
+            filenames.append((os.path.expanduser(path), os.path.basename(path)))
+    except KeyError:
+        print("Unable to load an album from '%s'." % (args.album_file_name), file=sys.stderr)
+        sys.exit(1)
+
+    # Build servers may not have a configuration file, and shouldn't get one.
+    with Config(args.jobs, read_only=True) as config:
+        engine = Engine(config)
+        try:
+            errors = generate(engine, os.path.abspath(args.album_file_name), settings, filenames, 
+                              args.install_template)
+        finally:
+            engine.close()
+
+    if 0 != len(errors):
+        print("%d errors were encountered while generating the album:\n" % (len(errors)) + 
+              "\n".join(errors), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
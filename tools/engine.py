@@ -0,0 +1,555 @@
+"""Album generation engine for DyphalGenerator. 
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import os
+import os.path
+import math
+import shutil
+import subprocess
+import traceback
+import concurrent.futures
+import urllib.parse
+
+from dyphal import __version__
+from dyphal.util import DirectoryHandleList, PriorityExecutor, ReorderBuffer, ensure_directory
+from dyphal.config import Config, DATA_PATH
+from dyphal.manifest import Manifest
+from dyphal.imaging import ImagingError, SpriteJob, sprite_layout
+from dyphal.photo import PhotoFile
+from dyphal.album import Album, SaveError
+
+
+class Operation(object):
+    """Background work started by the engine.
+
+    Attributes:
+        tasks (list of concurrent.futures.Future): The tasks that make 
+                up the operation.  Any that haven't started may be 
+                cancelled.
+        steps (int): The number of times that the tasks will report 
+                progress.
+        done (concurrent.futures.Future): Completes once all of the 
+                tasks are done and their resources have been cleaned 
+                up.  Its result is a list of error messages.  Cancelling 
+                it doesn't stop the clean-up, which always runs.
+    """
+
+    def __init__(self, tasks, steps, done):
+        """Initialize an Operation."""
+        self.tasks = tasks
+        self.steps = steps
+        self.done = done
+
+
+class Engine(object):
+    """Loads photos, generates albums and installs the album template, 
+    using background threads.  Doesn't depend on any particular user 
+    interface; progress is reported through callbacks, which are called 
+    from background threads.
+
+    Attributes:
+        threads (PriorityExecutor): The thread pool for background 
+                tasks.  User interfaces may submit their own tasks to it.
+        _config (Config): The run-time configuration object.
+    """
+
+    # Album generation tasks that are ready to run are run in this order.  The album JSON, photo 
+    # JSON, thumbnails and sprite sheets are all that a viewer needs to browse the album, and they 
+    # are cheap, so they go first.  The scaled-down photos are expensive, so they go last, largest 
+    # first so that the largest photos don't end up running alone at the end.  Anything else runs 
+    # after them.
+    PRIORITY_DIRECTORY = (-7,)
+    PRIORITY_ALBUM_JSON = (-6,)
+    PRIORITY_PHOTO_JSON = (-5,)
+    PRIORITY_THUMBNAILS = (-4,)
+    PRIORITY_PLACEHOLDERS = (-3,)
+    PRIORITY_SPRITES = (-2,)
+    PRIORITY_PHOTOS = -1
+
+    def __init__(self, config):
+        """Initialize an Engine."""
+        self._config = config
+        self.threads = PriorityExecutor(config.maxWorkers)
+
+    def close(self):
+        """Wait for any background tasks to complete, then shut down the 
+        thread pool."""
+        self.threads.shutdown()
+
+    def loadPhotos(self, filenames, deliver, progress, photo_class=PhotoFile):
+        """Start background tasks to load a list of (path, name) photos. 
+        Lists of photos that have been loaded are passed to deliver in 
+        the same order as filenames, with a reference held on each. 
+        Returns a list of tasks, the results of which are lists of 
+        (path, exception) tuples for the photos that could not be 
+        loaded.  progress is called once for every photo that could 
+        not be loaded; it's up to deliver to count the rest."""
+        tasks = []
+        # Batches are loaded in parallel, but the photos are delivered in order.
+        reorder_buffer = ReorderBuffer(deliver)
+        # Read metadata in batches to save on exiftool overhead, but keep the batches small enough 
+        # that every thread gets some work.
+        batch_size = max(1, min(Config.METADATA_BATCH_SIZE, 
+                                math.ceil(len(filenames) / self._config.maxWorkers)))
+        for (index, i) in enumerate(range(0, len(filenames), batch_size)):
+            task = self.threads.submit(self._bgLoadPhotos, photo_class, filenames[i:i+batch_size], 
+                                       index, reorder_buffer, progress)
+            # A batch that is cancelled before it is loaded mustn't hold up the ones after it.
+            task.add_done_callback(lambda task, index=index: 
+                                       reorder_buffer.put(index, []) if task.cancelled() else None)
+            tasks.append(task)
+        return tasks
+
+    def _bgLoadPhotos(self, photo_class, filenames, index, reorder_buffer, progress):
+        """Background task to load a batch of photos and pass them to a 
+        reorder buffer, which will deliver them once the batches before 
+        them have been delivered.  Returns a list of (path, exception) 
+        tuples for the photos that could not be loaded."""
+        photos = []
+        failures = []
+        try:
+            for ((path, _), photo) in zip(filenames, 
+                                          photo_class.loadBatch(filenames, self._config)):
+                if isinstance(photo, Exception):
+                    failures.append((path, photo))
+                    progress()
+                else:
+                    photo.addRef()
+                    photos.append(photo)
+        finally:
+            # The batches after this one can't be delivered until it has been, even if it failed.
+            reorder_buffer.put(index, photos)
+        return failures
+
+    @staticmethod
+    def loadErrors(tasks):
+        """Wait for tasks started by loadPhotos() and describe the photos 
+        that could not be loaded.  Returns a list of error messages and 
+        a list of the paths of photos that could not be loaded because 
+        the album already has a photo with the same name, which the user 
+        may be able to rename."""
+        errors = []
+        duplicates = []
+        for task in tasks:
+            try:
+                failures = task.result()
+            except concurrent.futures.CancelledError:
+                # The task was cancelled.
+                continue
+            except:
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+                errors.append(str(exc_type) + ": " + str(exc_value))
+                continue
+            for (photo_name, exc) in failures:
+                if isinstance(exc, FileNotFoundError):
+                    # Either exiftool or the photo was missing.
+                    if "exiftool" == exc.filename:
+                        errors.append("Error executing 'exiftool'.  Is it installed?")
+                    else:
+                        errors.append("Error opening photo " + exc.filename)
+                elif isinstance(exc, (subprocess.CalledProcessError, subprocess.TimeoutExpired)):
+                    # Exiftool failed or timed out.
+                    errors.append("Error reading metadata from photo " + photo_name)
+                elif isinstance(exc, FileExistsError):
+                    # The symlink target already exists, implying a duplicate file name.
+                    duplicates.append(photo_name)
+                else:
+                    traceback.print_exception(type(exc), exc, exc.__traceback__)
+                    errors.append(str(type(exc)) + ": " + str(exc))
+        return (errors, duplicates)
+
+    @staticmethod
+    def albumSettings(data):
+        """Return the album settings from an album file's data that are 
+        needed to generate it again."""
+        return {key: data[key] for key in ["title", "description", "footer", "photoResolution", 
+                                           "captionFields", "propertyFields"]}
+
+    def generateAlbum(self, album_file_name, settings, photos, progress):
+        """Start background tasks to generate an album, its photo JSON, 
+        thumbnails, sprite sheets, and down-scaled photos.  settings is 
+        a dict containing the album's title, description, footer, 
+        photoResolution, captionFields and propertyFields.  progress is 
+        called after every step.  Returns an Operation."""
+        album_dir_name = os.path.dirname(album_file_name)
+
+        album = dict(settings)
+        album["metadataDir"] = urllib.parse.quote(Config.METADATA_DIR + "/")
+        album["photos"] = [photo.getAlbumJSON() for photo in photos]
+
+        # Pack the thumbnails into sprite sheets, so that the album page can get them all in a few 
+        # requests.  The individual thumbnails are still needed by older viewers and for 
+        # navigation.
+        sprite_sheets = []
+        if 0 < self._config.spriteSize and 0 != len(photos):
+            album["sprites"] = []
+            cell_size = max(Config.THUMB_WIDTH, Config.THUMB_HEIGHT)
+            for first in range(0, len(photos), self._config.spriteSize):
+                indices = range(first, min(first + self._config.spriteSize, len(photos)))
+                (width, height, positions) = sprite_layout(len(indices), cell_size, cell_size)
+                sheet = len(album["sprites"])
+                names = ["sprite.%d.jpg" % (sheet) if 1 == scale 
+                         else "sprite.%d.%dx.jpg" % (sheet, scale) 
+                         for scale in Config.THUMB_SCALES]
+                album["sprites"].append( 
+                    {"width": width, "height": height, 
+                     "images": [{"sprite": urllib.parse.quote(os.path.join(Config.THUMBNAIL_DIR, 
+                                                                           name)), 
+                                 "scale": scale} 
+                                for (name, scale) in zip(names, Config.THUMB_SCALES)]})
+                for (i, (x, y)) in zip(indices, positions):
+                    album["photos"][i]["sprite"] = [sheet, x, y]
+                sprite_sheets.append((names, width, height, indices, positions))
+
+        # To prevent the output directory from being changed while generating files, we do the 
+        # following:
+        #  1. Create a secure temporary directory.
+        #  2. Open the output directory.  Get its file descriptor.
+        #  3. Construct the /proc/<pid>/fd/<fd> path to the directory using the file descriptor.
+        #  4. Create a symlink from the temporary directory to the /proc path.  The link's name is 
+        #     unique but predictable; that's ok because the directory is secure.
+        #  5. Use the symlink as the path when creating files.
+
+        tasks = []
+        directories = DirectoryHandleList()
+
+        # Create the output directories. 
+        # We read and write directories from different threads, but there's no race because the 
+        # read tasks depend on the write tasks, so they aren't started until the directories exist.
+        album_dir_task = self.threads.submitWithPriority(self.PRIORITY_DIRECTORY, 
+                                                         self._bgCreateOutputDirectory, 
+                                                         album_dir_name, directories, "album", 
+                                                         progress)
+        tasks.append(album_dir_task)
+        metadata_dir_task = None
+        if 0 != len(Config.METADATA_DIR):
+            metadata_dir_task = self.threads.submitWithPriority( 
+                self.PRIORITY_DIRECTORY, self._bgCreateOutputDirectory, 
+                os.path.join(album_dir_name, Config.METADATA_DIR), directories, "metadata", 
+                progress)
+            tasks.append(metadata_dir_task)
+        photo_dir_task = None
+        if 0 != len(Config.PHOTO_DIR):
+            photo_dir_task = self.threads.submitWithPriority( 
+                self.PRIORITY_DIRECTORY, self._bgCreateOutputDirectory, 
+                os.path.join(album_dir_name, Config.PHOTO_DIR), directories, "photos", progress)
+            tasks.append(photo_dir_task)
+        thumbnail_dir_task = None
+        if 0 != len(Config.THUMBNAIL_DIR):
+            thumbnail_dir_task = self.threads.submitWithPriority( 
+                self.PRIORITY_DIRECTORY, self._bgCreateOutputDirectory, 
+                os.path.join(album_dir_name, Config.THUMBNAIL_DIR), directories, "thumbnails", 
+                progress)
+            tasks.append(thumbnail_dir_task)
+
+        # Files that were generated from the same inputs last time don't need to be generated 
+        # again.
+        manifest = Manifest(Manifest.fileName(album_file_name))
+
+        # Create the metadata, thumbnails, and scaled-down photos for each photo.
+        thumbnail_tasks = []
+        captions = album["captionFields"]
+        properties = album["propertyFields"]
+        for photo in photos:
+            photo.addRef()
+            task = self.threads.submitAfter([metadata_dir_task] 
+                                            if None is not metadata_dir_task else [], 
+                                            self.PRIORITY_PHOTO_JSON, self._bgGeneratePhotoJSON, 
+                                            photo, lambda: directories.getPath("metadata"), 
+                                            album["photoResolution"], self._config.photoLadder, 
+                                            self._config.photoFormats, captions, properties, 
+                                            manifest, progress)
+            task.photoName = photo.getPath()
+            tasks.append(task)
+
+            # Imaging work isn't started until it fits in the memory budget, so that threads 
+            # don't sit waiting for memory while other work is queued.  The estimates don't 
+            # depend on where the files go.
+            memory = photo.thumbnailJob(Config.THUMBNAIL_DIR, Config.THUMB_WIDTH, 
+                                        Config.THUMB_HEIGHT, Config.THUMB_QUALITY, 
+                                        self._config.photoFormats, Config.PLACEHOLDER_SIZE) \
+                .memoryEstimate(self._config.imaging.BYTES_PER_PIXEL)
+            photo.addRef()
+            task = self.threads.submitGated([thumbnail_dir_task] 
+                                            if None is not thumbnail_dir_task else [], 
+                                            self.PRIORITY_THUMBNAILS, self._config.memoryGate, 
+                                            memory, self._bgGenerateThumbnails, photo, 
+                                            lambda: directories.getPath("thumbnails"), 
+                                            Config.THUMB_WIDTH, Config.THUMB_HEIGHT, 
+                                            Config.THUMB_QUALITY, self._config.photoFormats, 
+                                            manifest, progress)
+            task.photoName = photo.getPath()
+            tasks.append(task)
+            thumbnail_tasks.append(task)
+
+            priority = (self.PRIORITY_PHOTOS, -photo.getDecodedPixels(album["photoResolution"]))
+            memory = photo.photoJob(Config.PHOTO_DIR, album["photoResolution"], 
+                                    self._config.photoLadder, self._config.photoQuality, 
+                                    self._config.photoFormats) \
+                .memoryEstimate(self._config.imaging.BYTES_PER_PIXEL)
+            photo.addRef()
+            task = self.threads.submitGated([photo_dir_task] if None is not photo_dir_task else [], 
+                                            priority, self._config.memoryGate, memory, 
+                                            self._bgGeneratePhotos, photo, 
+                                            lambda: directories.getPath("photos"), 
+                                            album["photoResolution"], self._config.photoLadder, 
+                                            self._config.photoQuality, self._config.photoFormats, 
+                                            manifest, progress)
+            task.photoName = photo.getPath()
+            tasks.append(task)
+
+        # Create the sprite sheets once their thumbnails exist.
+        for (names, width, height, indices, positions) in sprite_sheets:
+            tiles = [(photos[i], x, y) for (i, (x, y)) in zip(indices, positions)]
+            for (photo, _, _) in tiles:
+                photo.addRef()
+            # The sheets are made one at a time, so the largest one needs the most memory.
+            scale = max(Config.THUMB_SCALES)
+            memory = SpriteJob(names[-1], width * scale, height * scale, [], 
+                               Config.SPRITE_QUALITY, Config.BG_TIMEOUT) \
+                .memoryEstimate(self._config.imaging.BYTES_PER_PIXEL)
+            task = self.threads.submitGated([thumbnail_tasks[i] for i in indices], 
+                                            self.PRIORITY_SPRITES, self._config.memoryGate, 
+                                            memory, self._bgGenerateSprites, 
+                                            names, width, height, tiles, 
+                                            lambda: directories.getPath("thumbnails"), manifest, 
+                                            progress)
+            task.photoName = names[0]
+            tasks.append(task)
+
+        # Create the album JSON file as soon as there's somewhere to put it, so that the album can 
+        # be browsed while the photos are being generated.  Add the placeholders to it once the 
+        # thumbnails, which come with them, are all ready.
+        get_album_file_name = lambda: os.path.join(directories.getPath("album"), 
+                                                   os.path.basename(album_file_name))
+        album_task = self.threads.submitAfter([album_dir_task], self.PRIORITY_ALBUM_JSON, 
+                                              self._bgGenerateAlbum, album, get_album_file_name, 
+                                              progress)
+        tasks.append(album_task)
+        tasks.append(self.threads.submitAfter([album_task] + thumbnail_tasks, 
+                                              self.PRIORITY_PLACEHOLDERS, self._bgAddPlaceholders, 
+                                              album, get_album_file_name, thumbnail_tasks, 
+                                              progress))
+
+        return self._finish(tasks, 3 * len(photos) + len(sprite_sheets) + 6, directories, 
+                            manifest=manifest, 
+                            get_manifest_file_name=lambda: os.path.join( 
+                                directories.getPath("album"), 
+                                os.path.basename(Manifest.fileName(album_file_name))))
+
+    def _finish(self, tasks, steps, directories, manifest=None, get_manifest_file_name=None):
+        """Start the background task that cleans up after an operation's 
+        tasks once they are all done, and return the Operation."""
+        # The clean-up has to run even if the operation is cancelled, or the directories would stay 
+        # open and the manifest would still describe files that have since been overwritten.  So 
+        # it isn't exposed; the operation's done future just reports its result.
+        cleanup = self.threads.submitAfter(tasks, PriorityExecutor.DEFAULT_PRIORITY, 
+                                           self._bgTasksComplete, tasks, directories, 
+                                           manifest=manifest, 
+                                           get_manifest_file_name=get_manifest_file_name)
+        done = concurrent.futures.Future()
+        def cleanup_done(_):
+            if done.set_running_or_notify_cancel():
+                if None is not cleanup.exception():
+                    done.set_exception(cleanup.exception())
+                else:
+                    done.set_result(cleanup.result())
+        cleanup.add_done_callback(cleanup_done)
+        return Operation(tasks, steps, done)
+
+    def _bgCreateOutputDirectory(self, dir_path, directories, name, progress):
+        """Background task to create a directory and link to it from 
+        the temporary directory."""
+        ensure_directory(dir_path)
+        dir_fd = os.open(dir_path, os.O_RDONLY)
+        directories.add(name, dir_fd)
+        progress()
+
+    def _bgGenerateAlbum(self, album_data, get_album_file_name, progress):
+        """Background task to generate an album JSON file."""
+        Album.save(get_album_file_name(), album_data)
+        progress()
+
+    def _bgAddPlaceholders(self, album_data, get_album_file_name, thumbnail_tasks, progress):
+        """Background task to generate an album JSON file again with the 
+        placeholders from the tasks that generated each photo's 
+        thumbnails, if there are any."""
+        changed = False
+        for (photo_data, task) in zip(album_data["photos"], thumbnail_tasks):
+            # Errors from failed tasks are reported elsewhere.
+            if not task.cancelled() and None is task.exception() and None is not task.result():
+                photo_data["placeholder"] = task.result()
+                changed = True
+        if changed:
+            Album.save(get_album_file_name(), album_data)
+        progress()
+
+    def _bgTasksComplete(self, tasks, directories, manifest=None, get_manifest_file_name=None):
+        """Background task to collect any errors encountered while 
+        executing background tasks and clean up any file descriptors 
+        and links that were needed by the background tasks.  If a 
+        generation manifest is given, save it.  Returns a list of error 
+        messages."""
+        # Save the manifest while we still have the output directory open.
+        if None is not manifest:
+            try:
+                manifest.save(get_manifest_file_name())
+            except KeyError:
+                # The album directory couldn't be created.  There's nothing to save anyway.
+                pass
+
+        # Close any file descriptors.  Ignore errors.
+        directories.closeAll()
+
+        errors = []
+        for task in tasks:
+            try:
+                task.result()
+            except concurrent.futures.CancelledError:
+                pass
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ImagingError):
+                # convert or the in-process imaging backend failed or timed out.
+                errors.append("Error resizing " + task.photoName)
+            except (SaveError) as exc:
+                errors.append(str(exc))
+            except:
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+                errors.append(str(exc_type) + ": " + str(exc_value))
+        return errors
+
+    def _bgGeneratePhotoJSON(self, photo, get_out_dir_name, resolution, ladder, formats, 
+                             captions, properties, manifest, progress):
+        """Background task to generate a photo JSON file, unless it is 
+        already up to date."""
+        out_dir_name = get_out_dir_name()
+        name = os.path.join(Config.METADATA_DIR, photo.getJSONName())
+        inputs = {"source": photo.getSourceIdentity(), "resolution": list(resolution), 
+                  "ladder": [list(res) for res in ladder], "formats": formats, 
+                  "captionFields": captions, "propertyFields": properties, 
+                  "albumVersion": Album.CURRENT_VERSION, "version": __version__}
+        if not manifest.isCurrent(name, inputs, os.path.join(out_dir_name, photo.getJSONName())):
+            photo.generateJSON(out_dir_name, resolution, ladder, formats, captions, properties)
+        manifest.record(name, inputs)
+        photo.release()
+        progress()
+
+    def _bgGenerateThumbnails(self, photo, get_thumb_dir_name, thumb_width, thumb_height, 
+                              thumb_quality, formats, manifest, progress):
+        """Background task to generate the thumbnails and placeholder for 
+        a photo, unless they are already up to date.  Returns the 
+        photo's placeholder, or None if there isn't one."""
+        job = photo.thumbnailJob(get_thumb_dir_name(), thumb_width, thumb_height, thumb_quality, 
+                                 formats, Config.PLACEHOLDER_SIZE)
+        result = self._generateDerivatives(photo, job, Config.THUMBNAIL_DIR, 
+                                           job.thumbnailOutputs(), manifest)
+        photo.release()
+        progress()
+        return result.get("placeholder")
+
+    def _bgGeneratePhotos(self, photo, get_photo_dir_name, resolution, ladder, quality, formats, 
+                          manifest, progress):
+        """Background task to generate the down-scaled photos for a 
+        photo, unless they are already up to date."""
+        job = photo.photoJob(get_photo_dir_name(), resolution, ladder, quality, formats, 
+                             self._config.photoQualityTarget)
+        self._generateDerivatives(photo, job, Config.PHOTO_DIR, job.photoOutputs(), manifest)
+        photo.release()
+        progress()
+
+    def _generateDerivatives(self, photo, job, dir_name, outputs, manifest):
+        """Generate the files described by a DerivativeJob, whose paths 
+        and parameters are given by outputs, unless they are already up 
+        to date.  Returns the dict that the imaging backend returned 
+        for them."""
+        # Only plain data goes to the imaging backend, which may be in another process.
+        # Re-tagging a photo doesn't change its scaled-down versions.
+        source = {"source": photo.getImageIdentity(), "backend": self._config.imaging.NAME, 
+                  "version": __version__}
+        outputs = [(os.path.join(dir_name, os.path.basename(path)), path, dict(source, **params)) 
+                   for (path, params) in outputs]
+        # Searching for the quality that meets the target is expensive, and the placeholder isn't 
+        # stored anywhere else, so the results are kept with the first file and re-used for as 
+        # long as its inputs don't change.
+        (first_name, _, first_inputs) = outputs[0]
+        result = manifest.result(first_name, first_inputs)
+        if dict is not type(result):
+            result = {}
+        job.tunedQuality = result.get("quality")
+        # All of the files come out of the same job, so if any is out of date, generate them all.
+        if not all(manifest.isCurrent(name, inputs, path) for (name, path, inputs) in outputs) \
+           or (None is not job.placeholderSize and None is result.get("placeholder")):
+            result = self._config.generateDerivatives(job)
+        manifest.record(first_name, first_inputs, result)
+        for (name, _, inputs) in outputs[1:]:
+            manifest.record(name, inputs)
+        return result
+
+    def _bgGenerateSprites(self, names, width, height, tiles, get_thumb_dir_name, manifest, 
+                           progress):
+        """Background task to generate a sprite sheet at each thumbnail 
+        scale from the thumbnails of the given photos, unless they are 
+        already up to date."""
+        thumb_dir_name = get_thumb_dir_name()
+        source = {"tiles": [[photo.getImageIdentity(), x, y] for (photo, x, y) in tiles], 
+                  "thumbnail": [Config.THUMB_WIDTH, Config.THUMB_HEIGHT, Config.THUMB_QUALITY], 
+                  "quality": Config.SPRITE_QUALITY, "backend": self._config.imaging.NAME, 
+                  "version": __version__}
+        for (i, (name, scale)) in enumerate(zip(names, Config.THUMB_SCALES)):
+            job = SpriteJob(os.path.join(thumb_dir_name, name), width * scale, height * scale, 
+                            [(os.path.join(thumb_dir_name, 
+                                           photo.thumbnailVariants(Config.THUMB_WIDTH, 
+                                                                   Config.THUMB_HEIGHT)[i][0]), 
+                              x * scale, y * scale) for (photo, x, y) in tiles], 
+                            Config.SPRITE_QUALITY, Config.BG_TIMEOUT)
+            inputs = dict(source, scale=scale)
+            if not manifest.isCurrent(os.path.join(Config.THUMBNAIL_DIR, name), inputs, job.path):
+                self._config.generateSprite(job)
+            manifest.record(os.path.join(Config.THUMBNAIL_DIR, name), inputs)
+        for (photo, _, _) in tiles:
+            photo.release()
+        progress()
+
+    def installTemplate(self, out_dir, progress):
+        """Start background tasks to copy the photo album template files 
+        to a directory.  progress is called after every step.  Returns 
+        an Operation."""
+        tasks = []
+        directories = DirectoryHandleList()
+
+        # Create the directory.
+        album_dir_task = self.threads.submit(self._bgCreateOutputDirectory, out_dir, directories, 
+                                             "album", progress)
+        tasks.append(album_dir_task)
+
+        # Spawn background tasks to do the copying.
+        for name in Config.TEMPLATE_FILE_NAMES:
+            tasks.append(self.threads.submitAfter([album_dir_task], 
+                                                  PriorityExecutor.DEFAULT_PRIORITY, 
+                                                  self._bgCopyFile, os.path.join(DATA_PATH, name), 
+                                                  lambda filename=name: os.path.join( 
+                                                      directories.getPath("album"), filename), 
+                                                  progress))
+
+        return self._finish(tasks, len(Config.TEMPLATE_FILE_NAMES) + 1, directories)
+
+    def _bgCopyFile(self, source, get_destination, progress):
+        """Background task to copy a file."""
+        shutil.copyfile(source, get_destination())
+        progress()
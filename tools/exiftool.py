@@ -0,0 +1,231 @@
+"""Persistent exiftool processes for DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import selectors
+import subprocess
+import threading
+import time
+
+
+class ExifToolProcess(object):
+    """A long-running exiftool process that reads commands from stdin.
+
+    exiftool is a Perl program, and starting the interpreter costs far
+    more than reading the metadata from a typical photo.  In
+    "-stay_open" mode, exiftool reads arguments from stdin one per
+    line and runs a command every time it sees "-execute".  Every
+    command is numbered so that its output can be matched to it.
+
+    Attributes:
+        _process (subprocess.Popen): The exiftool process.
+        _sequence (int): The number of the most recent command.
+    """
+
+    def __init__(self):
+        """Start an exiftool process.  Raises FileNotFoundError if
+        exiftool is not installed."""
+        self._process = subprocess.Popen(["exiftool", "-stay_open", "True", "-@", "-"],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE)
+        self._sequence = 0
+
+    def isAlive(self):
+        """Return True if the process is still running."""
+        return None is self._process.poll()
+
+    def execute(self, args, timeout):
+        """Run a command and return a tuple of its standard output and
+        standard error text.  Raises subprocess.TimeoutExpired if the
+        command does not complete within timeout seconds or
+        subprocess.CalledProcessError if the process died.  The process
+        is killed on any failure, since its state is unknown."""
+        self._sequence += 1
+        marker = "{ready%d}" % (self._sequence)
+        # -echo4 writes its text to stderr after the command completes, which tells us when we've
+        # seen all of the error messages for this command.
+        command = "\n".join(list(args) + ["-echo4", marker, "-execute%d" % (self._sequence)])
+        try:
+            self._process.stdin.write((command + "\n").encode("utf-8"))
+            self._process.stdin.flush()
+            (output, errors) = self._readResponse(marker, timeout)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            raise subprocess.TimeoutExpired(["exiftool"] + list(args), timeout)
+        except OSError:
+            self.kill()
+            raise subprocess.CalledProcessError(-1, ["exiftool"] + list(args))
+        return (output.decode("utf-8", errors="replace"),
+                errors.decode("utf-8", errors="replace"))
+
+    def _readResponse(self, marker, timeout):
+        """Read standard output and standard error until both have
+        reached the end-of-command marker.  Returns the text preceding
+        the markers."""
+        deadline = time.monotonic() + timeout
+        marker_line = (marker + "\n").encode("utf-8")
+        buffers = {self._process.stdout: b"", self._process.stderr: b""}
+        pending = set(buffers.keys())
+        with selectors.DefaultSelector() as selector:
+            for stream in pending:
+                selector.register(stream, selectors.EVENT_READ)
+            while 0 != len(pending):
+                remaining = deadline - time.monotonic()
+                if 0 >= remaining:
+                    raise subprocess.TimeoutExpired("exiftool", timeout)
+                for (key, _) in selector.select(remaining):
+                    data = os.read(key.fd, 65536)
+                    if 0 == len(data):
+                        # The process exited.
+                        raise BrokenPipeError()
+                    buffers[key.fileobj] += data
+                    if (b"\n" + buffers[key.fileobj]).endswith(b"\n" + marker_line):
+                        selector.unregister(key.fileobj)
+                        pending.discard(key.fileobj)
+        return (buffers[self._process.stdout][:-len(marker_line)],
+                buffers[self._process.stderr][:-len(marker_line)])
+
+    def close(self, timeout):
+        """Ask the process to exit.  Kill it if it doesn't."""
+        try:
+            self._process.stdin.write(b"-stay_open\nFalse\n")
+            self._process.stdin.flush()
+            self._process.stdin.close()
+            self._process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+        self._closePipes()
+
+    def kill(self):
+        """Terminate the process immediately."""
+        try:
+            self._process.kill()
+            self._process.wait()
+        except OSError:
+            pass
+        self._closePipes()
+
+    def _closePipes(self):
+        """Close our ends of the process's pipes.  Ignore errors."""
+        for stream in [self._process.stdin, self._process.stdout, self._process.stderr]:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class ExifToolPool(object):
+    """A thread-safe pool of persistent exiftool processes.
+
+    Processes are started on demand, up to a fixed limit, and are
+    re-used for subsequent commands.  Processes that die or time out
+    are discarded and replaced by new ones when needed.
+
+    Attributes:
+        _size (int): The maximum number of processes.
+        _timeout (int): The time limit for a command, in seconds.
+        _idle (list of ExifToolProcess): Processes that are not
+                currently running a command.
+        _count (int): The number of processes that exist, including
+                busy ones.
+        _closed (bool): True once the pool has been shut down.
+        _condition (threading.Condition): Protects the other members.
+    """
+
+    def __init__(self, size, timeout):
+        """Initialize an ExifToolPool.  No processes are started until
+        they are needed."""
+        self._size = size
+        self._timeout = timeout
+        self._idle = []
+        self._count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def execute(self, args, timeout=None):
+        """Run exiftool with the given arguments and return a tuple of
+        its standard output and standard error text.  The pool's 
+        default time limit is used unless another is given.  Raises
+        FileNotFoundError if exiftool is not installed,
+        subprocess.TimeoutExpired if the command times out, or
+        subprocess.CalledProcessError if exiftool died."""
+        if None is timeout:
+            timeout = self._timeout
+        if any("\n" in arg for arg in args):
+            # Arguments are sent to pooled processes one per line, so anything containing a new-line
+            # needs a process of its own.
+            result = subprocess.run(["exiftool"] + list(args), stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, timeout=timeout,
+                                    universal_newlines=True)
+            return (result.stdout, result.stderr)
+
+        process = self._acquire()
+        try:
+            return process.execute(args, timeout)
+        finally:
+            self._release(process)
+
+    def _acquire(self):
+        """Get an idle process, starting a new one if possible or
+        waiting for one to become available otherwise."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The exiftool pool has been closed")
+                if 0 != len(self._idle):
+                    process = self._idle.pop()
+                    if process.isAlive():
+                        return process
+                    # Replace processes that died while idle.
+                    process.kill()
+                    self._count -= 1
+                if self._count < self._size:
+                    self._count += 1
+                    break
+                self._condition.wait()
+
+        try:
+            return ExifToolProcess()
+        except:
+            with self._condition:
+                self._count -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, process):
+        """Return a process to the pool after a command."""
+        with self._condition:
+            keep = not self._closed and process.isAlive()
+            if keep:
+                self._idle.append(process)
+            else:
+                self._count -= 1
+            self._condition.notify()
+        if not keep:
+            process.close(self._timeout)
+
+    def close(self):
+        """Shut down all idle processes.  Busy processes are shut down
+        when their commands complete."""
+        with self._condition:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._count -= len(idle)
+            self._condition.notify_all()
+        for process in idle:
+            process.close(self._timeout)
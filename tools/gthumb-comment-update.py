@@ -55,6 +55,11 @@ import pytz
 
 BG_TIMEOUT = 5
 
+# The embedded tags that we read.  Extracting everything, particularly MakerNotes, is much slower.
+EMBEDDED_TAGS = ["XMP:Description", "IPTC:Caption-Abstract", "EXIF:UserComment", "XMP:Location", 
+                 "IPTC:ContentLocationName", "XMP:DateTimeOriginal", "IPTC:DateCreated", 
+                 "IPTC:TimeCreated", "EXIF:DateTimeOriginal"]
+
 def validate_timezone(tz):
     """Ensure that tz is a recognized time zone."""
     if tz not in pytz.all_timezones:
@@ -265,6 +270,8 @@ def main():
                                                 "camera.  Only meaningful if --timezone is set.")
     parser.add_argument("-b", "--backup", metavar="<backup archive>", type=str, required=False,
                         help="Archive file name for photo backups.")
+    parser.add_argument("-d", "--debug", required=False, action="store_true", 
+                        help="Read all embedded metadata and print it.")
     parser.add_argument("file_names", metavar="photo", type=str, nargs="+", 
                         help="Photos to update.")
     args = parser.parse_args()
@@ -291,10 +298,13 @@ def main():
                 os.symlink("/proc/%d/fd/%d" % (os.getpid(), photo_fd), photo_path)
 
                 # gThumb stores IPTC strings as UTF-8, but does not set CodedCharacterSet
+                tags = ["-All"] if args.debug else ["-fast"] + ["-" + tag for tag in EMBEDDED_TAGS]
                 properties_text = subprocess.check_output(
-                    ["exiftool", "-charset", "iptc=UTF8", "-json", "-a", "-G", "-All", photo_path], 
+                    ["exiftool", "-charset", "iptc=UTF8", "-json", "-a", "-G"] + tags + [photo_path], 
                     timeout=BG_TIMEOUT, universal_newlines=True, stderr=subprocess.STDOUT)
                 embedded_props = json.loads(properties_text)[0]
+                if args.debug:
+                    print(json.dumps(embedded_props, indent=2, sort_keys=True))
 
                 # Try to read the XML comment file.
                 # It's not an error for it to be missing or unparsable.
@@ -0,0 +1,515 @@
+"""Image processing backends for DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import io
+import math
+import base64
+import subprocess
+
+# Pillow takes a while to import and isn't needed by every backend, so it's imported by 
+# import_pillow() when it is.
+PIL = None
+
+
+class ImagingError(Exception):
+    """Exception raised if an in-process backend can't process a 
+    photo."""
+
+    def __init__(self, path, message):
+        """Initializes an ImagingError."""
+        # Pass the arguments along so that the exception can be sent back from worker processes.
+        super().__init__(path, message)
+        self.path = path
+        self.message = message
+
+    def __str__(self):
+        """Returns a printable message for an ImagingError."""
+        return "Error processing '%s': %s" % (self.path, self.message)
+
+
+# Formats in which scaled-down photos and thumbnails may also be written, alongside the original 
+# format, and their MIME types.  Browsers that support these can download a lot less for the same 
+# quality.
+FORMATS = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def placeholder_uri(png):
+    """Return a data URI for a placeholder image in PNG format."""
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def alternate_path(path, image_format):
+    """Return the path of the copy of a derivative in another format."""
+    # Keep the original suffix so that photos with the same name but different types don't clash.
+    return path + "." + image_format
+
+
+class DerivativeJob(object):
+    """A description of the files to generate from a photo.  Contains 
+    only plain data, so that it can be sent to other processes.  Either 
+    photos or thumbnails may be empty, so that thumbnails can be made 
+    without waiting for the more expensive scaled-down photos.
+
+    Attributes:
+        source (str): The path to the original photo.
+        photos (list of (str, int, int)): The path, maximum width and 
+                maximum height of each scaled-down photo to write, 
+                largest first.  The others are scaled from the first.
+        quality (int): The quality percentage of the scaled-down photos.
+        thumbnails (list of (str, int, int)): The path, width and height 
+                of each thumbnail to write.  Thumbnails are made from 
+                the largest scaled-down photo, or from the original if 
+                there are no scaled-down photos.
+        thumbQuality (int): The quality percentage of the thumbnails.
+        formats (list of str): Additional formats, from FORMATS, in 
+                which to write each photo and thumbnail.
+        qualityTarget (float): If not None, the scaled-down photos use 
+                the lowest quality, up to quality, at which the largest 
+                one's structural similarity to the uncompressed image 
+                is at least this.
+        tunedQuality (int): The result of a previous search for the 
+                quality that meets qualityTarget, or None to search.
+        placeholderSize (int): If not None, also make a tiny copy of the 
+                photo that fits in a square this size, for viewers to 
+                show while they wait for the real thing.  It is made 
+                from the same image as the thumbnails.
+        decodedPixels (int): The number of pixels in the original once 
+                it has been decoded, or None if it isn't known.
+        decodeSize ((int, int)): The smallest size, before orientation, 
+                to which a JPEG decoder may scale the original, or None 
+                to decode it at full size.
+        timeout (int): The time limit for each image that is encoded, in 
+                seconds.  See timeLimit().
+    """
+
+    def __init__(self, source, photos, quality, thumbnails, thumbQuality, formats, decodeSize, 
+                 timeout, qualityTarget=None, placeholderSize=None, decodedPixels=None):
+        """Initializes a DerivativeJob."""
+        self.source = source
+        self.photos = photos
+        self.quality = quality
+        self.thumbnails = thumbnails
+        self.thumbQuality = thumbQuality
+        self.formats = formats
+        self.decodeSize = decodeSize
+        self.timeout = timeout
+        self.qualityTarget = qualityTarget
+        self.tunedQuality = None
+        self.placeholderSize = placeholderSize
+        self.decodedPixels = decodedPixels
+
+    def memoryEstimate(self, bytes_per_pixel):
+        """Estimate the peak memory needed to generate the derivatives, 
+        in bytes, given the memory that the imaging backend needs for 
+        each pixel: the decoded original plus every output, all of which 
+        may exist at once."""
+        outputs = sum([width * height for (_, width, height) in self.photos + self.thumbnails])
+        decoded = self.decodedPixels
+        if None is decoded:
+            # Assume that the original is twice the size of the largest output in each direction.
+            (_, width, height) = (self.photos + self.thumbnails)[0]
+            decoded = 4 * width * height
+        return (decoded + outputs) * bytes_per_pixel
+
+    def timeLimit(self):
+        """Return the time limit for the whole job, in seconds.  Every 
+        output in every format is a separate encode, and a quality 
+        search encodes the largest photo several more times."""
+        encodes = len(self.photos + self.thumbnails) * (1 + len(self.formats))
+        if None is not self.qualityTarget:
+            encodes += PillowBackend.MAX_QUALITY_STEPS
+        if None is not self.placeholderSize:
+            encodes += 1
+        return self.timeout * encodes
+
+    def _withAlternates(self, outputs):
+        """Add the copies in other formats to a list of outputs."""
+        return [output for (path, params) in outputs 
+                for output in [(path, params)] 
+                              + [(alternate_path(path, image_format), 
+                                  dict(params, format=image_format)) 
+                                 for image_format in self.formats]]
+
+    def photoOutputs(self):
+        """Return a list of the path of each scaled-down photo and the 
+        parameters that determine its content, other than the original 
+        itself.  The largest photo in its original format is first."""
+        return self._withAlternates([(path, {"width": width, "height": height, 
+                                             "quality": self.quality, 
+                                             "qualityTarget": self.qualityTarget, 
+                                             "decodeSize": self.decodeSize}) 
+                                     for (path, width, height) in self.photos])
+
+    def thumbnailOutputs(self):
+        """Return a list of the path of each thumbnail and the 
+        parameters that determine its content, other than the original 
+        itself."""
+        # Thumbnails made from the largest scaled-down photo depend on that too.
+        if 0 != len(self.photos):
+            made_from = {"photo": self.photoOutputs()[0][1]}
+        else:
+            made_from = {"decodeSize": self.decodeSize}
+        return self._withAlternates([(path, dict(made_from, width=width, height=height, 
+                                                 quality=self.thumbQuality)) 
+                                     for (path, width, height) in self.thumbnails])
+
+
+class SpriteJob(object):
+    """A description of a sprite sheet: a single image made of many 
+    thumbnails, so that a browser can get them all in one request.  
+    Contains only plain data, so that it can be sent to other 
+    processes.
+
+    Attributes:
+        path (str): The path of the sprite sheet to write.
+        width (int): The width of the sprite sheet.
+        height (int): The height of the sprite sheet.
+        tiles (list of (str, int, int)): The path of each thumbnail and 
+                the coordinates of its top left corner in the sheet.
+        quality (int): The quality percentage of the sprite sheet.
+        timeout (int): The time limit for external programs, in seconds.
+    """
+
+    def __init__(self, path, width, height, tiles, quality, timeout):
+        """Initializes a SpriteJob."""
+        self.path = path
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        self.quality = quality
+        self.timeout = timeout
+
+    def memoryEstimate(self, bytes_per_pixel):
+        """Estimate the peak memory needed to generate the sprite sheet, 
+        in bytes, given the memory that the imaging backend needs for 
+        each pixel."""
+        # The sheet, plus one thumbnail at a time.
+        return 2 * self.width * self.height * bytes_per_pixel
+
+
+def memory_limit_args(job):
+    """Return convert arguments that limit its pixel cache to a job's 
+    memory estimate.  Anything more spills to a memory-mapped file on 
+    disk rather than competing with other jobs for RAM."""
+    # See http://www.imagemagick.org/script/command-line-options.php#limit
+    limit = int(math.ceil(job.memoryEstimate(ImageMagickBackend.BYTES_PER_PIXEL) / (1024 * 1024)))
+    return ["-limit", "memory", "%dMiB" % (limit), "-limit", "map", "%dMiB" % (2 * limit)]
+
+
+def sprite_layout(count, cell_width, cell_height):
+    """Arrange count thumbnails, none of which is larger than 
+    cell_width by cell_height, in a grid that is as close to square as 
+    possible.  Returns the width and height of the grid and the 
+    coordinates of the top left corner of each thumbnail's cell."""
+    columns = max(1, int(math.ceil(math.sqrt(count))))
+    rows = max(1, int(math.ceil(count / columns)))
+    return (columns * cell_width, rows * cell_height, 
+            [((i % columns) * cell_width, (i // columns) * cell_height) for i in range(count)])
+
+
+class ImageMagickBackend(object):
+    """Generates derivatives by running ImageMagick's convert."""
+
+    NAME = "imagemagick"
+    # The work happens in convert, so there's no benefit to running it in another process.
+    IN_PROCESS = False
+    # The memory needed for each pixel of an image being processed.  Most distributions build 
+    # ImageMagick with Q16 HDRI, whose pixel cache holds four 32-bit floating-point channels.  
+    # Overestimating for other builds only costs some concurrency.
+    BYTES_PER_PIXEL = 16
+
+    def generateDerivatives(self, job):
+        """Generate the scaled-down photos and thumbnails.  The original 
+        is only decoded once; everything else is made from the largest 
+        scaled-down photo, if there is one.  Returns a dict containing 
+        the quality of the scaled-down photos, which is always 
+        job.quality since convert can't search for a quality target, 
+        and the placeholder as a data URI, or None.  Raises 
+        subprocess.CalledProcessError if convert fails or 
+        subprocess.TimeoutExpired if it takes too long."""
+        args = ["convert"] + memory_limit_args(job)
+        if None is not job.decodeSize:
+            # libjpeg can scale by 1/2, 1/4 or 1/8 for almost free by skipping DCT coefficients.  
+            # ImageMagick chooses the largest reduction that keeps the image at least this large.
+            args += ["-define", "jpeg:size=%dx%d" % job.decodeSize]
+        # See http://www.imagemagick.org/Usage/resize/, 
+        # http://www.imagemagick.org/Usage/thumbnails/, and 
+        # http://www.imagemagick.org/Usage/files/#write
+        # The output format is chosen by the file name extension.
+        def alternates(path):
+            return [arg for image_format in job.formats 
+                    for arg in ["-write", alternate_path(path, image_format)]]
+        args += [job.source, "-auto-orient", "-strip"]
+        if 0 != len(job.photos):
+            (photo_path, width, height) = job.photos[0]
+            args += ["-resize", "%dx%d>" % (width, height)]
+        for (path, width, height) in job.photos[1:]:
+            args += ["(", "+clone", "-resize", "%dx%d>" % (width, height), 
+                     "-quality", str(job.quality)] + alternates(path) \
+                    + ["-write", path, "+delete", ")"]
+        for (path, width, height) in job.thumbnails:
+            args += ["(", "+clone", "-thumbnail", "%dx%d^" % (width, height), 
+                     "-gravity", "center", "-extent", "%dx%d" % (width, height), 
+                     "-quality", str(job.thumbQuality)] + alternates(path) \
+                    + ["-write", path, "+delete", ")"]
+        if None is not job.placeholderSize:
+            # The placeholder goes to standard output.
+            size = job.placeholderSize
+            args += ["(", "+clone", "-resize", "%dx%d" % (size, size), 
+                     "-define", "png:include-chunk=none", "-write", "png:-", "+delete", ")"]
+        if 0 != len(job.photos):
+            args += ["-quality", str(job.quality)] + alternates(photo_path) + [photo_path]
+        else:
+            # Everything has already been written.
+            args += ["null:"]
+        placeholder = subprocess.check_output(args, timeout=job.timeLimit())
+        return {"quality": job.quality, 
+                "placeholder": placeholder_uri(placeholder) if 0 != len(placeholder) else None}
+
+    def generateSprite(self, job):
+        """Generate a sprite sheet from thumbnails.  Raises 
+        subprocess.CalledProcessError if convert fails or 
+        subprocess.TimeoutExpired if it takes too long."""
+        args = ["convert"] + memory_limit_args(job) \
+               + ["-size", "%dx%d" % (job.width, job.height), "xc:white"]
+        for (path, x, y) in job.tiles:
+            args += [path, "-geometry", "+%d+%d" % (x, y), "-composite"]
+        args += ["-strip", "-quality", str(job.quality), job.path]
+        subprocess.check_call(args, timeout=job.timeout)
+
+
+class PillowBackend(object):
+    """Generates derivatives in-process using Pillow.  Produces the 
+    same results as ImageMagickBackend, give or take resampling 
+    differences, without starting a process for every photo."""
+
+    NAME = "pillow"
+    # The work happens in this process and holds the GIL much of the time, so it should be run in 
+    # worker processes.
+    IN_PROCESS = True
+    # The memory needed for each pixel of an image being processed: four 8-bit channels, doubled 
+    # for the working copies made while resizing and searching for a quality.
+    BYTES_PER_PIXEL = 8
+    # Bounds on the search for a quality that meets a target.  Each step is a JPEG encode and 
+    # decode of the largest scaled-down photo.
+    MIN_QUALITY = 30
+    MAX_QUALITY_STEPS = 6
+
+    def __init__(self):
+        """Initializes a PillowBackend.  Raises ImportError if Pillow is 
+        not installed."""
+        import_pillow()
+
+    @staticmethod
+    def _scaledSize(width, height, box_width, box_height, fill):
+        """Calculate the size of an image scaled to fit within a box, or 
+        to fill it if fill is True, the same way that ImageMagick does."""
+        scale = (max if fill else min)(box_width / width, box_height / height)
+        return (max(1, int(math.floor(scale * width + 0.5))), 
+                max(1, int(math.floor(scale * height + 0.5))))
+
+    @staticmethod
+    def _format(path):
+        """Return the name of the format that Pillow uses for a file 
+        name extension, or None if it doesn't know it."""
+        return PIL.Image.registered_extensions().get(os.path.splitext(path)[1].lower())
+
+    @staticmethod
+    def _saveJpeg(image, output, quality):
+        """Save an image as a JPEG to a file name or file object, with 
+        the same settings as ImageMagick."""
+        if image.mode not in ["RGB", "L"]:
+            image = image.convert("RGB")
+        # ImageMagick only disables chroma subsampling at high quality settings.
+        image.save(output, "JPEG", quality=quality, subsampling=0 if 90 <= quality else 2)
+
+    @classmethod
+    def _save(cls, image, path, quality, formats):
+        """Save an image without any metadata, and copies of it in other 
+        formats.  The format is chosen by the file name extension, like 
+        ImageMagick does."""
+        for out_path in [path] + [alternate_path(path, image_format) for image_format in formats]:
+            image_format = cls._format(out_path)
+            if "JPEG" == image_format:
+                cls._saveJpeg(image, out_path, quality)
+            elif image_format in ["WEBP", "AVIF"]:
+                image.save(out_path, image_format, quality=quality)
+            elif None is image_format:
+                raise ValueError("No encoder for '%s'" % (out_path))
+            else:
+                image.save(out_path, image_format)
+
+    @staticmethod
+    def _resize(image, width, height):
+        """Scale an image down to fit within a box ("WxH>")."""
+        if image.width > width or image.height > height:
+            image = image.resize(PillowBackend._scaledSize(image.width, image.height, width, 
+                                                           height, False), 
+                                 PIL.Image.LANCZOS)
+        # Like -strip.  PNG and some other formats copy these from the image when saving.
+        image.info = {}
+        return image
+
+    @staticmethod
+    def _thumbnail(image, width, height):
+        """Scale an image to fill a box ("WxH^"), then crop it to the box 
+        from the center."""
+        thumb = image.resize(PillowBackend._scaledSize(image.width, image.height, width, height, 
+                                                       True), 
+                             PIL.Image.LANCZOS)
+        left = (thumb.width - width) // 2
+        top = (thumb.height - height) // 2
+        thumb = thumb.crop((left, top, left + width, top + height))
+        thumb.info = {}
+        return thumb
+
+    @classmethod
+    def _tuneQuality(cls, image, target, max_quality):
+        """Find the lowest JPEG quality, up to max_quality, at which an 
+        image's structural similarity to itself after compression is 
+        at least target, with a bounded binary search.  Returns 
+        max_quality if no lower quality is good enough."""
+        best = max_quality
+        (low, high) = (cls.MIN_QUALITY, max_quality - 1)
+        for _ in range(cls.MAX_QUALITY_STEPS):
+            if low > high:
+                break
+            quality = (low + high) // 2
+            encoded = io.BytesIO()
+            cls._saveJpeg(image, encoded, quality)
+            encoded.seek(0)
+            with PIL.Image.open(encoded) as compressed:
+                score = structural_similarity(image, compressed)
+            if score >= target:
+                (best, high) = (quality, quality - 1)
+            else:
+                low = quality + 1
+        return best
+
+    def generateDerivatives(self, job):
+        """Generate the scaled-down photos and thumbnails.  The original 
+        is only decoded once; everything else is made from the largest 
+        scaled-down photo, if there is one.  Returns a dict containing 
+        the quality of the scaled-down photos and the placeholder as a 
+        data URI, or None.  Raises ImagingError on failure."""
+        try:
+            with PIL.Image.open(job.source) as original:
+                if None is not job.decodeSize:
+                    # Pillow's equivalent of jpeg:size.
+                    original.draft(original.mode, job.decodeSize)
+                photo = PIL.ImageOps.exif_transpose(original)
+
+                quality = job.quality
+                if 0 != len(job.photos):
+                    (photo_path, width, height) = job.photos[0]
+                    photo = self._resize(photo, width, height)
+                    if None is not job.qualityTarget and "JPEG" == self._format(photo_path):
+                        quality = job.tunedQuality if None is not job.tunedQuality \
+                                  else self._tuneQuality(photo, job.qualityTarget, job.quality)
+
+                for (path, width, height) in job.photos[1:]:
+                    self._save(self._resize(photo, width, height), path, quality, job.formats)
+                for (path, width, height) in job.thumbnails:
+                    self._save(self._thumbnail(photo, width, height), path, job.thumbQuality, 
+                               job.formats)
+                if 0 != len(job.photos):
+                    self._save(photo, photo_path, quality, job.formats)
+
+                placeholder = None
+                if None is not job.placeholderSize:
+                    png = io.BytesIO()
+                    self._resize(photo, job.placeholderSize, job.placeholderSize) \
+                        .convert("RGB").save(png, "PNG", optimize=True)
+                    placeholder = placeholder_uri(png.getvalue())
+                return {"quality": quality, "placeholder": placeholder}
+        except (OSError, ValueError, PIL.Image.DecompressionBombError) as exc:
+            raise ImagingError(job.source, str(exc)) from exc
+
+    def generateSprite(self, job):
+        """Generate a sprite sheet from thumbnails.  Raises ImagingError 
+        on failure."""
+        try:
+            sheet = PIL.Image.new("RGB", (job.width, job.height), "white")
+            for (path, x, y) in job.tiles:
+                with PIL.Image.open(path) as thumb:
+                    sheet.paste(thumb.convert("RGB"), (x, y))
+            self._save(sheet, job.path, job.quality, [])
+        except (OSError, ValueError, PIL.Image.DecompressionBombError) as exc:
+            raise ImagingError(job.path, str(exc)) from exc
+
+
+def import_pillow():
+    """Import Pillow, unless it has already been imported.  Raises 
+    ImportError if Pillow is not installed."""
+    global PIL
+    if None is PIL:
+        # Don't publish the package until everything that we use from it is loaded, in case 
+        # another thread is checking.
+        from PIL import Image, ImageMath, ImageOps
+        import PIL as pillow
+        PIL = pillow
+
+
+def structural_similarity(first, second):
+    """Return the mean structural similarity (SSIM) of the luminance of 
+    two images of the same size, between -1 and 1, where 1 means that 
+    they are identical.  Statistics are taken over 8x8 blocks rather 
+    than a sliding window, which is close enough to tell how much a 
+    photo has suffered from compression, and much faster."""
+    # Pillow's box resize averages each block, in floating point.  
+    # See https://ece.uwaterloo.ca/~z70wang/publications/ssim.pdf for the formula.
+    import_pillow()
+    evaluate = getattr(PIL.ImageMath, "unsafe_eval", None) or PIL.ImageMath.eval
+    x = first.convert("L").convert("F")
+    y = second.convert("L").convert("F")
+    size = (max(1, x.width // 8), max(1, x.height // 8))
+    def block_mean(expression):
+        return evaluate(expression, x=x, y=y).resize(size, PIL.Image.BOX)
+    (mean_x, mean_y) = (block_mean("x"), block_mean("y"))
+    (mean_xx, mean_yy, mean_xy) = (block_mean("x*x"), block_mean("y*y"), block_mean("x*y"))
+    similarity = evaluate("((2*mx*my + c1) * (2*(mxy - mx*my) + c2)) / " 
+                          "((mx*mx + my*my + c1) * (mxx - mx*mx + myy - my*my + c2))", 
+                          mx=mean_x, my=mean_y, mxx=mean_xx, myy=mean_yy, mxy=mean_xy, 
+                          c1=(0.01 * 255) ** 2, c2=(0.03 * 255) ** 2)
+    return similarity.resize((1, 1), PIL.Image.BOX).getpixel((0, 0))
+
+
+BACKENDS = {ImageMagickBackend.NAME: ImageMagickBackend, PillowBackend.NAME: PillowBackend}
+DEFAULT_BACKEND = ImageMagickBackend.NAME
+
+
+def generate_derivatives(backend_name, job):
+    """Generate the derivatives described by a DerivativeJob using the 
+    named imaging backend.  Intended to be run in a worker process.  
+    Returns what the backend's generateDerivatives() returns."""
+    return get_backend(backend_name).generateDerivatives(job)
+
+
+def generate_sprite(backend_name, job):
+    """Generate the sprite sheet described by a SpriteJob using the 
+    named imaging backend.  Intended to be run in a worker process."""
+    get_backend(backend_name).generateSprite(job)
+
+
+def get_backend(name):
+    """Return an instance of the named imaging backend.  Raises 
+    ValueError if there is no such backend or ImportError if the 
+    backend's dependencies are not installed."""
+    if name not in BACKENDS:
+        raise ValueError("Unknown imaging backend '%s'" % (name))
+    return BACKENDS[name]()
@@ -0,0 +1,627 @@
+"""In-process JPEG metadata reader for DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import mmap
+import hashlib
+import math
+import struct
+
+
+# Reading metadata with exiftool costs a process round-trip per photo.  For JPEG files, the
+# metadata that DyphalGenerator needs is in a handful of segments before the image data, so we can
+# usually read it ourselves.  read_jpeg_metadata() returns a dict that looks like what exiftool
+# would produce for the same file, or None if the file uses anything that we can't reproduce
+# faithfully, in which case the caller should ask exiftool.
+
+class _Unsupported(Exception):
+    """Raised internally if a file contains something that the fast
+    path can't handle."""
+    pass
+
+
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - set([0xC4, 0xC8, 0xCC])
+_EXIF_HEADER = b"Exif\0\0"
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\0"
+_XMP_EXTENSION_HEADER = b"http://ns.adobe.com/xmp/extension/\0"
+_PHOTOSHOP_HEADER = b"Photoshop 3.0\0"
+_ADOBE_HEADER = b"Adobe"
+
+# TIFF field types: (struct format, size)
+_TIFF_TYPES = {1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("L", 4), 5: ("LL", 8), 6: ("b", 1),
+               7: ("s", 1), 8: ("h", 2), 9: ("l", 4), 10: ("ll", 8)}
+
+_TAG_IMAGE_WIDTH = 0x0100
+_TAG_IMAGE_HEIGHT = 0x0101
+_TAG_MAKE = 0x010F
+_TAG_MODEL = 0x0110
+_TAG_ORIENTATION = 0x0112
+_TAG_EXIF_IFD = 0x8769
+_TAG_EXPOSURE_TIME = 0x829A
+_TAG_F_NUMBER = 0x829D
+_TAG_ISO = 0x8827
+_TAG_DATE_TIME_ORIGINAL = 0x9003
+_TAG_SHUTTER_SPEED_VALUE = 0x9201
+_TAG_APERTURE_VALUE = 0x9202
+_TAG_EXPOSURE_COMPENSATION = 0x9204
+_TAG_FLASH = 0x9209
+_TAG_FOCAL_LENGTH = 0x920A
+_TAG_MAKER_NOTE = 0x927C
+_TAG_USER_COMMENT = 0x9286
+_TAG_FOCAL_PLANE_X_RESOLUTION = 0xA20E
+_TAG_EXPOSURE_MODE = 0xA402
+_TAG_FOCAL_LENGTH_35MM = 0xA405
+
+_EXPOSURE_MODES = {0: "Auto", 1: "Manual", 2: "Auto bracket"}
+
+_FLASH_MODES = {
+    0x00: "No Flash",
+    0x01: "Fired",
+    0x05: "Fired, Return not detected",
+    0x07: "Fired, Return detected",
+    0x08: "On, Did not fire",
+    0x09: "On, Fired",
+    0x0D: "On, Return not detected",
+    0x0F: "On, Return detected",
+    0x10: "Off, Did not fire",
+    0x14: "Off, Did not fire, Return not detected",
+    0x18: "Auto, Did not fire",
+    0x19: "Auto, Fired",
+    0x1D: "Auto, Fired, Return not detected",
+    0x1F: "Auto, Fired, Return detected",
+    0x20: "No flash function",
+    0x30: "Off, No flash function",
+    0x41: "Fired, Red-eye reduction",
+    0x45: "Fired, Red-eye reduction, Return not detected",
+    0x47: "Fired, Red-eye reduction, Return detected",
+    0x49: "On, Red-eye reduction",
+    0x4D: "On, Red-eye reduction, Return not detected",
+    0x4F: "On, Red-eye reduction, Return detected",
+    0x50: "Off, Red-eye reduction",
+    0x58: "Auto, Did not fire, Red-eye reduction",
+    0x59: "Auto, Fired, Red-eye reduction",
+    0x5D: "Auto, Fired, Red-eye reduction, Return not detected",
+    0x5F: "Auto, Fired, Red-eye reduction, Return detected"
+}
+
+_NS_RDF = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"
+_NS_XML = "{http://www.w3.org/XML/1998/namespace}"
+_NS_DC = "{http://purl.org/dc/elements/1.1/}"
+_NS_EXIF = "{http://ns.adobe.com/exif/1.0/}"
+_NS_IPTC_CORE = "{http://iptc.org/std/Iptc4xmpCore/1.0/xmlns/}"
+# XMP namespaces that hold camera settings.  exiftool's composite tags will use these if they
+# exist, which we don't try to emulate.
+_NS_CAMERA = ["{http://ns.adobe.com/exif/1.0/}", "{http://ns.adobe.com/exif/1.0/aux/}",
+              "{http://ns.adobe.com/tiff/1.0/}", "{http://cipa.jp/exif/1.0/}"]
+
+# exiftool writes values that look like numbers as JSON numbers.
+_JSON_NUMBER = re.compile(r"^-?(\d|[1-9]\d{1,14})(\.\d{1,16})?(e[-+]?\d{1,3})?$", re.IGNORECASE)
+
+
+def _json_value(value):
+    """Convert a value the way that exiftool's JSON output would."""
+    if str is type(value) and _JSON_NUMBER.match(value):
+        return float(value) if re.search("[.eE]", value) else int(value)
+    return value
+
+
+def _format_file_size(size):
+    """Format a file size the way that exiftool does."""
+    if size < 2048:
+        return "%d bytes" % (size)
+    elif size < 10240:
+        return "%.1f kB" % (size / 1024)
+    elif size < 2097152:
+        return "%.0f kB" % (size / 1024)
+    elif size < 10485760:
+        return "%.1f MB" % (size / 1048576)
+    else:
+        return "%.0f MB" % (size / 1048576)
+
+
+def _format_exposure_time(secs):
+    """Format an exposure time the way that exiftool does."""
+    if 0 < secs < 0.25001:
+        return "1/%d" % (int(0.5 + 1 / secs))
+    text = "%.1f" % (secs)
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _format_fraction(value):
+    """Format an exposure compensation value the way that exiftool
+    does."""
+    value *= 1.00001
+    if 0 == value:
+        return "0"
+    for denominator in [1, 2, 3]:
+        if int(value * denominator) / (value * denominator) > 0.999:
+            return "%+d" % (int(value * denominator)) + ("/%d" % (denominator)
+                                                         if 1 != denominator else "")
+    return "%+.3g" % (value)
+
+
+class _TiffReader(object):
+    """Reads IFDs from a TIFF structure, such as the one in an EXIF
+    segment."""
+
+    def __init__(self, data):
+        """Initialize a _TiffReader.  Raises _Unsupported if the data
+        isn't a TIFF header."""
+        self._data = data
+        if data[0:4] == b"II*\0":
+            self._order = "<"
+        elif data[0:4] == b"MM\0*":
+            self._order = ">"
+        else:
+            raise _Unsupported()
+        self.ifd0 = struct.unpack(self._order + "L", data[4:8])[0]
+
+    def readIfd(self, offset):
+        """Read an IFD.  Returns a dict mapping tag numbers to values
+        and the offset of the next IFD."""
+        data = self._data
+        if offset + 2 > len(data):
+            raise _Unsupported()
+        (count,) = struct.unpack(self._order + "H", data[offset:offset+2])
+        if offset + 2 + 12 * count + 4 > len(data):
+            raise _Unsupported()
+        entries = {}
+        for i in range(count):
+            entry = offset + 2 + 12 * i
+            (tag, field_type, field_count) = struct.unpack(self._order + "HHL",
+                                                           data[entry:entry+8])
+            if field_type not in _TIFF_TYPES:
+                continue
+            (fmt, size) = _TIFF_TYPES[field_type]
+            length = size * field_count
+            value_offset = entry + 8
+            if 4 < length:
+                (value_offset,) = struct.unpack(self._order + "L", data[entry+8:entry+12])
+            if value_offset + length > len(data):
+                raise _Unsupported()
+            raw = bytes(data[value_offset:value_offset+length])
+            if "s" == fmt:
+                entries[tag] = (field_type, raw)
+            else:
+                values = struct.unpack(self._order + fmt * field_count, raw)
+                if 2 == len(fmt):
+                    # Rationals
+                    values = [values[j] / values[j+1] if 0 != values[j+1] else 0.0
+                              for j in range(0, len(values), 2)]
+                entries[tag] = (field_type, list(values))
+        (next_ifd,) = struct.unpack(self._order + "L",
+                                    data[offset+2+12*count:offset+2+12*count+4])
+        return (entries, next_ifd)
+
+    def byteOrder(self):
+        """Return the byte order of the TIFF structure."""
+        return self._order
+
+
+def _single(entries, tag):
+    """Return the single numeric value of a tag, None if it is absent,
+    or raise _Unsupported if it has multiple values."""
+    if tag not in entries:
+        return None
+    values = entries[tag][1]
+    if bytes is type(values) or 1 != len(values):
+        raise _Unsupported()
+    return values[0]
+
+
+def _ascii(entries, tag):
+    """Return the value of an ASCII tag with trailing nulls and spaces
+    removed, or None if it is absent."""
+    if tag not in entries or bytes is not type(entries[tag][1]):
+        return None
+    return entries[tag][1].split(b"\0")[0].decode("utf-8", errors="replace").rstrip(" ")
+
+
+def _user_comment(raw, order):
+    """Decode an EXIF UserComment."""
+    charset = raw[:8]
+    text = raw[8:]
+    if b"ASCII\0\0\0" == charset:
+        return text.decode("latin-1").rstrip("\0 ")
+    elif b"UNICODE\0" == charset:
+        return text.decode("utf-16-le" if "<" == order else "utf-16-be").rstrip("\0 ")
+    elif 0 == len(text.strip(b"\0 ")):
+        return ""
+    raise _Unsupported()
+
+
+def _parse_exif(data, tags):
+    """Extract the tags that we need from an EXIF segment."""
+    tiff = _TiffReader(data)
+    (ifd0, next_ifd) = tiff.readIfd(tiff.ifd0)
+    exif = {}
+    if _TAG_EXIF_IFD in ifd0:
+        exif = tiff.readIfd(_single(ifd0, _TAG_EXIF_IFD))[0]
+    ifd1 = {}
+    if 0 != next_ifd:
+        ifd1 = tiff.readIfd(next_ifd)[0]
+
+    # MakerNotes are vendor-specific and feed several of the composite tags that we use.  That's
+    # exiftool's job.
+    if _TAG_MAKER_NOTE in exif:
+        raise _Unsupported()
+    # If there are EXIF image dimensions, exiftool might prefer them over the ones in the JPEG
+    # frame header.
+    for ifd in [ifd0, ifd1]:
+        if _TAG_IMAGE_WIDTH in ifd or _TAG_IMAGE_HEIGHT in ifd:
+            raise _Unsupported()
+
+    for (name, tag) in [("EXIF:Make", _TAG_MAKE), ("EXIF:Model", _TAG_MODEL),
+                        ("EXIF:DateTimeOriginal", _TAG_DATE_TIME_ORIGINAL)]:
+        value = _ascii(ifd0 if tag in ifd0 else exif, tag)
+        if None is not value:
+            tags[name] = _json_value(value)
+    orientation = _single(ifd0, _TAG_ORIENTATION)
+    if None is not orientation:
+        tags["EXIF:Orientation"] = orientation
+    iso = _single(exif, _TAG_ISO)
+    if None is not iso:
+        tags["EXIF:ISO"] = iso
+    compensation = _single(exif, _TAG_EXPOSURE_COMPENSATION)
+    if None is not compensation:
+        tags["EXIF:ExposureCompensation"] = _json_value(_format_fraction(compensation))
+    flash = _single(exif, _TAG_FLASH)
+    if None is not flash:
+        tags["EXIF:Flash"] = _FLASH_MODES.get(flash, "Unknown (0x%x)" % (flash))
+    exposure_mode = _single(exif, _TAG_EXPOSURE_MODE)
+    if None is not exposure_mode:
+        tags["EXIF:ExposureMode"] = _EXPOSURE_MODES.get(exposure_mode,
+                                                        "Unknown (%d)" % (exposure_mode))
+    focal_length = _single(exif, _TAG_FOCAL_LENGTH)
+    if None is not focal_length:
+        tags["EXIF:FocalLength"] = "%.1f mm" % (focal_length)
+    if _TAG_USER_COMMENT in exif:
+        tags["EXIF:UserComment"] = _json_value(_user_comment(exif[_TAG_USER_COMMENT][1],
+                                                             tiff.byteOrder()))
+
+    # Values needed for composite tags.
+    values = {}
+    values["FocalLength"] = focal_length
+    values["ISO"] = iso
+    values["FNumber"] = _single(exif, _TAG_F_NUMBER)
+    if None is values["FNumber"] and _TAG_APERTURE_VALUE in exif:
+        values["FNumber"] = 2 ** (_single(exif, _TAG_APERTURE_VALUE) / 2)
+    values["ExposureTime"] = _single(exif, _TAG_EXPOSURE_TIME)
+    if None is values["ExposureTime"] and _TAG_SHUTTER_SPEED_VALUE in exif:
+        values["ExposureTime"] = 2 ** -_single(exif, _TAG_SHUTTER_SPEED_VALUE)
+    values["FocalLengthIn35mmFormat"] = _single(exif, _TAG_FOCAL_LENGTH_35MM)
+    if None is values["FocalLengthIn35mmFormat"] and _TAG_FOCAL_PLANE_X_RESOLUTION in exif:
+        # exiftool can work out the scale factor from the sensor size, but we don't.
+        raise _Unsupported()
+    return values
+
+
+def _xmp_property(description, name):
+    """Get a simple XMP property from an rdf:Description element,
+    whether it is stored as an attribute or as a child element."""
+    if name in description.attrib:
+        return description.attrib[name]
+    element = description.find(name)
+    if None is not element:
+        alternatives = element.findall("./%sAlt/%sli" % (_NS_RDF, _NS_RDF))
+        if 0 != len(alternatives):
+            for alternative in alternatives:
+                if "x-default" == alternative.get(_NS_XML + "lang"):
+                    return alternative.text or ""
+            return alternatives[0].text or ""
+        if 0 != len(element):
+            # A structure or a list.
+            raise _Unsupported()
+        return element.text or ""
+    return None
+
+
+def _xmp_time(value):
+    """Convert an XMP timestamp to the format that exiftool uses."""
+    match = re.match(r"^(\d{4})-(\d{2})-(\d{2})(?:T(.*))?$", value)
+    if not match:
+        return value
+    text = "%s:%s:%s" % match.group(1, 2, 3)
+    if None is not match.group(4):
+        time_text = match.group(4)
+        if re.match(r"^\d{2}:\d{2}([+-]|Z|$)", time_text):
+            # exiftool adds seconds if they're missing.
+            time_text = time_text[:5] + ":00" + time_text[5:]
+        text += " " + time_text
+    return text
+
+
+def _parse_xmp(data, tags):
+    """Extract the tags that we need from an XMP packet."""
+    # Most photos don't have XMP packets, so don't load the XML parser until one turns up.
+    import xml.etree.ElementTree
+    try:
+        root = xml.etree.ElementTree.fromstring(bytes(data).rstrip(b"\0 \n"))
+    except xml.etree.ElementTree.ParseError:
+        raise _Unsupported()
+    for description in root.iter(_NS_RDF + "Description"):
+        for name in list(description.attrib.keys()) + [child.tag for child in description]:
+            if any(name.startswith(ns) for ns in _NS_CAMERA) \
+               and _NS_EXIF + "DateTimeOriginal" != name:
+                raise _Unsupported()
+        for (tag, name, convert) in [("XMP:DateTimeOriginal", _NS_EXIF + "DateTimeOriginal",
+                                      _xmp_time),
+                                     ("XMP:Location", _NS_IPTC_CORE + "Location", None),
+                                     ("XMP:Description", _NS_DC + "description", None)]:
+            value = _xmp_property(description, name)
+            if None is not value:
+                tags[tag] = _json_value(convert(value) if None is not convert else value)
+
+
+def _parse_iptc(data, tags):
+    """Extract the tags that we need from a Photoshop IRB segment."""
+    # Find the IPTC-NAA resource.
+    iptc = None
+    pos = 0
+    while pos + 12 <= len(data) and b"8BIM" == data[pos:pos+4]:
+        (resource_id, name_length) = struct.unpack(">HB", data[pos+4:pos+7])
+        pos += 7 + name_length
+        pos += pos % 2
+        (size,) = struct.unpack(">L", data[pos:pos+4])
+        pos += 4
+        if 0x0404 == resource_id:
+            iptc = data[pos:pos+size]
+        pos += size + size % 2
+    if None is iptc:
+        return
+
+    records = {}
+    pos = 0
+    while pos + 5 <= len(iptc) and 0x1C == iptc[pos]:
+        (record, dataset, size) = struct.unpack(">BBH", iptc[pos+1:pos+5])
+        if size & 0x8000:
+            # Extended datasets aren't used for anything that we need.
+            raise _Unsupported()
+        records[(record, dataset)] = bytes(iptc[pos+5:pos+5+size])
+        pos += 5 + size
+
+    # gThumb stores IPTC strings as UTF-8 and we ask exiftool to treat them as such.  Anything
+    # explicitly declared as some other character set is left to exiftool.
+    if (1, 90) in records and b"\x1b%G" != records[(1, 90)]:
+        raise _Unsupported()
+    try:
+        strings = {key: value.decode("utf-8") for (key, value) in records.items() if 2 == key[0]}
+    except UnicodeDecodeError:
+        raise _Unsupported()
+
+    if (2, 120) in strings:
+        tags["IPTC:Caption-Abstract"] = _json_value(strings[(2, 120)])
+    if (2, 27) in strings:
+        tags["IPTC:ContentLocationName"] = _json_value(strings[(2, 27)])
+    date = strings.get((2, 55))
+    time_created = strings.get((2, 60))
+    if None is not date and re.match(r"^\d{8}$", date) \
+       and None is not time_created and re.match(r"^\d{6}([+-]\d{4})?$", time_created):
+        date = "%s:%s:%s" % (date[0:4], date[4:6], date[6:8])
+        time_created = "%s:%s:%s" % (time_created[0:2], time_created[2:4], time_created[4:6]) \
+                       + ("%s:%s" % (time_created[6:9], time_created[9:11])
+                          if 6 < len(time_created) else "")
+        tags["Composite:DateTimeCreated"] = date + " " + time_created
+    elif None is not date or None is not time_created:
+        raise _Unsupported()
+
+
+def _add_composites(values, width, height, tags):
+    """Calculate the composite tags that don't depend on MakerNotes."""
+    aperture = values["FNumber"]
+    exposure_time = values["ExposureTime"]
+    focal_length = values["FocalLength"]
+    iso = values["ISO"]
+
+    tags["Composite:ImageSize"] = "%dx%d" % (width, height)
+    if None is not aperture and 0 < aperture:
+        # exiftool shows an extra digit for the f-numbers of very fast lenses.
+        tags["Composite:Aperture"] = _json_value(("%.2f" if aperture < 1 else "%.1f") % (aperture))
+    if None is not exposure_time and 0 < exposure_time:
+        tags["Composite:ShutterSpeed"] = _json_value(_format_exposure_time(exposure_time))
+    if None is not aperture and None is not exposure_time and None is not iso \
+       and 0 < aperture and 0 < exposure_time and 0 < iso:
+        light_value = math.log(aperture ** 2 * 100 / (exposure_time * iso), 2)
+        tags["Composite:LightValue"] = _json_value("%.1f" % (light_value))
+
+    scale = None
+    if None is not focal_length and 0 < focal_length and values["FocalLengthIn35mmFormat"]:
+        scale = values["FocalLengthIn35mmFormat"] / focal_length
+        tags["Composite:ScaleFactor35efl"] = _json_value("%.1f" % (scale))
+    if None is not focal_length:
+        if None is not scale:
+            tags["Composite:FocalLength35efl"] = "%.1f mm (35 mm equivalent: %.1f mm)" \
+                                                 % (focal_length, focal_length * scale)
+        else:
+            tags["Composite:FocalLength35efl"] = "%.1f mm" % (focal_length)
+    if None is not scale and 0 < focal_length:
+        fov = 2 * math.atan2(36, 2 * focal_length * scale) * 180 / math.pi
+        tags["Composite:FOV"] = "%.1f deg" % (fov)
+        if None is not aperture and 0 < aperture:
+            circle_of_confusion = math.sqrt(24 * 24 + 36 * 36) / (scale * 1440)
+            hyperfocal = focal_length ** 2 / (aperture * circle_of_confusion * 1000)
+            tags["Composite:HyperfocalDistance"] = "%.2f m" % (hyperfocal)
+
+
+def _read_segments(data):
+    """Walk the segments of a JPEG file up to the start of the image
+    data.  Returns a list of (marker, start, end) tuples."""
+    if data[0:2] != b"\xff\xd8":
+        raise _Unsupported()
+    segments = []
+    pos = 2
+    while pos + 4 <= len(data):
+        if 0xFF != data[pos]:
+            raise _Unsupported()
+        marker = data[pos+1]
+        if 0xFF == marker:
+            # Fill byte
+            pos += 1
+            continue
+        if 0x01 == marker or 0xD0 <= marker <= 0xD8:
+            # Stand-alone marker
+            pos += 2
+            continue
+        if 0xD9 == marker:
+            break
+        (length,) = struct.unpack(">H", data[pos+2:pos+4])
+        if length < 2 or pos + 2 + length > len(data):
+            raise _Unsupported()
+        segments.append((marker, pos + 4, pos + 2 + length))
+        if 0xDA == marker:
+            # Start of scan.  Everything that we need comes before the image data.
+            break
+        pos += 2 + length
+    return segments
+
+
+def read_jpeg_metadata(path):
+    """Read the metadata needed by DyphalGenerator from a JPEG file.
+    Returns a dict of tags named and formatted as exiftool would report
+    them with '-json -G -EXIF:Orientation#', or None if the file isn't a
+    JPEG or contains something that needs exiftool to interpret.  May
+    throw OSError if the file can't be read."""
+    with open(path, "rb") as photo_file:
+        size = os.fstat(photo_file.fileno()).st_size
+        if 0 == size:
+            return None
+        with mmap.mmap(photo_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _read_jpeg_metadata(data, size)
+            except (_Unsupported, struct.error, IndexError, ValueError, ZeroDivisionError):
+                return None
+
+
+def _read_jpeg_metadata(data, size):
+    """Read the metadata from a memory-mapped JPEG file."""
+    tags = {}
+    values = None
+    dimensions = None
+    seen = set()
+    for (marker, start, end) in _read_segments(data):
+        segment = memoryview(data)[start:end]
+        try:
+            kind = None
+            if 0xE1 == marker and bytes(segment[:len(_EXIF_HEADER)]) == _EXIF_HEADER:
+                kind = "EXIF"
+                if kind not in seen:
+                    values = _parse_exif(segment[len(_EXIF_HEADER):], tags)
+            elif 0xE1 == marker and bytes(segment[:len(_XMP_HEADER)]) == _XMP_HEADER:
+                kind = "XMP"
+                if kind not in seen:
+                    _parse_xmp(segment[len(_XMP_HEADER):], tags)
+            elif 0xE1 == marker and bytes(segment[:len(_XMP_EXTENSION_HEADER)]) \
+                                    == _XMP_EXTENSION_HEADER:
+                raise _Unsupported()
+            elif 0xED == marker and bytes(segment[:len(_PHOTOSHOP_HEADER)]) == _PHOTOSHOP_HEADER:
+                kind = "IPTC"
+                if kind not in seen:
+                    _parse_iptc(segment[len(_PHOTOSHOP_HEADER):], tags)
+            elif marker in _SOF_MARKERS:
+                kind = "SOF"
+                (height, width) = struct.unpack(">HH", segment[1:5])
+                dimensions = (width, height)
+            if None is not kind:
+                if kind in seen:
+                    # exiftool merges or picks between multiple segments in ways that we don't
+                    # emulate.
+                    raise _Unsupported()
+                seen.add(kind)
+        finally:
+            segment.release()
+
+    if None is dimensions:
+        raise _Unsupported()
+    if None is values:
+        values = {"FNumber": None, "ExposureTime": None, "FocalLength": None, "ISO": None,
+                  "FocalLengthIn35mmFormat": None}
+    tags["File:FileSize"] = _format_file_size(size)
+    tags["File:FileType"] = "JPEG"
+    (tags["File:ImageWidth"], tags["File:ImageHeight"]) = dimensions
+    _add_composites(values, dimensions[0], dimensions[1], tags)
+    return tags
+
+
+def jpeg_content_hash(path):
+    """Compute a fingerprint of the image in a JPEG file that ignores 
+    embedded metadata, so that it only changes if the pixels might 
+    have.  Returns a hex string, or None if the file isn't a JPEG or 
+    can't be parsed.  May throw OSError if the file can't be read."""
+    with open(path, "rb") as photo_file:
+        if 0 == os.fstat(photo_file.fileno()).st_size:
+            return None
+        with mmap.mmap(photo_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _jpeg_content_hash(data)
+            except (_Unsupported, struct.error, IndexError, ValueError):
+                return None
+
+
+def _jpeg_content_hash(data):
+    """Compute the content hash of a memory-mapped JPEG file."""
+    # Everything that affects decoding is hashed: frame and scan headers, quantization and Huffman 
+    # tables, restart intervals, the entropy-coded data, and Adobe's APP14 segment, which says how 
+    # to interpret the colour channels.  Other APPn segments (EXIF, XMP, IPTC, ICC profiles, etc.) 
+    # and comments are skipped, as is anything after the end of the image.  The EXIF orientation 
+    # isn't covered, so callers need to account for that separately.
+    if data[0:2] != b"\xff\xd8":
+        raise _Unsupported()
+    digest = hashlib.sha256()
+    view = memoryview(data)
+    try:
+        pos = 2
+        while True:
+            if 0xFF != data[pos]:
+                raise _Unsupported()
+            marker = data[pos+1]
+            if 0xFF == marker:
+                # Fill byte
+                pos += 1
+                continue
+            if 0xD9 == marker:
+                digest.update(b"\xff\xd9")
+                return digest.hexdigest()
+            if 0x01 == marker or 0xD0 <= marker <= 0xD8:
+                # Stand-alone marker
+                pos += 2
+                continue
+            (length,) = struct.unpack(">H", data[pos+2:pos+4])
+            end = pos + 2 + length
+            if length < 2 or end > len(data):
+                raise _Unsupported()
+            metadata = 0xFE == marker or (0xE0 <= marker <= 0xEF and not (
+                0xEE == marker and data[pos+4:pos+4+len(_ADOBE_HEADER)] == _ADOBE_HEADER))
+            if not metadata:
+                digest.update(view[pos:end])
+            pos = end
+            if 0xDA == marker:
+                # Start of scan.  The entropy-coded data continues up to the next marker other 
+                # than a restart marker.  0xFF bytes in the data itself are followed by 0x00.
+                scan_end = pos
+                while True:
+                    scan_end = data.find(b"\xff", scan_end)
+                    if -1 == scan_end:
+                        raise _Unsupported()
+                    following = data[scan_end+1]
+                    if 0x00 != following and not 0xD0 <= following <= 0xD7:
+                        break
+                    scan_end += 2
+                digest.update(view[pos:scan_end])
+                pos = scan_end
+    finally:
+        view.release()
@@ -0,0 +1,127 @@
+"""Generation manifests for incremental album regeneration in DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+import json
+import threading
+import traceback
+
+
+class Manifest(object):
+    """A record of the inputs from which each generated file in an 
+    album was made.
+
+    When an album is generated, each file that is needed is checked 
+    against the manifest from the previous generation.  If the file 
+    still exists and its inputs (source photo, sizes, qualities, 
+    caption and property fields, program version, and so on) are 
+    unchanged, it doesn't need to be generated again.  Either way, its 
+    inputs are recorded in the new manifest, so files that are no 
+    longer part of the album are dropped from it.
+
+    A file can also have a result recorded with it, such as a setting 
+    that was expensive to work out, which can be re-used as long as 
+    the file's inputs don't change.
+
+    The manifest is only an optimization.  A missing or unreadable 
+    manifest means that everything is regenerated.
+
+    Attributes:
+        _previous (dict): Maps the names of files, relative to the album 
+                directory, to their inputs when they were last generated.
+        _current (dict): Maps the names of files to their inputs in the 
+                current generation.
+        _previousResults (dict): Maps the names of files to the results 
+                recorded with them in the previous generation.
+        _currentResults (dict): Maps the names of files to the results 
+                recorded with them in the current generation.
+        _lock (threading.Lock): Protects _current and _currentResults.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file_name=None):
+        """Initialize a Manifest, loading the previous generation's 
+        manifest from a file if one is given and can be read."""
+        self._previous = {}
+        self._current = {}
+        self._previousResults = {}
+        self._currentResults = {}
+        self._lock = threading.Lock()
+        if None is not file_name:
+            try:
+                with open(file_name) as manifest_file:
+                    data = json.load(manifest_file)
+                if self.VERSION == data["version"] and dict is type(data["files"]):
+                    self._previous = data["files"]
+                    # Older manifests don't have results.
+                    if "results" in data and dict is type(data["results"]):
+                        self._previousResults = data["results"]
+            except (FileNotFoundError):
+                pass
+            except (OSError, ValueError, KeyError, TypeError):
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
+
+    @staticmethod
+    def fileName(album_file_name):
+        """Return the name of the manifest for an album file."""
+        if album_file_name.endswith(".dyphal"):
+            return album_file_name[:-7] + ".manifest"
+        return album_file_name + ".manifest"
+
+    @staticmethod
+    def _normalize(inputs):
+        """Convert inputs to the form that they take after a trip 
+        through JSON, so that they can be compared to loaded ones."""
+        return json.loads(json.dumps(inputs, sort_keys=True))
+
+    def isCurrent(self, name, inputs, path):
+        """Return True if the file with the given name was generated 
+        from the same inputs last time and still exists at path."""
+        return self._previous.get(name) == self._normalize(inputs) and os.path.isfile(path)
+
+    def result(self, name, inputs):
+        """Return the result recorded with a file last time if it was 
+        generated from the same inputs, or None otherwise."""
+        if self._previous.get(name) != self._normalize(inputs):
+            return None
+        return self._previousResults.get(name)
+
+    def record(self, name, inputs, result=None):
+        """Record the inputs from which a file was generated, and 
+        optionally a result to keep with them."""
+        inputs = self._normalize(inputs)
+        with self._lock:
+            self._current[name] = inputs
+            if None is not result:
+                self._currentResults[name] = result
+
+    def save(self, file_name):
+        """Write the current generation's manifest to a file.  Failure 
+        is logged but not otherwise reported, since it only means that 
+        the next generation will take longer."""
+        with self._lock:
+            data = {"version": self.VERSION, "files": self._current, 
+                    "results": self._currentResults}
+            try:
+                with open(file_name, "w") as manifest_file:
+                    json.dump(data, manifest_file, sort_keys=True)
+            except (OSError):
+                (exc_type, exc_value, exc_traceback) = sys.exc_info()
+                traceback.print_exception(exc_type, exc_value, exc_traceback)
@@ -0,0 +1,188 @@
+"""Compact storage for photo metadata in DyphalGenerator.
+Copyright (c) Rennie deGraaf, 2005-2026.
+
+This program is free software; you can redistribute it and/or modify it 
+under the terms of the GNU General Public License as published by the 
+Free Software Foundation; either version 2 of the License, or (at your 
+option) version 3.
+
+This program is distributed in the hope that it will be useful, but 
+WITHOUT ANY WARRANTY; without even the implied warranty of 
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU 
+General Public License for more details.
+
+You should have received a copy of the GNU General Public License 
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import threading
+import collections.abc
+
+
+_ABSENT = object()
+
+
+class ColumnStore(object):
+    """A thread-safe table of records with one column per field.
+
+    Photos in an album mostly have the same handful of property names
+    and many of the same values ("Canon", "Normal", "Auto").  Storing
+    them in a dict per photo repeats all of those strings and pays for
+    a hash table per photo.  Here, each field is a list indexed by row,
+    and field names and string values are interned so that photos
+    share them.  Rows are re-used after they are removed.
+
+    Attributes:
+        _columns (dict): Maps field names to lists of values.  Missing 
+                values are represented by _ABSENT.
+        _size (int): The number of rows in every column.
+        _free (list of int): Rows that have been removed.
+        _lock (threading.Lock): Protects the other members.
+    """
+
+    def __init__(self):
+        """Initialize an empty ColumnStore."""
+        self._columns = {}
+        self._size = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _intern(value):
+        """Return a shared copy of a string value."""
+        return sys.intern(value) if str is type(value) else value
+
+    def add(self, record):
+        """Add a record, given as a dict mapping field names to values.  
+        Returns the record's row number."""
+        with self._lock:
+            if 0 != len(self._free):
+                row = self._free.pop()
+            else:
+                row = self._size
+                self._size += 1
+                for column in self._columns.values():
+                    column.append(_ABSENT)
+            for (field, value) in record.items():
+                column = self._columns.get(field)
+                if None is column:
+                    column = [_ABSENT] * self._size
+                    self._columns[sys.intern(field)] = column
+                column[row] = self._intern(value)
+            return row
+
+    def set(self, row, field, value):
+        """Set the value of a field in a record."""
+        with self._lock:
+            column = self._columns.get(field)
+            if None is column:
+                column = [_ABSENT] * self._size
+                self._columns[sys.intern(field)] = column
+            column[row] = self._intern(value)
+
+    def remove(self, row):
+        """Remove a record.  Its row number may be re-used."""
+        with self._lock:
+            for column in self._columns.values():
+                column[row] = _ABSENT
+            self._free.append(row)
+            if len(self._free) == self._size:
+                # Everything is gone; give the memory back.
+                self._columns = {}
+                self._size = 0
+                self._free = []
+
+    def get(self, row, field, default=None):
+        """Return the value of a field in a record, or default if the 
+        record doesn't have it."""
+        with self._lock:
+            column = self._columns.get(field)
+            value = column[row] if None is not column else _ABSENT
+        return default if _ABSENT is value else value
+
+    def fields(self, row):
+        """Return a list of the fields that a record has."""
+        with self._lock:
+            return [field for (field, column) in self._columns.items() 
+                    if _ABSENT is not column[row]]
+
+
+class RecordView(collections.abc.Mapping):
+    """A read-only dict-like view of a record in a ColumnStore."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        """Initialize a RecordView."""
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        """Return the value of a field.  Raises KeyError if the record 
+        doesn't have it."""
+        value = self._store.get(self._row, field, _ABSENT)
+        if _ABSENT is value:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field):
+        """Return True if the record has a field."""
+        return _ABSENT is not self._store.get(self._row, field, _ABSENT)
+
+    def __iter__(self):
+        """Iterate over the fields that the record has."""
+        return iter(self._store.fields(self._row))
+
+    def __len__(self):
+        """Return the number of fields that the record has."""
+        return len(self._store.fields(self._row))
+
+
+class FieldIndex(object):
+    """The number of records that have each field, for a collection of 
+    records that changes over time.
+
+    Records are counted as they are added and removed, so that finding 
+    the fields that every record has, or that any record has, doesn't 
+    mean examining every record.  Only the field names of a record are 
+    needed, so this works with any mapping.  Not thread-safe.
+
+    Attributes:
+        _counts (dict): Maps field names to the number of records that 
+                have them.  Fields that no record has are removed.
+        _records (int): The number of records.
+    """
+
+    def __init__(self):
+        """Initialize an empty FieldIndex."""
+        self._counts = {}
+        self._records = 0
+
+    def add(self, fields):
+        """Count a record with the given field names."""
+        self._records += 1
+        for field in fields:
+            self._counts[field] = self._counts.get(field, 0) + 1
+
+    def remove(self, fields):
+        """Stop counting a record with the given field names."""
+        self._records -= 1
+        assert 0 <= self._records
+        for field in fields:
+            count = self._counts[field] - 1
+            if 0 == count:
+                del self._counts[field]
+            else:
+                self._counts[field] = count
+
+    def clear(self):
+        """Stop counting all records."""
+        self._counts = {}
+        self._records = 0
+
+    def fields(self, common_only):
+        """Return a sorted list of the fields that any record has, or 
+        that every record has if common_only is True."""
+        return sorted([field for (field, count) in self._counts.items() 
+                       if not common_only or self._records == count])
@@ -23,12 +23,12 @@ import subprocess
 import json
 import urllib.parse
 import math
-#import wand.image
-
-from PyQt5 import QtWidgets
 
 from dyphal.util import RefCounted, safe_open_file
 from dyphal.album import Album
+from dyphal.jpeg import read_jpeg_metadata, jpeg_content_hash
+from dyphal.metadata import ColumnStore, RecordView
+from dyphal.imaging import DerivativeJob, FORMATS, alternate_path
 
 class PropertyError(Exception):
     """Exception raised if a photo property has an unexpected value."""
@@ -98,14 +98,15 @@ def format_display_time(timestamp):
         raise PropertyError("Display time", timestamp)
 
 
-class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
-    """A photo to add to the album.
+class PhotoFile(RefCounted):
+    """A photo to add to the album.  User interfaces that need to 
+    display photos may mix in their own base classes.
 
     Attributes:
-        properties (dict): The properties that have been extracted from 
-                this photo.
-        captions (dict): The captions that have been extracted from 
-                this photo.
+        properties (RecordView): The properties that have been 
+                extracted from this photo.
+        captions (RecordView): The captions that have been extracted 
+                from this photo.
         _fileFullPath (str): The path to the file.  May use "~" to 
                 represent the user's home directory.  
                 eg, "~/Photos/2013-04-03/img_3201a.jpg"
@@ -118,9 +119,22 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
         _file (varies): An object that protects the file from TOCTTOU.
         _width (int): The photo's width in pixels.
         _height (int): The photo's height in pixels.
+        _transposed (bool): True if the photo's width and height are 
+                swapped when it is oriented.
+        _isJpeg (bool): True if the photo is a JPEG file.
+        _orientation (int): The photo's EXIF orientation.
+        _contentHash (str): A hash of the photo's image data, excluding 
+                metadata, or None if it couldn't be computed.
         _config (Config): A reference to the global configuration object.
+        _propertyStore (ColumnStore): Properties of all photos.
+        _captionStore (ColumnStore): Captions of all photos.
     """
 
+    # Large albums hold tens of thousands of photos with mostly the same property names and values, 
+    # so their metadata is kept in shared column stores rather than in dicts per photo.
+    _propertyStore = ColumnStore()
+    _captionStore = ColumnStore()
+
     _recognizedProperties = [
         Property("Composite:Aperture", "Aperture", transform=lambda f: "f/"+str(f)),
         Property("Composite:DigitalZoom", "Digital zoom", default="None"),
@@ -153,71 +167,114 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
         Property("MakerNotes:HDR", "HDR")
     ]
 
-    def __init__(self, filepath, fileName, config):
+    # Tags from which captions are taken, in order of preference.
+    _dateTags = ["XMP:DateTimeOriginal", "Composite:DateTimeCreated", "EXIF:DateTimeOriginal"]
+    _locationTags = ["XMP:Location", "IPTC:ContentLocationName"]
+    _descriptionTags = ["XMP:Description", "IPTC:Caption-Abstract", "EXIF:UserComment"]
+
+    # Tags needed to get the photo's dimensions.  Orientation is needed as a number.
+    _dimensionTags = ["File:ImageWidth", "File:ImageHeight"]
+    _orientationTag = "EXIF:Orientation"
+
+    @classmethod
+    def _exiftoolArgs(cls, config):
+        """Return the arguments to pass to exiftool to extract the 
+        metadata that we need from photos."""
+        # gThumb stores IPTC strings as UTF-8, but does not set CodedCharacterSet
+        args = ["-charset", "iptc=UTF8", "-json", "-a", "-G", "-%s#" % (cls._orientationTag)]
+        if config.debugMetadata:
+            return args + ["-All"]
+        # Asking exiftool for specific tags is much faster than extracting everything and throwing 
+        # most of it away, particularly for photos with large MakerNotes.  -fast stops exiftool from 
+        # searching for metadata trailers after the image data.
+        tags = set([prop.name for prop in cls._recognizedProperties] + cls._dateTags 
+                   + cls._locationTags + cls._descriptionTags + cls._dimensionTags)
+        tags.discard(cls._orientationTag)
+        return args + ["-fast"] + ["-" + tag for tag in sorted(tags)]
+
+    # Identifies the content hashes in the metadata cache.
+    _contentHashMethod = "jpeg_content_hash 1"
+
+    def __init__(self, filepath, fileName, config, photo_file=None, properties_obj=None, 
+                 content_hash=None):
         """Initializes a PhotoFile.  Opens the file and extracts 
-        properties and captions from it."""
+        properties and captions from it.  If the file has already been 
+        opened or its metadata and content hash already extracted, they 
+        may be passed in as photo_file, properties_obj and 
+        content_hash."""
         self._config = config
         self._fileName = fileName
         self._fileFullPath = re.sub("^"+os.path.expanduser("~"), "~", filepath)
-        super().__init__("%s (%s)" % (self._fileName, self._fileFullPath))
+        super().__init__()
         self._jsonName = self._fileName + ".json"
         (name, suffix) = os.path.splitext(self._fileName)
         self._thumbName = name + ".thumbnail" + suffix
-        self._file = safe_open_file(filepath, fileName, config)
+        self._file = photo_file
+        self._propertiesRow = None
+        self._captionsRow = None
+        if None is self._file:
+            self._file = safe_open_file(filepath, fileName, config)
         
         try:
-            # gThumb stores IPTC strings as UTF-8, but does not set CodedCharacterSet
-            properties_text = subprocess.check_output(
-                ["exiftool", "-charset", "iptc=UTF8", "-json", "-a", "-G", "-EXIF:Orientation#", 
-                 "-All", self._file.getPath()], 
-                timeout=self._config.BG_TIMEOUT, universal_newlines=True, stderr=subprocess.STDOUT)
-            properties_obj = json.loads(properties_text)[0]
+            if None is properties_obj:
+                properties_obj = self._extractMetadata([self._file.getPath()], 
+                                                       config)[self._file.getPath()]
+                content_hash = self._getContentHashes([self._file.getPath()], 
+                                                      config)[self._file.getPath()]
+            if isinstance(properties_obj, Exception):
+                raise properties_obj
+            self._contentHash = content_hash
 
             # exiftool finds way too many properties to force the user to sift through, so we 
             # extract only a hard-coded list of properties that are likely to be interesting.
-            self.properties = {}
+            properties = {}
             for prop in self._recognizedProperties:
                 if prop.name in properties_obj:
-                    self.properties[prop.text] = prop.transform(properties_obj[prop.name])
+                    properties[prop.text] = prop.transform(properties_obj[prop.name])
                 elif None is not prop.default:
-                    self.properties[prop.text] = prop.default
+                    properties[prop.text] = prop.default
 
             # Override the file name property because exiftool saw our generated file name
-            self.properties["File name"] = os.path.basename(filepath)
+            properties["File name"] = os.path.basename(filepath)
 
             # Get the photo dimensions
-            self._width = properties_obj["File:ImageWidth"]
-            self._height = properties_obj["File:ImageHeight"]
+            (self._width, self._height) = [properties_obj[tag] for tag in self._dimensionTags]
+            self._isJpeg = "JPEG" == properties_obj.get("File:FileType")
             # If the image needs to be rotated, swap the width and height
-            if 5 <= properties_obj["EXIF:Orientation"] <= 8:
+            self._orientation = properties_obj.get(self._orientationTag, 1)
+            self._transposed = 5 <= self._orientation <= 8
+            if self._transposed:
                 self._width, self._height = self._height, self._width
-                if "Image dimensions" in self.properties:
-                    self.properties["Image dimensions"] = \
-                                                       "%dx%d pixels" % (self._width, self._height)
+                if "Image dimensions" in properties:
+                    properties["Image dimensions"] = "%dx%d pixels" % (self._width, self._height)
 
-            self.captions = {}
+            captions = {}
 
             # Get the display date, if one exists
-            for tag in ["XMP:DateTimeOriginal", "Composite:DateTimeCreated", 
-                        "EXIF:DateTimeOriginal"]:
+            for tag in self._dateTags:
                 if tag in properties_obj:
                     (display_time, time_zone) = format_display_time(properties_obj[tag])
-                    self.captions["Date"] = display_time
-                    self.properties["Time zone"] = time_zone
+                    captions["Date"] = display_time
+                    properties["Time zone"] = time_zone
                     break
 
             # Get the location, if one exists
-            for tag in ["XMP:Location", "IPTC:ContentLocationName"]:
+            for tag in self._locationTags:
                 if tag in properties_obj:
-                    self.captions["Location"] = properties_obj[tag]
+                    captions["Location"] = properties_obj[tag]
                     break
 
             # Get the description, if one exists
-            for tag in ["XMP:Description", "IPTC:Caption-Abstract", "EXIF:UserComment"]:
+            for tag in self._descriptionTags:
                 if tag in properties_obj:
-                    self.captions["Description"] = properties_obj[tag]
+                    captions["Description"] = properties_obj[tag]
                     break
 
+            self._propertiesRow = self._propertyStore.add(properties)
+            self.properties = RecordView(self._propertyStore, self._propertiesRow)
+            self._captionsRow = self._captionStore.add(captions)
+            self.captions = RecordView(self._captionStore, self._captionsRow)
+
         except:
             # If something failed, make sure to not leave any dangling resources.  Ignore any 
             # failures that this causes.
@@ -227,15 +284,197 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
                 pass
             raise
 
+    @staticmethod
+    def _extractMetadata(paths, config):
+        """Read the metadata from a list of photos, from the metadata 
+        cache if possible and otherwise directly or with a single 
+        exiftool command.  Returns a dict mapping each path to its 
+        metadata or to a subprocess.CalledProcessError if exiftool 
+        couldn't read it."""
+        if config.debugMetadata:
+            return PhotoFile._runExiftool(paths, config)
+        if None is config.metadataCache:
+            return PhotoFile._readMetadata(paths, config)
+
+        method = " ".join(PhotoFile._exiftoolArgs(config))
+        keys = {}
+        for path in paths:
+            try:
+                keys[path] = config.metadataCache.fileKey(path)
+            except OSError:
+                # Let exiftool report the problem.
+                pass
+        cached = config.metadataCache.lookup(list(keys.values()), method)
+        results = {path: cached[key] for (path, key) in keys.items() if key in cached}
+        misses = [path for path in paths if path not in results]
+        if 0 != len(misses):
+            extracted = PhotoFile._readMetadata(misses, config)
+            config.metadataCache.store({keys[path]: data for (path, data) in extracted.items() 
+                                        if path in keys and not isinstance(data, Exception)}, 
+                                       method)
+            results.update(extracted)
+        return results
+
+    @staticmethod
+    def _readMetadata(paths, config):
+        """Read the metadata from a list of photos, directly from the 
+        files where possible and with a single exiftool command for 
+        the rest.  Returns a dict mapping each path to its metadata or 
+        to a subprocess.CalledProcessError if exiftool couldn't read 
+        it."""
+        results = {}
+        if config.fastMetadata:
+            for path in paths:
+                try:
+                    properties_obj = read_jpeg_metadata(path)
+                except OSError:
+                    # Let exiftool report the problem.
+                    properties_obj = None
+                if None is not properties_obj:
+                    properties_obj["SourceFile"] = path
+                    results[path] = properties_obj
+        misses = [path for path in paths if path not in results]
+        if 0 != len(misses):
+            results.update(PhotoFile._runExiftool(misses, config))
+        return results
+
+    @staticmethod
+    def _runExiftool(paths, config):
+        """Read the metadata from a list of photos with a single exiftool 
+        command.  Returns a dict mapping each path to its metadata or to 
+        a subprocess.CalledProcessError if exiftool couldn't read it."""
+        args = PhotoFile._exiftoolArgs(config) + paths
+        # Allow some extra time for every photo in a batch.
+        (properties_text, errors) = config.exiftool.execute(args, config.BG_TIMEOUT + len(paths))
+        try:
+            properties_list = json.loads(properties_text) if "" != properties_text.strip() else []
+        except ValueError:
+            raise subprocess.CalledProcessError(1, ["exiftool"] + args, output=errors)
+
+        # exiftool omits files that it can't open and flags ones that it can't parse, so a failure 
+        # only affects the photo concerned.
+        results = {}
+        for properties_obj in properties_list:
+            if config.debugMetadata:
+                print(json.dumps(properties_obj, indent=2, sort_keys=True))
+            if "SourceFile" in properties_obj and "ExifTool:Error" not in properties_obj:
+                results[properties_obj["SourceFile"]] = properties_obj
+        for path in paths:
+            if path not in results:
+                results[path] = subprocess.CalledProcessError(
+                    1, ["exiftool"] + PhotoFile._exiftoolArgs(config) + [path], 
+                    output="\n".join(line for line in errors.splitlines() if path in line))
+        return results
+
+    @staticmethod
+    def _getContentHashes(paths, config):
+        """Get the content hashes of a list of photos, from the metadata 
+        cache if possible.  Returns a dict mapping each path to its hash 
+        or to None if it couldn't be computed."""
+        keys = {}
+        cached = {}
+        if None is not config.metadataCache:
+            for path in paths:
+                try:
+                    keys[path] = config.metadataCache.fileKey(path)
+                except OSError:
+                    pass
+            cached = config.metadataCache.lookup(list(keys.values()), PhotoFile._contentHashMethod)
+
+        results = {}
+        computed = {}
+        for path in paths:
+            if path in keys and keys[path] in cached:
+                results[path] = cached[keys[path]]
+                continue
+            try:
+                results[path] = jpeg_content_hash(path)
+            except OSError:
+                # We'll fall back to the file's identity.
+                results[path] = None
+                continue
+            if path in keys:
+                computed[keys[path]] = results[path]
+        if None is not config.metadataCache:
+            config.metadataCache.store(computed, PhotoFile._contentHashMethod)
+        return results
+
+    @classmethod
+    def loadBatch(cls, files, config):
+        """Load a list of (path, name) photos, reading their metadata with 
+        a single exiftool command.  Returns a list containing either an 
+        instance of this class or the exception that prevented it from 
+        loading for each photo, in the same order."""
+        results = []
+        opened = []
+        for (path, name) in files:
+            try:
+                opened.append((len(results), path, name, safe_open_file(path, name, config)))
+                results.append(None)
+            except Exception as exc:
+                results.append(exc)
+
+        if 0 != len(opened):
+            try:
+                paths = [photo_file.getPath() for (_, _, _, photo_file) in opened]
+                metadata = PhotoFile._extractMetadata(paths, config)
+                content_hashes = PhotoFile._getContentHashes(paths, config)
+            except Exception as exc:
+                for (index, _, _, photo_file) in opened:
+                    photo_file.dispose()
+                    results[index] = exc
+                return results
+
+            for (index, path, name, photo_file) in opened:
+                try:
+                    results[index] = cls(path, name, config, photo_file, 
+                                         metadata[photo_file.getPath()], 
+                                         content_hashes[photo_file.getPath()])
+                except Exception as exc:
+                    results[index] = exc
+        return results
+
     def _dispose(self):
         """Close a photo file.
         Overrides RefCounted._dispose()."""
+        if None is not self._propertiesRow:
+            self._propertyStore.remove(self._propertiesRow)
+            self._propertiesRow = None
+        if None is not self._captionsRow:
+            self._captionStore.remove(self._captionsRow)
+            self._captionsRow = None
         self._file.dispose()
 
     def getPath(self):
         """Return the path to the photo file."""
         return self._file.getPath()
 
+    def getName(self):
+        """Return the name of the photo in the album."""
+        return self._fileName
+
+    def getDescription(self):
+        """Return a description of the photo for display."""
+        return "%s (%s)" % (self._fileName, self._fileFullPath)
+
+    def getJSONName(self):
+        """Return the name of the photo's JSON file in the album."""
+        return self._jsonName
+
+    def getSourceIdentity(self):
+        """Return a list that changes whenever the photo file does.  May 
+        throw OSError if the file cannot be examined."""
+        stat = os.stat(self.getPath())
+        return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+    def getImageIdentity(self):
+        """Return a list that changes whenever the photo's oriented 
+        image might have, but not when only its other metadata does.  
+        May throw OSError if the file cannot be examined."""
+        if None is self._contentHash:
+            return self.getSourceIdentity()
+        return [self._contentHash, self._orientation]
+
     def _rescale(self, pixels):
         """Calculate the optimal width and height for the photo to keep 
         it under the given size."""
@@ -251,6 +490,80 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
             width = height * aspect
             return (int(width), int(height))
 
+    def _decodeSize(self, width, height):
+        """Return the size to which the JPEG decoder may scale the photo 
+        down while decoding it, such that it remains at least width by 
+        height pixels after it is oriented, or None if it must be 
+        decoded at full size."""
+        # libjpeg can scale by 1/2, 1/4 or 1/8 for almost free by skipping DCT coefficients, which 
+        # saves most of the time and memory needed to decode a large photo.  Decoders choose the 
+        # largest reduction that keeps the image at least as large as the size that we give them, 
+        # so we're never decoding below the target size.  The size is applied before the photo is 
+        # oriented.
+        if not self._isJpeg or (width >= self._width and height >= self._height):
+            return None
+        if self._transposed:
+            return (height, width)
+        return (width, height)
+
+    def _decodedPixels(self, decode_size):
+        """Return the number of pixels that the decoder will produce when 
+        asked to scale the photo down to decode_size."""
+        pixels = self._width * self._height
+        if None is not decode_size:
+            # decode_size applies before the photo is oriented.
+            (width, height) = (self._height, self._width) if self._transposed \
+                              else (self._width, self._height)
+            # Find the largest of libjpeg's reductions that stays within the requested size.
+            for scale in [8, 4, 2]:
+                if width / scale >= decode_size[0] and height / scale >= decode_size[1]:
+                    return int(math.ceil(pixels / (scale * scale)))
+        return pixels
+
+    def getDecodedPixels(self, resolution):
+        """Return the number of pixels that must be decoded to scale the 
+        photo down to fit resolution, which is a good measure of how 
+        long generating its derivatives will take."""
+        (width, height) = self._rescale(resolution[0] * resolution[1])
+        return self._decodedPixels(self._decodeSize(width, height))
+
+    def photoVariants(self, resolution, ladder):
+        """Return the name, width and height of each scaled-down version 
+        of the photo, largest first.  The largest fits the album's photo 
+        resolution and uses the photo's own name.  Smaller versions fit 
+        each smaller resolution in the ladder; any that wouldn't be 
+        smaller than the previous version are skipped."""
+        (name, suffix) = os.path.splitext(self._fileName)
+        (width, height) = self._rescale(resolution[0] * resolution[1])
+        variants = [(self._fileName, width, height)]
+        for (width_base, height_base) in sorted(ladder, key=lambda res: res[0] * res[1], 
+                                                reverse=True):
+            (width, height) = self._rescale(width_base * height_base)
+            if width < variants[-1][1] and height < variants[-1][2]:
+                variants.append(("%s.%dx%d%s" % (name, width_base, height_base, suffix), width, 
+                                 height))
+        return variants
+
+    def thumbnailVariants(self, width_base, height_base):
+        """Return the name, width and height of the thumbnail for each 
+        display scale in Config.THUMB_SCALES."""
+        # width_base and height_base assume a horizontal photo.  Swap them for a vertical.
+        if self._width < self._height:
+            width_base, height_base = (height_base, width_base)
+        (name, suffix) = os.path.splitext(self._fileName)
+        return [(self._thumbName if 1 == scale else "%s.thumbnail.%dx%s" % (name, scale, suffix), 
+                 width_base * scale, height_base * scale) 
+                for scale in self._config.THUMB_SCALES]
+
+    @staticmethod
+    def _alternates(dir_name, name, key, formats):
+        """Return the URL and MIME type of each copy of a scaled-down 
+        photo or thumbnail in another format."""
+        return [{key: urllib.parse.quote(os.path.join(dir_name, 
+                                                      alternate_path(name, image_format))), 
+                 "type": FORMATS[image_format]} 
+                for image_format in formats]
+
     def getAlbumJSON(self):
         """Return the information about the photo that's necessary for 
         the album JSON file."""
@@ -258,19 +571,36 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
         props["name"] = urllib.parse.quote(self._fileName)
         props["thumbnail"] = urllib.parse.quote(os.path.join(self._config.THUMBNAIL_DIR, 
                                                              self._thumbName))
+        # Thumbnails for high-density displays and browsers that support other formats.  The sizes 
+        # don't matter here.
+        props["thumbnails"] = \
+            [{"thumbnail": urllib.parse.quote(os.path.join(self._config.THUMBNAIL_DIR, name)), 
+              "scale": scale, 
+              "alternates": self._alternates(self._config.THUMBNAIL_DIR, name, "thumbnail", 
+                                             self._config.photoFormats)} 
+             for ((name, _, _), scale) in zip(self.thumbnailVariants(1, 1), 
+                                              self._config.THUMB_SCALES)]
         props["orientation"] = "horizontal" if self._width >= self._height else "vertical"
         props["path"] = urllib.parse.quote(self._fileFullPath)
         return props
 
-    def generateJSON(self, out_dir_name, width_base, height_base, captions, properties):
+    def generateJSON(self, out_dir_name, resolution, ladder, formats, captions, properties):
         """Generate the JSON file for the photo."""
-        (width, height) = self._rescale(width_base * height_base)
+        variants = self.photoVariants(resolution, ladder)
+        (name, width, height) = variants[0]
 
         data = {}
         data["albumVersion"] = Album.CURRENT_VERSION
-        data["photo"] = urllib.parse.quote(os.path.join(self._config.PHOTO_DIR, self._fileName))
+        data["photo"] = urllib.parse.quote(os.path.join(self._config.PHOTO_DIR, name))
         data["width"] = str(width)
         data["height"] = str(height)
+        # Every size of the photo, smallest first, so that viewers can pick the smallest that fills 
+        # their screen, and the best format that they support.
+        data["variants"] = \
+            [{"photo": urllib.parse.quote(os.path.join(self._config.PHOTO_DIR, name)), 
+              "width": str(width), "height": str(height), 
+              "alternates": self._alternates(self._config.PHOTO_DIR, name, "photo", formats)} 
+             for (name, width, height) in reversed(variants)]
         data["caption"] = \
             [self.captions[tag] for tag in captions if tag in self.captions]
         data["properties"] = \
@@ -280,41 +610,33 @@ class PhotoFile(RefCounted, QtWidgets.QListWidgetItem):
         with open(os.path.join(out_dir_name, self._jsonName), "w") as json_file:
             json.dump(data, json_file, sort_keys=True)
 
-    def generatePhoto(self, out_dir_name, width_base, height_base, quality):
-        """Generate a scaled-down photo."""
-        (width, height) = self._rescale(width_base * height_base)
-        # See http://www.imagemagick.org/Usage/resize/
-        subprocess.check_call(["convert", self.getPath(), "-resize", "%dx%d>" % (width, height), 
-                               "-strip", "-quality", str(quality), "-auto-orient",
-                               os.path.join(out_dir_name, self._fileName)], 
-                              timeout=self._config.BG_TIMEOUT)
-        # Doesn't work reliably -- Wand 0.5.9 may throw the following:
-        #   wand.exceptions.CacheError: cache resources exhausted `/tmp/tmpfyoznu59/pf1_20210710_130553.jpeg' @ error/cache.c/OpenPixelCache/4083
-        #with wand.image.Image(filename=self.getPath()) as img:
-        #    img.auto_orient()
-        #    img.strip()
-        #    img.resize(width=width, height=height)
-        #    img.compression_quality = quality
-        #    img.save(filename=os.path.join(out_dir_name, self._fileName))
-
-    def generateThumbnail(self, out_dir_name, width_base, height_base, quality):
-        """Generate a thumbnail for the photo."""
-        # width_base and height_base assume a horizontal photo.  Swap them for a vertical.
-        width, height = (width_base, height_base)
-        if self._width < self._height:
-            width, height = (height_base, width_base)
-        # See http://www.imagemagick.org/Usage/thumbnails/
-        subprocess.check_call(["convert", self.getPath(), "-thumbnail", "%dx%d^" % (width, height), 
-                               "-gravity", "center", "-extent", "%dx%d" % (width, height), 
-                               "-quality", str(quality), "-auto-orient",
-                               os.path.join(out_dir_name, self._thumbName)], 
-                              timeout=self._config.BG_TIMEOUT)
-        # Doesn't work reliably -- Wand 0.5.9 may throw the following:
-        #   wand.exceptions.CacheError: cache resources exhausted `/tmp/tmpfyoznu59/pf1_20210710_130553.jpeg' @ error/cache.c/OpenPixelCache/4083
-        #with wand.image.Image(filename=self.getPath()) as img:
-        #    img.auto_orient()
-        #    img.thumbnail(width=width, height=height)
-        #    img.gravity = 'center'
-        #    img.extent(width=width, height=height)
-        #    img.compression_quality = quality
-        #    img.save(filename=os.path.join(out_dir_name, self._thumbName))
+    def photoJob(self, photo_dir_name, resolution, ladder, quality, formats, quality_target=None):
+        """Describe the scaled-down photos to generate for this photo.  
+        Returns a DerivativeJob, which can be passed to an imaging 
+        backend in this process or another one."""
+        photos = [(os.path.join(photo_dir_name, name), width, height) 
+                  for (name, width, height) in self.photoVariants(resolution, ladder)]
+        decode_size = self._decodeSize(photos[0][1], photos[0][2])
+        # BG_TIMEOUT is per encoded image; the job scales it up to cover all of them.
+        return DerivativeJob(self.getPath(), photos, quality, [], None, formats, decode_size, 
+                             self._config.BG_TIMEOUT, quality_target, None, 
+                             self._decodedPixels(decode_size))
+
+    def thumbnailJob(self, thumb_dir_name, thumb_width_base, thumb_height_base, thumb_quality, 
+                     formats, placeholder_size=None):
+        """Describe the thumbnails and placeholder to generate for this 
+        photo.  They are made from the original rather than from the 
+        scaled-down photos, so that they don't have to wait for them.  
+        Returns a DerivativeJob."""
+        thumbnails = [(os.path.join(thumb_dir_name, name), width, height) 
+                      for (name, width, height) 
+                      in self.thumbnailVariants(thumb_width_base, thumb_height_base)]
+        # Thumbnails are scaled to fill their boxes, so the largest one needs the original to be 
+        # decoded at least this large.
+        scale = max([max(width / self._width, height / self._height) 
+                     for (_, width, height) in thumbnails])
+        decode_size = self._decodeSize(int(math.ceil(scale * self._width)), 
+                                       int(math.ceil(scale * self._height)))
+        return DerivativeJob(self.getPath(), [], None, thumbnails, thumb_quality, formats, 
+                             decode_size, self._config.BG_TIMEOUT, None, placeholder_size, 
+                             self._decodedPixels(decode_size))
@@ -19,6 +19,9 @@ import threading
 import os
 import sys
 import traceback
+import heapq
+import itertools
+import concurrent.futures
 
 class Counter(object):
     """An atomic counter."""
@@ -56,23 +59,32 @@ class RefCounted(object):
     subsequent calls to addRef() or release() will raise exceptions.
     """
 
+    # Reference counts change rarely and briefly, so one lock shared by all objects is plenty.  A 
+    # lock per object adds up in large albums.
+    __lock = threading.Lock()
+
     def __init__(self, *args, **kwargs):
         """Initialize a RefCounted."""
         # Pass constructor parameters along in case some base class gets inserted that wants them.
         super().__init__(*args, **kwargs)
-        self.__refCount = Counter(0)
+        self.__refCount = 0
 
     def addRef(self):
         """Add a reference."""
-        return self.__refCount.incr()
+        with RefCounted.__lock:
+            self.__refCount += 1
+            return self.__refCount
 
     def release(self):
         """Release a reference and potentially destroy the object."""
-        count = self.__refCount.decr()
-        assert 0 <= count
+        with RefCounted.__lock:
+            self.__refCount -= 1
+            count = self.__refCount
+            assert 0 <= count
+            if 0 >= count:
+                self.__refCount = None # Guard against addRef() being called again.
         if 0 >= count:
             self._dispose()
-            self.__refCount = None # Guard against addRef() being called again.
         return count
 
     def _dispose(self):
@@ -80,6 +92,283 @@ class RefCounted(object):
         raise NotImplementedError()
 
 
+class MemoryGate(object):
+    """Admission control for memory-hungry work.
+
+    Work is admitted as long as the total of the memory estimates of 
+    all admitted work stays within a budget.  Anything else waits 
+    until enough work has finished.  Work that is larger than the whole 
+    budget is admitted only when nothing else is running, so that it 
+    can't wait forever.
+
+    Attributes:
+        _budget (int): The total memory that admitted work may use, in 
+                bytes.
+        _used (int): The total memory estimate of admitted work.
+        _condition (threading.Condition): Protects _used.
+    """
+
+    def __init__(self, budget):
+        """Initialize a MemoryGate."""
+        self._budget = budget
+        self._used = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, amount):
+        """Wait until work needing amount bytes can be admitted, then 
+        admit it."""
+        with self._condition:
+            while not self._admit(amount):
+                self._condition.wait()
+
+    def tryAcquire(self, amount):
+        """Admit work needing amount bytes if it can be admitted now. 
+        Returns True if it was admitted."""
+        with self._condition:
+            return self._admit(amount)
+
+    def _admit(self, amount):
+        """Admit work needing amount bytes if it fits.  Returns True if 
+        it was admitted.  Must be called with the condition held."""
+        if 0 != self._used and self._used + amount > self._budget:
+            return False
+        self._used += amount
+        return True
+
+    def release(self, amount):
+        """Record that work needing amount bytes has finished."""
+        with self._condition:
+            self._used -= amount
+            assert 0 <= self._used
+            self._condition.notify_all()
+
+    def used(self):
+        """Return the total memory estimate of admitted work."""
+        with self._condition:
+            return self._used
+
+
+class PriorityExecutor(concurrent.futures.Executor):
+    """A thread pool that runs the most important work first, once the 
+    work that it depends on is done.
+
+    Work may depend on a list of futures, and isn't queued until all of 
+    them are done, whether they succeeded, failed or were cancelled.  
+    Work that needs the results of other work should depend on it 
+    rather than waiting for it, since a waiting thread can't do 
+    anything else.
+
+    Queued work has a priority, which may be any value that can be 
+    compared with the priorities of other queued work, such as a tuple. 
+    Work with a lower priority value runs first; work with equal 
+    priorities runs in the order in which it was queued.  Work 
+    submitted with submit() has DEFAULT_PRIORITY.  Threads are started 
+    on demand, up to a fixed limit.
+
+    Work may also need memory from a MemoryGate.  It isn't started 
+    until the gate admits it, and the memory is released once it 
+    finishes, so threads never wait for memory inside running work.  
+    While the most important work for a gate doesn't fit, less 
+    important work for that gate isn't started either, so that large 
+    work can't be starved, but other work is.
+
+    Attributes:
+        _maxWorkers (int): The maximum number of threads.
+        _queue (list): A heap of queued work that doesn't need memory 
+                from a gate, as (priority, sequence number, future, 
+                function, arguments, keyword arguments, gate, memory) 
+                tuples.
+        _gated (dict): Maps each MemoryGate to a heap of queued work 
+                that needs memory from it, in the same form as _queue.
+        _sequence (itertools.count): Sequence numbers for queued work.
+        _waiting (int): The amount of work that hasn't been queued yet 
+                because it depends on work that isn't done.
+        _threads (list of threading.Thread): The worker threads.
+        _idle (int): The number of threads waiting for work.
+        _shutdown (bool): True once no more work may be submitted.
+        _condition (threading.Condition): Protects the other members.
+    """
+
+    DEFAULT_PRIORITY = (0,)
+
+    def __init__(self, max_workers):
+        """Initialize a PriorityExecutor.  No threads are started until 
+        there is work for them."""
+        self._maxWorkers = max_workers
+        self._queue = []
+        self._gated = {}
+        self._sequence = itertools.count()
+        self._waiting = 0
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+        self._condition = threading.Condition()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) with the default priority.  Returns 
+        a concurrent.futures.Future."""
+        return self.submitAfter([], self.DEFAULT_PRIORITY, fn, *args, **kwargs)
+
+    def submitWithPriority(self, priority, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) with a priority.  Returns a 
+        concurrent.futures.Future."""
+        return self.submitAfter([], priority, fn, *args, **kwargs)
+
+    def submitAfter(self, dependencies, priority, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) with a priority once every future 
+        in dependencies is done.  Returns a concurrent.futures.Future, 
+        which may be cancelled until the work starts."""
+        return self.submitGated(dependencies, priority, None, 0, fn, *args, **kwargs)
+
+    def submitGated(self, dependencies, priority, gate, memory, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) with a priority once every future 
+        in dependencies is done, and start it once gate admits memory 
+        bytes for it.  If gate is None, the work doesn't need memory 
+        from a gate.  Returns a concurrent.futures.Future, which may be 
+        cancelled until the work starts."""
+        future = concurrent.futures.Future()
+        work = (priority, future, fn, args, kwargs, gate, memory)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            if 0 == len(dependencies):
+                self._queueWork(*work)
+                return future
+            self._waiting += 1
+
+        remaining = Counter(len(dependencies))
+        def dependency_done(_):
+            if 0 == remaining.decr():
+                with self._condition:
+                    self._waiting -= 1
+                    self._queueWork(*work)
+        for dependency in dependencies:
+            # Runs immediately if the dependency is already done.
+            dependency.add_done_callback(dependency_done)
+        return future
+
+    def _queueWork(self, priority, future, fn, args, kwargs, gate, memory):
+        """Add work to the queue and make sure that there's a thread to 
+        run it.  Must be called with the condition held."""
+        queue = self._queue if None is gate else self._gated.setdefault(gate, [])
+        heapq.heappush(queue, (priority, next(self._sequence), future, fn, args, kwargs, gate, 
+                               memory))
+        if 0 == self._idle and len(self._threads) < self._maxWorkers:
+            thread = threading.Thread(target=self._work)
+            self._threads.append(thread)
+            thread.start()
+        else:
+            self._condition.notify()
+
+    def _takeWork(self):
+        """Remove the most important queued work that can start now from 
+        the queue, admitting it to its gate if it has one.  Returns None 
+        if there is no such work.  Must be called with the condition 
+        held."""
+        heads = sorted([queue[0] for queue in [self._queue] + list(self._gated.values()) 
+                        if 0 != len(queue)])
+        for (_, _, _, _, _, _, gate, memory) in heads:
+            if None is gate:
+                return heapq.heappop(self._queue)
+            if gate.tryAcquire(memory):
+                work = heapq.heappop(self._gated[gate])
+                if 0 == len(self._gated[gate]):
+                    del self._gated[gate]
+                return work
+        return None
+
+    def _work(self):
+        """Run queued work until the executor is shut down and there is 
+        no more work, queued or waiting."""
+        while True:
+            with self._condition:
+                self._idle += 1
+                work = self._takeWork()
+                # Queued work that is waiting for memory will be started once running work 
+                # releases some.
+                while None is work and not (0 == len(self._queue) and 0 == len(self._gated) 
+                                            and self._shutdown and 0 == self._waiting):
+                    self._condition.wait()
+                    work = self._takeWork()
+                self._idle -= 1
+                if None is work:
+                    # Let the other threads see that there's no more work.
+                    self._condition.notify_all()
+                    return
+            (_, _, future, fn, args, kwargs, gate, memory) = work
+            # Work that was cancelled before it started is skipped.
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as ex:
+                    future.set_exception(ex)
+                else:
+                    future.set_result(result)
+            if None is not gate:
+                gate.release(memory)
+                with self._condition:
+                    # Work that didn't fit before might now.
+                    self._condition.notify_all()
+            # Don't hold on to the work's arguments while waiting for more work.
+            del work, future, fn, args, kwargs
+
+    def shutdown(self, wait=True):
+        """Stop accepting work.  Work that has already been submitted 
+        still runs.  If wait is True, block until it has all completed."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+
+class ReorderBuffer(object):
+    """Hands results that are produced out of order to a consumer in 
+    order.
+
+    Each batch of results has a sequence number, starting from 0.  
+    Whenever the batches following the last ones delivered have all 
+    arrived, they're delivered together in one call, so a consumer 
+    receives as few calls as possible and never waits on producers.  
+    Every sequence number must be filled eventually, even if only with 
+    an empty batch, or nothing after it will be delivered.
+
+    Attributes:
+        _deliver (callable): Called with a list of results, in order.  
+                It is called with a lock held, so it should be quick.
+        _next (int): The sequence number of the next batch to deliver.
+        _pending (dict): Batches that have arrived out of order, by 
+                sequence number.
+        _lock (threading.Lock): Protects the other members and 
+                serializes deliveries.
+    """
+
+    def __init__(self, deliver):
+        """Initialize a ReorderBuffer."""
+        self._deliver = deliver
+        self._next = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def put(self, index, results):
+        """Add the batch of results with sequence number index, and 
+        deliver it along with any later batches that were waiting for 
+        it."""
+        with self._lock:
+            assert index >= self._next and index not in self._pending
+            self._pending[index] = results
+            ready = []
+            while self._next in self._pending:
+                ready.extend(self._pending.pop(self._next))
+                self._next += 1
+            # Deliver while holding the lock, so that deliveries can't overtake each other.
+            if 0 != len(ready):
+                self._deliver(ready)
+
+
 class DirectoryHandleList(object):
     """Thread-safe name to file descriptor mapping."""
 
@@ -114,13 +403,38 @@ def handle_exceptions(func, *args, **kwargs):
     'functools.partial(handle_exceptions, func)' to something that 
     expects a callable."""
     try:
-        func(*args, **kwargs)
+        return func(*args, **kwargs)
     except:
         (exc_type, exc_value, exc_traceback) = sys.exc_info()
         traceback.print_exception(exc_type, exc_value, exc_traceback)
         raise
 
 
+def probe_program(args, probes, timeout):
+    """Check that a program is installed and works by running it with 
+    arguments that don't do anything, such as asking for its version.  
+    probes is a dict mapping the real paths of programs that have 
+    passed before to their modification times; a program that passed 
+    and hasn't changed since isn't run again.  Raises OSError if the 
+    program can't be found or run, or subprocess.CalledProcessError or 
+    subprocess.TimeoutExpired if it fails."""
+    # Only the GUI probes programs, so don't make every worker process import these.
+    import shutil
+    import subprocess
+
+    path = shutil.which(args[0])
+    if None is path:
+        raise FileNotFoundError("No such program: '%s'" % (args[0]))
+    # Upgrading a program replaces it, which changes its modification time.  Programs are often 
+    # links to versioned files, so look at the file itself.
+    real_path = os.path.realpath(path)
+    mtime = os.stat(real_path).st_mtime_ns
+    if mtime != probes.get(real_path):
+        subprocess.check_call([path] + list(args[1:]), stdout=subprocess.DEVNULL, 
+                              stderr=subprocess.DEVNULL, timeout=timeout)
+        probes[real_path] = mtime
+
+
 def ensure_directory(name):
     """Ensure that a directory exists."""
     try:
@@ -219,5 +533,5 @@ def safe_open_file(file_path, file_name, config):
     if config.haveProcPid:
         return LinuxSafeFile(file_path, file_name, config.tempDir.name)
     else:
-        return UnsafeLinkedFile(file_path, file_name)
+        return UnsafeLinkedFile(file_path, file_name, config.tempDir.name)
 
@@ -29,6 +29,26 @@ var albumPath = null; // relative path to the album JSON file.  Begins with "."
 var album = null; // object describing the current album
 var page = null; // number of the current page, 0 for the album thumbnail view
 var pages = []; // objects describing all pages that have been retrieved.  Based on album.photos.
+var currentVariant = null; // the version of the current photo that is being displayed
+var supportedTypes = {}; // MIME types of the optional image formats that the browser can display
+
+// Tiny images in the optional formats that photos may be available in, to see if they load.
+var formatProbes = {
+    "image/avif": 
+        "data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1B" 
+        + "MUIAAADrbWV0YQAAAAAAAAAhaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAA" 
+        + "AQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEAAAETAAAAIAAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEA" 
+        + "AGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAAFGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAAD" 
+        + "CAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAAABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAA" 
+        + "KG1kYXQSAAoIGAAGiAhoNCAyEh7Hh4VZ3///4sAAAJA1jjx9Nw==", 
+    "image/webp": 
+        "data:image/webp;base64,UklGRiQAAABXRUJQVlA4IBgAAAAwAQCdASoBAAEA" 
+        + "B0CWJaQAA3AA/u9gAAA="
+};
+
+// A transparent image, for elements that draw their content as a background.
+var blankImage = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7";
+
 var compact = false;
 
 var compactThreshold = 750;
@@ -282,6 +302,123 @@ function verifyPhoto(photoData) {
 }
 
 
+// Choose the smallest version of a photo that fills a box of the given size on this display.  
+// Albums from older versions of Dyphal only have one.
+function chooseVariant(photoData, boxWidth, boxHeight) {
+    if (undefined === photoData.variants || 0 === photoData.variants.length) {
+        return photoData;
+    }
+    var scale = window.devicePixelRatio || 1;
+    var i, variant;
+    for (i = 0; i < photoData.variants.length; ++i) {
+        // Variants are listed from smallest to largest.
+        variant = photoData.variants[i];
+        if (parseInt(variant.width, 10) >= boxWidth * scale || 
+            parseInt(variant.height, 10) >= boxHeight * scale) {
+            return variant;
+        }
+    }
+    return variant;
+}
+
+
+// Find out which optional image formats the browser supports.  Until we know, photos are shown in 
+// their original format.
+function probeFormats() {
+    var type;
+    for (type in formatProbes) {
+        if (formatProbes.hasOwnProperty(type)) {
+            (function (type) {
+                var probe = new Image();
+                probe.onload = function () {
+                    if (1 === probe.width) {
+                        supportedTypes[type] = true;
+                    }
+                };
+                probe.src = formatProbes[type];
+            }(type));
+        }
+    }
+}
+
+
+// Return the URL of the first copy of a photo or thumbnail in a format that the browser supports, 
+// falling back to the original.
+function chooseFormat(item, key) {
+    if (undefined !== item.alternates) {
+        var i;
+        for (i = 0; i < item.alternates.length; ++i) {
+            if (true === supportedTypes[item.alternates[i].type]) {
+                return item.alternates[i][key];
+            }
+        }
+    }
+    return item[key];
+}
+
+
+// Show a photo's placeholder, if it has one, behind an image element until the image loads.
+function setPlaceholder(element, photo, size) {
+    if (undefined !== photo.placeholder) {
+        element.style["backgroundImage"] = "url(" + photo.placeholder + ")";
+        element.style["backgroundSize"] = size;
+        element.style["backgroundPosition"] = "center";
+    } else {
+        element.style["backgroundImage"] = "";
+    }
+}
+
+
+// Set the image for a thumbnail, including larger versions for high-density displays.
+function setThumbnail(thumbElement, photo) {
+    setPlaceholder(thumbElement, photo, "cover");
+    thumbElement.src = albumPath + photo.thumbnail;
+    if (undefined !== photo.thumbnails) {
+        var sources = [];
+        var i;
+        for (i = 0; i < photo.thumbnails.length; ++i) {
+            sources.push(albumPath + chooseFormat(photo.thumbnails[i], "thumbnail") + " " 
+                         + photo.thumbnails[i].scale + "x");
+        }
+        thumbElement.srcset = sources.join(", ");
+    }
+}
+
+
+// Show a thumbnail from a sprite sheet rather than its own file, if the album has sprite sheets.  
+// The image element keeps its size, but shows a transparent image over part of the sheet.
+function setSpriteThumbnail(thumbElement, photo) {
+    if (undefined === album.sprites || undefined === photo.sprite) {
+        setThumbnail(thumbElement, photo);
+        return;
+    }
+    var sheet = album.sprites[photo.sprite[0]];
+    // Use the sheet with the smallest scale that is sharp on this display.
+    var scale = window.devicePixelRatio || 1;
+    var image = sheet.images[sheet.images.length - 1];
+    var i;
+    for (i = 0; i < sheet.images.length; ++i) {
+        if (sheet.images[i].scale >= scale) {
+            image = sheet.images[i];
+            break;
+        }
+    }
+    thumbElement.src = blankImage;
+    // The placeholder, if there is one, is underneath the sprite.
+    var backgrounds = ["url(" + albumPath + image.sprite + ")"];
+    var sizes = [sheet.width + "px " + sheet.height + "px"];
+    var positions = [(-photo.sprite[1]) + "px " + (-photo.sprite[2]) + "px"];
+    if (undefined !== photo.placeholder) {
+        backgrounds.push("url(" + photo.placeholder + ")");
+        sizes.push("cover");
+        positions.push("center");
+    }
+    thumbElement.style["backgroundImage"] = backgrounds.join(", ");
+    thumbElement.style["backgroundSize"] = sizes.join(", ");
+    thumbElement.style["backgroundPosition"] = positions.join(", ");
+}
+
+
 // Cache a photo
 function cachePhoto(status, photoData, args) {
     log("cachePhoto enter");
@@ -293,7 +430,9 @@ function cachePhoto(status, photoData, args) {
             verifyPhoto(photoData);
             pages[args.page] = photoData;
             var preload = new Image();
-            preload.src = albumPath + photoData.photo;
+            preload.src = albumPath 
+                          + chooseFormat(chooseVariant(photoData, window.innerWidth, 
+                                                       window.innerHeight), "photo");
         }
     }
 
@@ -327,6 +466,18 @@ function fitPhoto() {
             var photoData = pages[page - 1];
 
             var photo = document.getElementById("photo");
+
+            // If the window grew, we may need a larger version of the photo.  Setting the source 
+            // calls fitPhoto() again once it has loaded.
+            var variant = chooseVariant(photoData, window.innerWidth, window.innerHeight);
+            if (parseInt(variant.width, 10) > parseInt(currentVariant.width, 10)) {
+                currentVariant = variant;
+                photo.src = albumPath + chooseFormat(variant, "photo");
+                document.getElementById("photoOverlay").style["backgroundImage"] = 
+                                        "url(" + albumPath + chooseFormat(variant, "photo") + ")";
+                return;
+            }
+
             var photoOverlay = document.getElementById("photoOverlay");
             var photoAspect = photoData.width / photoData.height;
             var photoPanel = document.getElementById("contentPanel");
@@ -406,13 +557,20 @@ function loadPhotoContent() {
         photoElement.style["width"] = photoData.width + "px";
         photoElement.style["height"] = photoData.height + "px";
         photoElement.addEventListener("load", fitPhoto, false);
-        // Make sure that the event listener is in place before we set the photo
-        photoElement.src = albumPath + photoData.photo;
+        // Make sure that the event listener is in place before we set the photo.  The photo is 
+        // never shown larger than the window, so don't download more than that.
+        currentVariant = chooseVariant(photoData, window.innerWidth, window.innerHeight);
+        photoElement.src = albumPath + chooseFormat(currentVariant, "photo");
         window.addEventListener("resize", fitPhoto, false);
         window.addEventListener("orientationchange", fitPhoto, false);
+        // Show the placeholder, stretched to the photo's size, until the photo loads.
+        setPlaceholder(photoElement, album.photos[page - 1], "100% 100%");
+        if (undefined !== album.photos[page - 1].placeholder) {
+            fitPhoto();
+        }
 
         document.getElementById("photoOverlay").style["backgroundImage"] = "url(" + albumPath 
-                                                                    + photoData.photo + ")";
+                                                + chooseFormat(currentVariant, "photo") + ")";
         // Set the title
         document.title = album.title + " (" + page + "/" + album.photos.length + ")";
         document.getElementById("titleContent").textContent = album.title;
@@ -468,7 +626,7 @@ function loadPhotoContent() {
             prevLinkElement.href = generatePhotoURL(page - 1);
             prevLinkElement.setAttribute("data-target", page - 1);
             var prevThumbElement = document.getElementById("prevThumbImage");
-            prevThumbElement.src = albumPath + album.photos[page - 1 - 1].thumbnail;
+            setThumbnail(prevThumbElement, album.photos[page - 1 - 1]);
             if ("vertical" === album.photos[page - 1 - 1].orientation) {
                 prevThumbElement.className = "vnavigation";
             } else {
@@ -493,7 +651,7 @@ function loadPhotoContent() {
             nextLinkElement.href = generatePhotoURL(page + 1);
             nextLinkElement.setAttribute("data-target", page + 1);
             var nextThumbElement = document.getElementById("nextThumbImage");
-            nextThumbElement.src = albumPath + album.photos[page - 1 + 1].thumbnail;
+            setThumbnail(nextThumbElement, album.photos[page - 1 + 1]);
             if ("vertical" === album.photos[page - 1 + 1].orientation) {
                 nextThumbElement.className = "vnavigation";
             } else {
@@ -577,7 +735,7 @@ function loadAlbumContent() {
             linkElement.href = generatePhotoURL(i + 1);
             linkElement.className = "navigationlink";
             linkElement.setAttribute("data-target", i + 1);
-            photoElement.src = albumPath + album.photos[i].thumbnail;
+            setSpriteThumbnail(photoElement, album.photos[i]);
             if ("vertical" === album.photos[i].orientation) {
                 photoElement.className = "vthumbnail";
             } else {
@@ -941,6 +1099,7 @@ function touchEnd(evt) {
 
 
 // Set up event listeners
+probeFormats();
 window.addEventListener("load", start, false);
 window.addEventListener("hashchange", start, false);
 // Since JavaScript is clearly enabled, hide the warning as early as possible